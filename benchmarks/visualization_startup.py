@@ -0,0 +1,56 @@
+#!/usr/bin/python
+
+# Measures the cost of importing visualization.py (RooflinePlotter and the platform tables)
+# on top of the bare interpreter startup. Importing must not load plotly or numpy.
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+repository_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+import_statement = "import visualization, sys; " \
+                   "assert 'plotly' not in sys.modules and 'numpy' not in sys.modules, 'plotting dependencies loaded'"
+
+
+def measure_startup_time(statement, runs_count):
+    times = []
+    for run in range(runs_count):
+        start = time.time()
+        subprocess.check_call([sys.executable, "-c", statement], cwd=repository_path)
+        times.append(time.time() - start)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the import time of visualization.py.')
+
+    parser.add_argument('-r', '--runs',
+                        action="store", dest="runs", type=int,
+                        help="Number of interpreter starts for each measurement.",
+                        default=20)
+
+    parser.add_argument('-m', '--max-overhead',
+                        action="store", dest="max_overhead", type=float,
+                        help="Maximal allowed import overhead in milliseconds.",
+                        default=20.0)
+
+    args = parser.parse_args()
+
+    interpreter_time = measure_startup_time("pass", args.runs)
+    import_time = measure_startup_time(import_statement, args.runs)
+    overhead = (import_time - interpreter_time) * 1000.0
+
+    print("interpreter startup: %.1f ms" % (interpreter_time * 1000.0))
+    print("import visualization: %.1f ms" % (import_time * 1000.0))
+    print("import overhead: %.1f ms (max %.1f ms)" % (overhead, args.max_overhead))
+
+    if overhead > args.max_overhead:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,18 +6,41 @@ import os
 import sys, getopt
 
 import argparse
+from array import array
 from src.paths import *
 from src.clean_data import clean_all
+from src.profiling_cache import ProfilingCache
+from src.results_store import ResultsStore
+from src.timing_statistics import TimingSettings, measure_repeatedly, get_quantile
+from src.nvprof_trace import read_csv_trace
+from src.nvprof_metrics import get_metric_list, all_levels
+from src.spans import span, recorder, get_file_size
+from src.log_streams import open_log, find_log, run_logged_command, log_modes
+from src.device_pool import DeviceJob, parse_device_list, get_device_environment, run_device_jobs
+from src.job_protocol import resource_lock, get_gpu_resource
+from src.live_points import PointPublisher, get_dashboard_url
+from src.ncu_metrics import get_ncu_metric_list, get_nvprof_values, read_ncu_csv, ncu_duration_metric, replay_modes
+from src.invocation_sampling import SamplingSettings, get_invocations_regex, get_total_estimate_error, \
+    get_ratio_estimate_error
 
 metrics_file_name = "metrics_file.log"
 execution_times_file_name = "execution_time_file.log"
 
+profiling_backends = ["nvprof", "ncu"]
+
+# percentiles of single invocations reported in trace mode
+invocation_percentile_points = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# characters of kernel names (templates, operators, pointers) which are special in kernel filter regular expressions
+kernel_filter_special_characters = ".^$*+?()[]{}|\\"
+
 def p2f(x):
     return float(x.strip('%'))/100
 
 
 class ProfilingDataGPU:
-    def __init__(self, name, mode, kernel_name, find_approximate_name):
+    def __init__(self, name, mode, kernel_name, find_approximate_name, levels=all_levels, trace=False,
+                 backend="nvprof", sampling=None):
         self.data = {"gld_transactions": 0,
                      "gst_transactions": 0,
                      "atomic_transactions": 0,
@@ -42,10 +65,34 @@ class ProfilingDataGPU:
                      "gld_efficiency": 0,
                      "shared_efficiency": 0}
         self.total_execution_time = 0.0
+        self.execution_time_statistics = None
         self.name = name
         self.mode = mode
         self.kernel_name = kernel_name
         self.find_approximate_name = find_approximate_name
+        self.levels = levels
+        # only the metrics required by the mode and memory levels are collected, others stay zero
+        self.metrics = get_metric_list(mode, levels)
+        # per-invocation records, collected in trace mode only
+        self.trace = trace
+        self.invocation_durations = array('d')
+        self.invocation_ops = array('d')
+        self.invocation_bytes = {}
+        for level in levels:
+            self.invocation_bytes[level] = array('d')
+        self.invocation_percentiles = {}
+        if backend not in profiling_backends:
+            raise ValueError("ERROR: unknown profiling backend " + str(backend) + ", aborting...")
+        self.backend = backend
+        # with sampling only some invocations are profiled and their counters are scaled up to
+        # the number of invocations in the timing run
+        self.sampling = sampling
+        self.invocations_count = 0
+        self.metric_invocations = {}
+        self.sampled_invocations = 0
+        self.sampling_errors = {}
+        # set when a profiler run of this kernel exits with an error, such results are not cached
+        self.profiler_failed = False
 
     def extract_time(self, time_str):
         print time_str
@@ -62,7 +109,7 @@ class ProfilingDataGPU:
             self.total_execution_time += float(time_str[:-1])
 
     def parse_metrics_file(self, file_name):
-        profiling_file = open(file_name, 'r')
+        profiling_file = open_log(file_name)
 
         active = False
         for line in profiling_file:
@@ -78,7 +125,7 @@ class ProfilingDataGPU:
         profiling_file.close()
 
     def parse_execution_time_file(self, file_name):
-        profiling_file = open(file_name, 'r')
+        profiling_file = open_log(file_name)
         for line in profiling_file:
             self.process_execution_time_line(line)
         profiling_file.close()
@@ -92,14 +139,113 @@ class ProfilingDataGPU:
                 else:
                     metric_value = float(line.split()[-1])
                 self.data[key] += kernels_count * metric_value
+                self.metric_invocations[key] = self.metric_invocations.get(key, 0) + kernels_count
+
+    def matches_trace_name(self, name):
+        if self.find_approximate_name is True:
+            return self.kernel_name in name
+        return name.startswith(self.kernel_name + "(") or name == self.kernel_name
+
+    def process_metrics_values(self, values):
+        # adds metrics of a single invocation and returns them as numbers
+        invocation_data = {}
+        for key in self.data:
+            invocation_data[key] = 0
+        for metric in self.metrics:
+            value = values.get(metric, "")
+            if value == "":
+                continue
+            if "efficiency" in metric:
+                metric_value = p2f(value)
+            else:
+                metric_value = float(value)
+            invocation_data[metric] = metric_value
+            self.data[metric] += metric_value
+            self.metric_invocations[metric] = self.metric_invocations.get(metric, 0) + 1
+        return invocation_data
+
+    def process_trace_metrics_row(self, values):
+        invocation_data = self.process_metrics_values(values)
+
+        self.invocation_ops.append(float(self.get_total_ops(invocation_data)))
+        for level in self.levels:
+            self.invocation_bytes[level].append(float(self.get_bytes_requested(level, invocation_data)))
+
+    def process_trace_duration(self, duration):
+        self.invocation_durations.append(duration)
+        self.total_execution_time += duration
+        self.invocations_count += 1
+
+    def process_duration(self, duration):
+        self.total_execution_time += duration
+        self.invocations_count += 1
+
+    def reset_execution_time(self):
+        self.total_execution_time = 0.0
+        self.invocation_durations = array('d')
+        self.invocations_count = 0
+
+    def collects_invocations(self):
+        # sampling errors are estimated from the metrics of single invocations
+        return self.trace or self.sampling is not None
+
+    def extrapolate_samples(self):
+        # counters of the sampled invocations are scaled up to all invocations of the timing run
+        if self.metric_invocations:
+            self.sampled_invocations = max(self.metric_invocations.values())
+        if self.sampled_invocations == 0:
+            raise ValueError("ERROR: no invocations of " + self.kernel_name + " were sampled, aborting...")
+        if self.invocations_count > self.sampled_invocations:
+            scale = float(self.invocations_count) / float(self.sampled_invocations)
+            for key in self.data:
+                self.data[key] *= scale
+        self.sampling_errors = {"ops": get_total_estimate_error(self.invocation_ops, self.invocations_count)}
+        for level in self.levels:
+            self.sampling_errors[level] = get_ratio_estimate_error(self.invocation_ops, self.invocation_bytes[level],
+                                                                   self.invocations_count)
+        print "%s: sampled %d of %d invocations, estimated ops error %.2f%%" % \
+              (self.kernel_name, self.sampled_invocations, self.invocations_count, 100.0 * self.sampling_errors["ops"])
+
+    def is_sampled(self):
+        return self.sampling is not None and self.sampled_invocations > 0
+
+    def has_invocation_data(self):
+        return len(self.invocation_percentiles) > 0 or len(self.invocation_durations) > 0
+
+    def get_invocation_percentiles(self, level):
+        # (AI percentiles, GOPS percentiles) of single invocations, metrics and durations of the
+        # same kernel are matched by the invocation order
+        if level not in self.invocation_percentiles:
+            ai_values = []
+            gops_values = []
+            for pos in range(len(self.invocation_ops)):
+                duration_pos = pos
+                if self.sampling is not None:
+                    duration_pos = self.sampling.get_invocation_position(pos)
+                if duration_pos >= len(self.invocation_durations):
+                    break
+                bytes_requested = self.invocation_bytes[level][pos]
+                duration = self.invocation_durations[duration_pos]
+                if bytes_requested > 0 and duration > 0:
+                    ai_values.append(self.invocation_ops[pos] / bytes_requested)
+                    gops_values.append(self.invocation_ops[pos] / duration / float(10**9))
+            if len(ai_values) == 0:
+                return None
+            ai_values.sort()
+            gops_values.sort()
+            self.invocation_percentiles[level] = ([get_quantile(ai_values, point) for point in invocation_percentile_points],
+                                                  [get_quantile(gops_values, point) for point in invocation_percentile_points])
+        return self.invocation_percentiles[level]
 
     def process_execution_time_line(self, line):
         if self.get_name_to_find_in_execution_time_file() in line:
             print "found " + self.get_name_to_find_in_execution_time_file() + " in line : " + line
+            time_pos = 1
             if "GPU activities" in line:
-                self.extract_time(line.split()[3])
-            else:
-                self.extract_time(line.split()[1])
+                time_pos = 3
+            self.extract_time(line.split()[time_pos])
+            # the number of calls follows the total time
+            self.invocations_count += int(line.split()[time_pos + 1])
             return
 
     def get_name_to_find_in_execution_time_file(self):
@@ -115,33 +261,101 @@ class ProfilingDataGPU:
             return "Kernel: " + self.kernel_name + "("
 
     def get_metric_names(self):
-        metric_list = []
-        for key in self.data:
-            metric_list.append(key)
-        return ",".join(metric_list)
-
-    def get_bytes_requested_l1(self):
-        bytes_requested = 32 * (self.data["gld_transactions"] + self.data["gst_transactions"] +
-                                self.data["local_load_transactions"] + self.data["local_store_transactions"] +
-                                self.data["shared_load_transactions"] + self.data["shared_store_transactions"] +
-                                self.data["atomic_transactions"])
+        return ",".join(self.metrics)
+
+    def get_ncu_metric_names(self):
+        return ",".join(get_ncu_metric_list(self.metrics))
+
+    def get_cache_key(self, cache, application_params, timing_settings):
+        settings_description = timing_settings.get_description()
+        if self.trace:
+            settings_description += " trace"
+        if self.backend != "nvprof":
+            settings_description += " " + self.backend
+        if self.sampling is not None:
+            settings_description += " " + self.sampling.get_description()
+        return cache.get_key(exec_data_path + self.name, application_params, self.mode, self.kernel_name,
+                             self.find_approximate_name, self.get_metric_names(), settings_description)
+
+    def get_cache_entry(self):
+        # single invocations are not cached, only their percentiles
+        invocation_percentiles = {}
+        if self.trace:
+            for level in self.levels:
+                invocation_percentiles[level] = self.get_invocation_percentiles(level)
+        return {"data": self.data,
+                "total_execution_time": self.total_execution_time,
+                "execution_time_statistics": self.execution_time_statistics,
+                "invocation_percentiles": invocation_percentiles,
+                "invocations_count": self.invocations_count,
+                "sampled_invocations": self.sampled_invocations,
+                "sampling_errors": self.sampling_errors}
+
+    def load_cache_entry(self, entry):
+        self.data.update(entry["data"])
+        self.total_execution_time = entry["total_execution_time"]
+        self.execution_time_statistics = entry.get("execution_time_statistics")
+        self.invocations_count = entry.get("invocations_count", 0)
+        self.sampled_invocations = entry.get("sampled_invocations", 0)
+        self.sampling_errors = entry.get("sampling_errors", {})
+        for level, percentiles in entry.get("invocation_percentiles", {}).items():
+            if percentiles is not None:
+                self.invocation_percentiles[level] = percentiles
+
+    def is_cacheable(self):
+        # a failed run or a kernel missing in one of the logs would be returned from the cache forever
+        if self.profiler_failed:
+            return False
+        return len(self.metric_invocations) > 0 and self.invocations_count > 0 and self.total_execution_time > 0
+
+    def set_execution_time_statistics(self, statistics):
+        # the median of repeated runs is used as the execution time
+        self.execution_time_statistics = statistics
+        self.total_execution_time = statistics["median"]
+
+    def get_bytes_requested_l1(self, data=None):
+        if data is None:
+            data = self.data
+        bytes_requested = 32 * (data["gld_transactions"] + data["gst_transactions"] +
+                                data["local_load_transactions"] + data["local_store_transactions"] +
+                                data["shared_load_transactions"] + data["shared_store_transactions"] +
+                                data["atomic_transactions"])
         return bytes_requested
 
-    def get_bytes_requested_l2(self):
-        bytes_requested = 32 * (self.data["l2_read_transactions"] + self.data["l2_write_transactions"])
+    def get_bytes_requested_l2(self, data=None):
+        if data is None:
+            data = self.data
+        bytes_requested = 32 * (data["l2_read_transactions"] + data["l2_write_transactions"])
         return bytes_requested
 
-    def get_bytes_requested_dram(self):
-        bytes_requested = 32 * (self.data["dram_read_transactions"] + self.data["dram_write_transactions"])
+    def get_bytes_requested_dram(self, data=None):
+        if data is None:
+            data = self.data
+        bytes_requested = 32 * (data["dram_read_transactions"] + data["dram_write_transactions"])
         return bytes_requested
 
-    def get_bytes_requested_program(self):
+    def get_bytes_requested_program(self, data=None):
+        if data is None:
+            data = self.data
         bytes_requested = 0
-        bytes_requested += 32 * self.data["gld_transactions"] * self.data["gld_efficiency"]
-        bytes_requested += 32 * self.data["gst_transactions"] * self.data["gst_efficiency"]
-        bytes_requested += 32 * (self.data["shared_load_transactions"] + self.data["shared_store_transactions"]) * self.data["shared_efficiency"]
+        bytes_requested += 32 * data["gld_transactions"] * data["gld_efficiency"]
+        bytes_requested += 32 * data["gst_transactions"] * data["gst_efficiency"]
+        bytes_requested += 32 * (data["shared_load_transactions"] + data["shared_store_transactions"]) * data["shared_efficiency"]
         return bytes_requested
 
+    def get_bytes_requested(self, level, data=None):
+        if level == "L1":
+            return self.get_bytes_requested_l1(data)
+        if level == "L2":
+            return self.get_bytes_requested_l2(data)
+        if level == "DRAM":
+            return self.get_bytes_requested_dram(data)
+        if level == "program":
+            return self.get_bytes_requested_program(data)
+
+    def get_arithmetic_intensity(self, level):
+        return float(self.get_total_ops()) / float(self.get_bytes_requested(level))
+
     def get_L1_hit_rate_program(self):
         total_accesses = float(32 * (self.data["gld_transactions"] + self.data["gst_transactions"]))
         misses = float(32 * (self.data["l2_read_transactions"] + self.data["l2_write_transactions"]))
@@ -156,41 +370,133 @@ class ProfilingDataGPU:
         L2_hit_rate = 100.0 * hits / total_accesses
         return L2_hit_rate
 
-    def get_total_ops(self):
+    def get_total_ops(self, data=None):
+        if data is None:
+            data = self.data
         if self.mode == "int":
-            return self.data["inst_integer"]
+            return data["inst_integer"]
         if self.mode == "sp":
-            return self.data["flop_count_sp"]
+            return data["flop_count_sp"]
         if self.mode == "dp":
-            return self.data["flop_count_dp"]
+            return data["flop_count_dp"]
 
     def get_ops_per_second(self):
         return float(self.get_total_ops()) / float(self.total_execution_time)
 
+    def get_ops_per_second_ci(self):
+        # the shortest time gives the highest performance
+        ops = float(self.get_total_ops())
+        return (ops / float(self.execution_time_statistics["ci_high"]),
+                ops / float(self.execution_time_statistics["ci_low"]))
+
+    def get_performance_columns(self, level):
+        # confidence interval of performance is appended only when the time was measured repeatedly,
+        # percentiles of single invocations (AI and performance) only in trace mode
+        columns = ""
+        if self.execution_time_statistics is not None:
+            ops_per_second_low, ops_per_second_high = self.get_ops_per_second_ci()
+            columns += "|%f|%f" % (ops_per_second_low / float(10**9), ops_per_second_high / float(10**9))
+        if self.has_invocation_data() and self.get_invocation_percentiles(level) is not None:
+            if columns == "":
+                columns += "||"
+            ai_percentiles, gops_percentiles = self.get_invocation_percentiles(level)
+            columns += "|" + ",".join("%f" % value for value in ai_percentiles)
+            columns += "|" + ",".join("%f" % value for value in gops_percentiles)
+        return columns
+
     def get_name(self):
         return self.name
 
     def get_kernel_name(self):
         return self.kernel_name
 
+    def get_memory_roof(self, level):
+        # program level points are compared against the L1 roof
+        if level == "program":
+            return "L1"
+        return level
+
+    def get_roofline_points(self):
+        points = []
+        for level in self.levels:
+            point = {"level": level,
+                     "memory_roof": self.get_memory_roof(level),
+                     "label": self.kernel_name + " (" + level + ")",
+                     "ai": self.get_arithmetic_intensity(level),
+                     "gops": float(self.get_ops_per_second()) / float(10**9)}
+            if self.execution_time_statistics is not None:
+                ops_per_second_low, ops_per_second_high = self.get_ops_per_second_ci()
+                point["gops_low"] = ops_per_second_low / float(10**9)
+                point["gops_high"] = ops_per_second_high / float(10**9)
+            if self.has_invocation_data() and self.get_invocation_percentiles(level) is not None:
+                point["ai_percentiles"], point["gops_percentiles"] = self.get_invocation_percentiles(level)
+            points.append(point)
+        return points
+
+    def save_to_store(self, store, run_id):
+        store.add_kernel(run_id, self.kernel_name, self.total_execution_time, self.data, self.get_roofline_points())
+
     def save_to_file(self, file):
         ops_per_second = float(self.get_ops_per_second())
-        l1_AI = float(self.get_total_ops()) / float(self.get_bytes_requested_l1())
-        l2_AI = float(self.get_total_ops()) / float(self.get_bytes_requested_l2())
-        dram_AI = float(self.get_total_ops()) / float(self.get_bytes_requested_dram())
-        program_AI = float(self.get_total_ops()) / float(self.get_bytes_requested_program())
         ops_per_second /= float(10**9)
-        file.write("%s (L1), hit rate %f |%f|%f|L1|fma\n" % (self.kernel_name, self.get_L1_hit_rate_program(), ops_per_second, l1_AI))
-        file.write("%s (L2), hit rate %f |%f|%f|L2|fma\n" % (self.kernel_name, self.get_L2_hit_rate_program(), ops_per_second, l2_AI))
-        file.write("%s (DRAM)|%f|%f|DRAM|fma\n" % (self.kernel_name, ops_per_second, dram_AI))
-        file.write("%s (program)|%f|%f|L1|fma\n" % (self.kernel_name, ops_per_second, program_AI))
-        file.write("# L1 hit rate: %f\n" % self.get_L1_hit_rate_program())
-        file.write("# L2 hit rate: %f\n" % self.get_L2_hit_rate_program())
+        if "L1" in self.levels:
+            l1_AI = self.get_arithmetic_intensity("L1")
+            file.write("%s (L1), hit rate %f |%f|%f|L1|fma%s\n" % (self.kernel_name, self.get_L1_hit_rate_program(), ops_per_second, l1_AI, self.get_performance_columns("L1")))
+        if "L2" in self.levels:
+            l2_AI = self.get_arithmetic_intensity("L2")
+            file.write("%s (L2), hit rate %f |%f|%f|L2|fma%s\n" % (self.kernel_name, self.get_L2_hit_rate_program(), ops_per_second, l2_AI, self.get_performance_columns("L2")))
+        if "DRAM" in self.levels:
+            dram_AI = self.get_arithmetic_intensity("DRAM")
+            file.write("%s (DRAM)|%f|%f|DRAM|fma%s\n" % (self.kernel_name, ops_per_second, dram_AI, self.get_performance_columns("DRAM")))
+        if "program" in self.levels:
+            program_AI = self.get_arithmetic_intensity("program")
+            file.write("%s (program)|%f|%f|L1|fma%s\n" % (self.kernel_name, ops_per_second, program_AI, self.get_performance_columns("program")))
+        if "L1" in self.levels:
+            file.write("# L1 hit rate: %f\n" % self.get_L1_hit_rate_program())
+        if "L2" in self.levels:
+            file.write("# L2 hit rate: %f\n" % self.get_L2_hit_rate_program())
+        if self.is_sampled():
+            file.write("# sampled %d of %d invocations, GOPS error %f%%" % (self.sampled_invocations,
+                                                                           self.invocations_count,
+                                                                           100.0 * self.sampling_errors["ops"]))
+            for level in self.levels:
+                file.write(", %s AI error %f%%" % (level, 100.0 * self.sampling_errors[level]))
+            file.write("\n")
+
+
+def get_metrics_file_name(application, job_name=None):
+    # jobs running on different devices at the same time write separate logs
+    if job_name is None:
+        return profiling_data_path + "/" + application + "_" + metrics_file_name
+    return profiling_data_path + "/" + application + "_" + job_name + "_" + metrics_file_name
+
+
+def get_nvprof_trace_args(trace):
+    # per-invocation records are printed as CSV, so they can be parsed as a stream
+    if trace:
+        return " --csv --print-gpu-trace "
+    return ""
 
 
-def get_nvprof_metric_command(application, application_params, kernel_name, metric_names):
+def get_execution_time_file_name(application, job_name=None):
+    if job_name is None:
+        return profiling_data_path + "/" + application + "_" + execution_times_file_name
+    return profiling_data_path + "/" + application + "_" + job_name + "_" + execution_times_file_name
+
+
+def get_program_output_file_name(application=None, job_name=None):
+    if job_name is None:
+        return profiling_data_path + "/program_output.txt"
+    return profiling_data_path + "/" + application + "_" + job_name + "_program_output.txt"
+
+
+def get_nvprof_metric_command(application, application_params, kernel_name, metric_names, trace=False,
+                              log_file_name=None):
+    if log_file_name is None:
+        log_file_name = get_metrics_file_name(application)
     nvprof_args = nvprof_path
-    nvprof_args += " --log-file " + profiling_data_path + "/" + application + "_" + metrics_file_name
+    nvprof_args += " --log-file " + log_file_name
+    nvprof_args += get_nvprof_trace_args(trace)
     nvprof_args += " --kernels " + kernel_name + " "
     nvprof_args += " --metrics "
     nvprof_args += " " + metric_names + " "
@@ -201,9 +507,62 @@ def get_nvprof_metric_command(application, application_params, kernel_name, metr
     return nvprof_args
 
 
-def get_nvprof_execution_time_command(application, application_params):
+def escape_kernel_name(kernel_name):
+    # colons separate the fields of nvprof kernel filters, so a colon of a name (e.g. of a namespace)
+    # matches any character instead
+    escaped_name = ""
+    for char in kernel_name:
+        if char == ":":
+            escaped_name += "."
+        elif char in kernel_filter_special_characters:
+            escaped_name += "\\" + char
+        else:
+            escaped_name += char
+    return escaped_name
+
+
+def get_nvprof_kernels_filter(kernel_names, invocations_regex=""):
+    # nvprof accepts a regular expression as a kernel filter, so all kernels are collected in one replay run,
+    # the last field selects invocations (counted for every kernel separately)
+    kernel_patterns = [escape_kernel_name(kernel_name) for kernel_name in kernel_names]
+    return "'::" + "|".join(kernel_patterns) + ":" + invocations_regex + "'"
+
+
+def get_sampled_invocations_regex(profiling_data_array):
+    # invocations are numbered up to the largest count of the timing run, numbers beyond the count
+    # of a kernel never match
+    invocations_count = max(profiling_data.invocations_count for profiling_data in profiling_data_array)
+    invocation_numbers = profiling_data_array[0].sampling.get_invocation_numbers(invocations_count)
+    if len(invocation_numbers) == 0:
+        raise ValueError("ERROR: kernels were launched only " + str(invocations_count) +
+                         " times, no invocations to sample, aborting...")
+    return get_invocations_regex(invocation_numbers)
+
+
+def get_ncu_sampling_args(sampling):
+    # ncu selects a window of consecutive launches of the matching kernels, launches of all of them are counted
+    # together, so every kernel is sampled by a run of its own (see is_sampled_per_kernel)
+    if sampling is None:
+        return ""
+    if not sampling.is_window():
+        raise ValueError("ERROR: ncu samples consecutive invocations only, sampling stride must be 1, aborting...")
+    ncu_args = " --launch-skip " + str(sampling.warmup)
+    if sampling.count is not None:
+        ncu_args += " --launch-count " + str(sampling.count)
+    return ncu_args
+
+
+def is_sampled_per_kernel(profiling_data_array):
+    profiling_data = profiling_data_array[0]
+    return profiling_data.backend == "ncu" and profiling_data.sampling is not None and len(profiling_data_array) > 1
+
+
+def get_nvprof_execution_time_command(application, application_params, trace=False, log_file_name=None):
+    if log_file_name is None:
+        log_file_name = get_execution_time_file_name(application)
     nvprof_args = nvprof_path
-    nvprof_args += " --log-file " + profiling_data_path + "/" + application + "_" + execution_times_file_name + " "
+    nvprof_args += " --log-file " + log_file_name + " "
+    nvprof_args += get_nvprof_trace_args(trace)
     nvprof_args += exec_data_path + application
     for param in application_params:
         nvprof_args += " " + param
@@ -211,39 +570,498 @@ def get_nvprof_execution_time_command(application, application_params):
     return nvprof_args
 
 
-def profile_application(application, application_params, kernel, mode, find_approximate_name):
+def get_ncu_kernels_filter(profiling_data_array):
+    # ncu matches the function name without parameters, approximate names match any part of it
+    kernel_patterns = []
+    for profiling_data in profiling_data_array:
+        if profiling_data.find_approximate_name:
+            kernel_patterns.append(".*" + escape_kernel_name(profiling_data.get_kernel_name()) + ".*")
+        else:
+            kernel_patterns.append(escape_kernel_name(profiling_data.get_kernel_name()))
+    return "'regex:^(" + "|".join(kernel_patterns) + ")$'"
+
+
+def get_ncu_metric_command(application, application_params, kernels_filter, ncu_metric_names,
+                           replay_mode="kernel", log_file_name=None, sampling=None):
+    # application replay reruns the whole program for every pass instead of saving and restoring
+    # the memory of every kernel launch, which is cheaper for kernels with large working sets
+    if log_file_name is None:
+        log_file_name = get_metrics_file_name(application)
+    ncu_args = ncu_path
+    ncu_args += " --csv --print-units base --log-file " + log_file_name
+    ncu_args += " --replay-mode " + replay_mode
+    ncu_args += " --kernel-name " + kernels_filter
+    ncu_args += get_ncu_sampling_args(sampling)
+    ncu_args += " --metrics " + ncu_metric_names + " "
+    ncu_args += exec_data_path + application
+    for param in application_params:
+        ncu_args += " " + param
+    print ncu_args
+    return ncu_args
+
+
+def get_ncu_execution_time_command(application, application_params, kernels_filter, log_file_name=None):
+    if log_file_name is None:
+        log_file_name = get_execution_time_file_name(application)
+    ncu_args = ncu_path
+    ncu_args += " --csv --print-units base --log-file " + log_file_name
+    ncu_args += " --clock-control none --cache-control none"
+    ncu_args += " --kernel-name " + kernels_filter
+    ncu_args += " --metrics " + ncu_duration_metric + " "
+    ncu_args += exec_data_path + application
+    for param in application_params:
+        ncu_args += " " + param
+    print ncu_args
+    return ncu_args
+
+
+def load_from_cache(profiling_data, application_params, cache, timing_settings):
+    if cache is None:
+        return False
+    entry = cache.get(profiling_data.get_cache_key(cache, application_params, timing_settings))
+    if entry is None:
+        return False
+    print "found " + profiling_data.get_kernel_name() + " in profiling cache"
+    profiling_data.load_cache_entry(entry)
+    return True
+
+
+def save_to_cache(profiling_data, application_params, cache, timing_settings):
+    if cache is None:
+        return
+    if not profiling_data.is_cacheable():
+        print "profiling of " + profiling_data.get_kernel_name() + " failed or the kernel was not found, " \
+              "results are not cached"
+        return
+    cache.put(profiling_data.get_cache_key(cache, application_params, timing_settings),
+              profiling_data.get_cache_entry())
+
 
-    profiling_data = ProfilingDataGPU(application, mode, kernel, find_approximate_name)
+def check_profiler_exit(returncode, profiling_data_array, run_name):
+    if returncode != 0:
+        print run_name + " exited with code " + str(returncode)
+        for profiling_data in profiling_data_array:
+            profiling_data.profiler_failed = True
+
+
+def parse_metrics_log(file_name, profiling_data_array):
+    backend = profiling_data_array[0].backend
+    with span("parse metrics", file=file_name) as parse_span:
+        parse_span.add_bytes(get_file_size(file_name))
+        if backend == "ncu":
+            parse_ncu_metrics_file_for_kernels(file_name, profiling_data_array)
+        elif profiling_data_array[0].collects_invocations():
+            parse_metrics_trace_file_for_kernels(file_name, profiling_data_array)
+        else:
+            parse_metrics_file_for_kernels(file_name, profiling_data_array)
+
+
+def parse_execution_time_log(file_name, profiling_data_array):
+    backend = profiling_data_array[0].backend
+    for profiling_data in profiling_data_array:
+        profiling_data.reset_execution_time()
+    with span("parse execution time", file=file_name) as parse_span:
+        parse_span.add_bytes(get_file_size(file_name))
+        if backend == "ncu":
+            parse_ncu_execution_time_file_for_kernels(file_name, profiling_data_array)
+        elif profiling_data_array[0].trace:
+            parse_execution_time_trace_file_for_kernels(file_name, profiling_data_array)
+        else:
+            parse_execution_time_file_for_kernels(file_name, profiling_data_array)
+
+
+def collect_metrics(application, application_params, kernels_filter, profiling_data_array, program_output,
+                    replay_mode="kernel", log_mode="file"):
+    # every metric log is parsed right after (or, when streamed, during) the run which produces it
+    profiling_data = profiling_data_array[0]
+    parse_log = lambda file_name: parse_metrics_log(file_name, profiling_data_array)
+    if profiling_data.backend == "ncu":
+        # ncu schedules the replay passes itself, so all metrics are always requested by a single run
+        ncu_metric_names = profiling_data.get_ncu_metric_names()
+        get_command = lambda log_file_name: get_ncu_metric_command(application, application_params, kernels_filter,
+                                                                   ncu_metric_names, replay_mode, log_file_name,
+                                                                   profiling_data.sampling)
+        with span("ncu metric run", replay_mode=replay_mode), resource_lock(get_gpu_resource()):
+            returncode = run_logged_command(get_command, get_metrics_file_name(application), parse_log,
+                                            program_output, log_mode)
+        check_profiler_exit(returncode, profiling_data_array, "ncu metric run")
+        return
+
+    # nvprof schedules the replay passes of all metrics itself as well
+    metric_names = profiling_data.get_metric_names()
+    get_command = lambda log_file_name: get_nvprof_metric_command(application, application_params, kernels_filter,
+                                                                  metric_names, profiling_data.collects_invocations(),
+                                                                  log_file_name)
+    with span("nvprof metric run"), resource_lock(get_gpu_resource()):
+        returncode = run_logged_command(get_command, get_metrics_file_name(application), parse_log, program_output,
+                                        log_mode)
+    check_profiler_exit(returncode, profiling_data_array, "nvprof metric run")
+
+
+def measure_execution_time(application, application_params, profiling_data_array, timing_settings, program_output,
+                           log_mode="file", environment=None, job_name=None):
+    trace = profiling_data_array[0].trace
+    backend = profiling_data_array[0].backend
+    if backend == "ncu":
+        kernels_filter = get_ncu_kernels_filter(profiling_data_array)
+        get_command = lambda log_file_name: get_ncu_execution_time_command(application, application_params,
+                                                                           kernels_filter, log_file_name)
+    else:
+        get_command = lambda log_file_name: get_nvprof_execution_time_command(application, application_params,
+                                                                              trace, log_file_name)
+    parse_log = lambda file_name: parse_execution_time_log(file_name, profiling_data_array)
+    if log_mode == "reuse":
+        # a reused log holds a single timing run
+        timing_settings = TimingSettings()
+
+    # timing runs of other jobs of the job server wait until this one is done, and the other way round
+    device = None
+    if environment is not None:
+        device = environment.get("CUDA_VISIBLE_DEVICES")
+
+    def measure():
+        with span("timing run", backend=backend), resource_lock(get_gpu_resource(device), exclusive=True):
+            returncode = run_logged_command(get_command, get_execution_time_file_name(application, job_name),
+                                            parse_log, program_output, log_mode, environment)
+        check_profiler_exit(returncode, profiling_data_array, "timing run")
+        times = []
+        for profiling_data in profiling_data_array:
+            times.append(profiling_data.total_execution_time)
+        return times
+
+    samples, statistics = measure_repeatedly(measure, timing_settings)
+    if timing_settings.is_repeated():
+        for profiling_data, kernel_statistics in zip(profiling_data_array, statistics):
+            print profiling_data.get_kernel_name() + " execution time statistics: " + str(kernel_statistics)
+            profiling_data.set_execution_time_statistics(kernel_statistics)
+
+
+def open_program_output(log_mode, file_name=None):
+    # outputs of the profiled application are kept in a file only when the logs are files as well
+    if file_name is None:
+        file_name = get_program_output_file_name()
+    if log_mode == "file":
+        return open(file_name, 'w')
+    return None
+
+
+def profile_application(application, application_params, kernel, mode, find_approximate_name, cache=None,
+                        levels=all_levels, timing_settings=TimingSettings(), trace=False, backend="nvprof",
+                        replay_mode="kernel", log_mode="file", sampling=None):
+
+    profiling_data = ProfilingDataGPU(application, mode, kernel, find_approximate_name, levels, trace, backend,
+                                      sampling)
 
     if not os.path.isfile(exec_data_path + application):
         raise ValueError("ERROR: application not found, aborting...")
 
-    nvprof_collect_metric_command = get_nvprof_metric_command(application, application_params, kernel,
-                                                              profiling_data.get_metric_names())
-    nvprof_measure_time_command = get_nvprof_execution_time_command(application, application_params)
+    if load_from_cache(profiling_data, application_params, cache, timing_settings):
+        return profiling_data
+
+    program_output = open_program_output(log_mode)
+    if sampling is not None:
+        # the timing run gives the number of invocations to sample from and to scale up to
+        measure_execution_time(application, application_params, [profiling_data], timing_settings, program_output,
+                               log_mode)
 
     # measure all required metrics
-    program_output = open(profiling_data_path + '/program_output.txt', 'w')
-    cmd = Popen(nvprof_collect_metric_command, shell=True, stdout=program_output)
-    cmd.wait()
+    kernels_filter = get_nvprof_kernels_filter([kernel])
+    if backend == "ncu":
+        kernels_filter = get_ncu_kernels_filter([profiling_data])
+    elif sampling is not None:
+        kernels_filter = get_nvprof_kernels_filter([kernel], get_sampled_invocations_regex([profiling_data]))
+    collect_metrics(application, application_params, kernels_filter, [profiling_data], program_output, replay_mode,
+                    log_mode)
 
     # measure execution time
-    cmd = Popen(nvprof_measure_time_command, shell=True, stdout=program_output)
-    cmd.wait()
-    program_output.close()
-
-    profiling_data.parse_metrics_file(profiling_data_path + "/" + application + "_" + metrics_file_name)
-    profiling_data.parse_execution_time_file(profiling_data_path + "/" + application + "_" + execution_times_file_name)
+    if sampling is None:
+        measure_execution_time(application, application_params, [profiling_data], timing_settings, program_output,
+                               log_mode)
+    else:
+        profiling_data.extrapolate_samples()
+    if program_output is not None:
+        program_output.close()
 
     print profiling_data.data
     print str(profiling_data.total_execution_time) + " sec"
 
+    save_to_cache(profiling_data, application_params, cache, timing_settings)
+
     return profiling_data
 
 
-def main():
-    parser = argparse.ArgumentParser(description='Collects data of GPU application for further roofline analysis.')
+def parse_metrics_file_for_kernels(file_name, profiling_data_array):
+    profiling_file = open_log(file_name)
+
+    active_data = []
+    for line in profiling_file:
+        if "Kernel: " in line:
+            active_data = []
+            for profiling_data in profiling_data_array:
+                if profiling_data.get_name_to_find_in_metrics_file() in line:
+                    print "found " + profiling_data.get_name_to_find_in_metrics_file() + " in line : " + line
+                    active_data.append(profiling_data)
+        for profiling_data in active_data:
+            profiling_data.process_metrics_line(line)
+    profiling_file.close()
+
+
+def parse_execution_time_file_for_kernels(file_name, profiling_data_array):
+    profiling_file = open_log(file_name)
+    for line in profiling_file:
+        for profiling_data in profiling_data_array:
+            profiling_data.process_execution_time_line(line)
+    profiling_file.close()
+
+
+def parse_metrics_trace_file_for_kernels(file_name, profiling_data_array):
+    for values in read_csv_trace(file_name):
+        for profiling_data in profiling_data_array:
+            if profiling_data.matches_trace_name(values.get("Name", "")):
+                profiling_data.process_trace_metrics_row(values)
+
+
+def parse_execution_time_trace_file_for_kernels(file_name, profiling_data_array):
+    for values in read_csv_trace(file_name):
+        if "Duration" not in values:
+            continue
+        for profiling_data in profiling_data_array:
+            if profiling_data.matches_trace_name(values.get("Name", "")):
+                profiling_data.process_trace_duration(values["Duration"])
+
+
+def parse_ncu_metrics_file_for_kernels(file_name, profiling_data_array):
+    metric_list = profiling_data_array[0].metrics
+    for kernel_name, ncu_values in read_ncu_csv(file_name):
+        values = get_nvprof_values(ncu_values, metric_list)
+        for profiling_data in profiling_data_array:
+            if profiling_data.matches_trace_name(kernel_name):
+                if profiling_data.collects_invocations():
+                    profiling_data.process_trace_metrics_row(values)
+                else:
+                    profiling_data.process_metrics_values(values)
+
+
+def parse_ncu_execution_time_file_for_kernels(file_name, profiling_data_array):
+    for kernel_name, ncu_values in read_ncu_csv(file_name):
+        if ncu_duration_metric not in ncu_values:
+            continue
+        for profiling_data in profiling_data_array:
+            if profiling_data.matches_trace_name(kernel_name):
+                if profiling_data.trace:
+                    profiling_data.process_trace_duration(ncu_values[ncu_duration_metric])
+                else:
+                    profiling_data.process_duration(ncu_values[ncu_duration_metric])
+
+
+def profile_application_kernels(application, application_params, kernels, mode, cache=None, levels=all_levels,
+                                timing_settings=TimingSettings(), trace=False, backend="nvprof", replay_mode="kernel",
+                                log_mode="file", sampling=None):
+    # kernels is a list of (kernel_name, find_approximate_name) pairs, all of them are profiled
+    # with a single metric run and a single timing run
+    profiling_data_array = []
+    for kernel_name, find_approximate_name in kernels:
+        profiling_data_array.append(ProfilingDataGPU(application, mode, kernel_name, find_approximate_name, levels,
+                                                     trace, backend, sampling))
+
+    if not os.path.isfile(exec_data_path + application):
+        raise ValueError("ERROR: application not found, aborting...")
+
+    # only kernels missing in the cache are profiled
+    missing_data_array = []
+    for profiling_data in profiling_data_array:
+        if not load_from_cache(profiling_data, application_params, cache, timing_settings):
+            missing_data_array.append(profiling_data)
+    if len(missing_data_array) == 0:
+        return profiling_data_array
+
+    kernel_names = []
+    for profiling_data in missing_data_array:
+        kernel_names.append(profiling_data.get_kernel_name())
 
+    program_output = open_program_output(log_mode)
+    if sampling is not None:
+        # the timing run gives the number of invocations to sample from and to scale up to
+        measure_execution_time(application, application_params, missing_data_array, timing_settings, program_output,
+                               log_mode)
+
+    # measure all required metrics
+    if is_sampled_per_kernel(missing_data_array):
+        for profiling_data in missing_data_array:
+            collect_metrics(application, application_params, get_ncu_kernels_filter([profiling_data]),
+                            [profiling_data], program_output, replay_mode, log_mode)
+    else:
+        if backend == "ncu":
+            kernels_filter = get_ncu_kernels_filter(missing_data_array)
+        elif sampling is not None:
+            kernels_filter = get_nvprof_kernels_filter(kernel_names, get_sampled_invocations_regex(missing_data_array))
+        else:
+            kernels_filter = get_nvprof_kernels_filter(kernel_names)
+        collect_metrics(application, application_params, kernels_filter, missing_data_array, program_output,
+                        replay_mode, log_mode)
+
+    # measure execution time
+    if sampling is None:
+        measure_execution_time(application, application_params, missing_data_array, timing_settings, program_output,
+                               log_mode)
+    else:
+        for profiling_data in missing_data_array:
+            profiling_data.extrapolate_samples()
+    if program_output is not None:
+        program_output.close()
+
+    for profiling_data in missing_data_array:
+        print profiling_data.data
+        print str(profiling_data.total_execution_time) + " sec"
+        save_to_cache(profiling_data, application_params, cache, timing_settings)
+
+    return profiling_data_array
+
+
+def get_kernels_filter(profiling_data_array):
+    profiling_data = profiling_data_array[0]
+    if profiling_data.backend == "ncu":
+        return get_ncu_kernels_filter(profiling_data_array)
+    invocations_regex = ""
+    if profiling_data.sampling is not None:
+        invocations_regex = get_sampled_invocations_regex(profiling_data_array)
+    kernel_names = []
+    for profiling_data in profiling_data_array:
+        kernel_names.append(profiling_data.get_kernel_name())
+    return get_nvprof_kernels_filter(kernel_names, invocations_regex)
+
+
+def get_device_job_name(kernel_pos, profiling_data_array, single_run):
+    # used in log file names, so only safe characters of kernel names are kept
+    if single_run:
+        return "kernels"
+    return str(kernel_pos) + "_" + re.sub(r"[^A-Za-z0-9_.-]", "_", profiling_data_array[0].get_kernel_name())
+
+
+def get_device_metric_jobs(application, application_params, units, unit_names, replay_mode="kernel",
+                           log_mode="file"):
+    # every unit (a kernel, or all kernels of a single run) gets a single metric job,
+    # returns a list of (job, log file name, unit), commands are built here, so they are printed in order
+    jobs = []
+    for unit, unit_name in zip(units, unit_names):
+        profiling_data = unit[0]
+        kernels_filter = get_kernels_filter(unit)
+        log_file_name = get_metrics_file_name(application, unit_name)
+        if profiling_data.backend == "ncu":
+            command = get_ncu_metric_command(application, application_params, kernels_filter,
+                                             profiling_data.get_ncu_metric_names(), replay_mode, log_file_name,
+                                             profiling_data.sampling)
+        else:
+            command = get_nvprof_metric_command(application, application_params, kernels_filter,
+                                                profiling_data.get_metric_names(),
+                                                profiling_data.collects_invocations(), log_file_name)
+        program_output_file_name = None
+        if log_mode == "file":
+            program_output_file_name = get_program_output_file_name(application, unit_name)
+        jobs.append((DeviceJob(unit_name, command, program_output_file_name), log_file_name, unit))
+    return jobs
+
+
+def measure_execution_time_on_device(application, application_params, units, unit_names, timing_settings,
+                                     timing_device, log_mode="file"):
+    # timing runs are not spread over devices, so the times of all kernels are comparable
+    for unit, unit_name in zip(units, unit_names):
+        program_output = open_program_output(log_mode,
+                                             get_program_output_file_name(application, unit_name + "_timing"))
+        with span("device timing run", device=timing_device):
+            measure_execution_time(application, application_params, unit, timing_settings, program_output, log_mode,
+                                   get_device_environment(timing_device), unit_name)
+        if program_output is not None:
+            program_output.close()
+
+
+def profile_application_kernels_on_devices(application, application_params, kernels, mode, devices,
+                                           timing_device=None, single_run=False, cache=None, levels=all_levels,
+                                           timing_settings=TimingSettings(), trace=False, backend="nvprof",
+                                           replay_mode="kernel", log_mode="file", sampling=None):
+    # metric runs of separate kernels are independent, so they are spread over devices
+    # with CUDA_VISIBLE_DEVICES, every run writes its own log, the logs are parsed in the order of the runs
+    # once all of them are done, so the results do not depend on which device finished first
+    if log_mode == "stream":
+        raise ValueError("ERROR: logs of device-parallel runs can not be streamed, use file or reuse log mode, "
+                         "aborting...")
+    if timing_device is None:
+        timing_device = devices[0]
+
+    profiling_data_array = []
+    for kernel_name, find_approximate_name in kernels:
+        profiling_data_array.append(ProfilingDataGPU(application, mode, kernel_name, find_approximate_name, levels,
+                                                     trace, backend, sampling))
+
+    if not os.path.isfile(exec_data_path + application):
+        raise ValueError("ERROR: application not found, aborting...")
+
+    if single_run and is_sampled_per_kernel(profiling_data_array):
+        # sampled ncu runs are done per kernel anyway
+        single_run = False
+
+    # only kernels missing in the cache are profiled
+    units = []
+    unit_names = []
+    missing_data_array = []
+    for kernel_pos in range(len(profiling_data_array)):
+        profiling_data = profiling_data_array[kernel_pos]
+        if not load_from_cache(profiling_data, application_params, cache, timing_settings):
+            missing_data_array.append(profiling_data)
+            if not single_run:
+                units.append([profiling_data])
+                unit_names.append(get_device_job_name(kernel_pos + 1, [profiling_data], False))
+    if len(missing_data_array) == 0:
+        return profiling_data_array
+    if single_run:
+        units.append(missing_data_array)
+        unit_names.append(get_device_job_name(1, missing_data_array, True))
+
+    if sampling is not None:
+        # the timing run gives the number of invocations to sample from and to scale up to
+        measure_execution_time_on_device(application, application_params, units, unit_names, timing_settings,
+                                         timing_device, log_mode)
+
+    # measure all required metrics
+    jobs = get_device_metric_jobs(application, application_params, units, unit_names, replay_mode, log_mode)
+    if log_mode != "reuse":
+        with span("device metric runs", devices=",".join(devices), jobs=len(jobs)):
+            run_device_jobs([job for job, log_file_name, unit in jobs], devices)
+            recorder.add_events([job.get_event() for job, log_file_name, unit in jobs])
+    for job, log_file_name, unit in jobs:
+        if log_mode != "reuse":
+            check_profiler_exit(job.returncode, unit, "metric run " + job.name)
+        parse_metrics_log(find_log(log_file_name), unit)
+
+    # measure execution time
+    if sampling is None:
+        measure_execution_time_on_device(application, application_params, units, unit_names, timing_settings,
+                                         timing_device, log_mode)
+    else:
+        for profiling_data in missing_data_array:
+            profiling_data.extrapolate_samples()
+
+    for profiling_data in missing_data_array:
+        print profiling_data.data
+        print str(profiling_data.total_execution_time) + " sec"
+        save_to_cache(profiling_data, application_params, cache, timing_settings)
+
+    return profiling_data_array
+
+
+def parse_kernels_list(kernels):
+    result = []
+    for kernel_name in kernels.split(","):
+        find_approximate_name = False
+        if "*" in kernel_name:
+            find_approximate_name = True
+            kernel_name = kernel_name.replace("*", "")
+        result.append((kernel_name, find_approximate_name))
+    return result
+
+
+def add_collector_arguments(parser):
+    # also used by the job client, which submits the same flags to the job server
     parser.add_argument('-m', '--mode',
                         action="store", dest="mode",
                         help="Set precision mode. \"DP\" for double precision, \"SP\" for single precision, \"int\" for integer based roofline",
@@ -265,39 +1083,208 @@ def main():
 
     parser.add_argument('-l', '--list', nargs='+', action="store", dest="app_params", help='Specify additional arguments, required for the profiled application')
 
+    parser.add_argument('-s', '--single-run',
+                        action="store_true", dest="single_run",
+                        help="Collect metrics of all kernels with a single metric run and a single timing run.")
+
+    parser.add_argument('--levels',
+                        action="store", dest="levels",
+                        help="Comma separated memory levels to analyse (L1,L2,DRAM,program), only metrics required by them are collected.",
+                        default=",".join(all_levels))
+
+    parser.add_argument('--no-cache',
+                        action="store_true", dest="no_cache",
+                        help="Do not use previously cached profiling results and do not cache new ones.")
+
+    parser.add_argument('--timing-runs',
+                        action="store", dest="timing_runs", type=int,
+                        help="Maximal number of timing runs, the median time of all runs is used.",
+                        default=1)
+
+    parser.add_argument('--timing-min-runs',
+                        action="store", dest="timing_min_runs", type=int,
+                        help="Number of timing runs done before checking whether the measurement is stable.",
+                        default=5)
+
+    parser.add_argument('--timing-warmup',
+                        action="store", dest="timing_warmup", type=int,
+                        help="Number of timing runs done before the measured ones.",
+                        default=0)
+
+    parser.add_argument('--timing-ci',
+                        action="store", dest="timing_ci", type=float,
+                        help="Timing runs stop once the 95%% confidence interval of the median is narrower than this fraction of it.",
+                        default=0.05)
+
+    parser.add_argument('--trace',
+                        action="store_true", dest="trace",
+                        help="Collect metrics and execution time of every kernel invocation and report their percentiles.")
+
+    parser.add_argument('--backend',
+                        action="store", dest="backend", choices=profiling_backends,
+                        help="Profiler used to collect metrics and time, ncu is required for Volta and newer GPUs.",
+                        default="nvprof")
+
+    parser.add_argument('--replay-mode',
+                        action="store", dest="replay_mode", choices=replay_modes,
+                        help="ncu only: replay single kernel launches or the whole application for every metric pass.",
+                        default="kernel")
+
+    parser.add_argument('--sample-warmup',
+                        action="store", dest="sample_warmup", type=int,
+                        help="Invocation sampling: number of invocations of every kernel skipped before the sampled ones. "
+                             "With ncu every kernel is sampled by a metric run of its own.",
+                        default=0)
+
+    parser.add_argument('--sample-count',
+                        action="store", dest="sample_count", type=int,
+                        help="Invocation sampling: number of invocations of every kernel profiled under metric collection, "
+                             "counters are scaled up to the invocation count of the timing run.")
+
+    parser.add_argument('--sample-stride',
+                        action="store", dest="sample_stride", type=int,
+                        help="Invocation sampling: profile every Nth invocation after the warmup ones (nvprof only).",
+                        default=1)
+
+    parser.add_argument('--log-mode',
+                        action="store", dest="log_mode", choices=log_modes,
+                        help="file: profiler logs are saved into " + profiling_data_path + ", stream: logs are parsed "
+                             "through FIFOs while the profiler runs, reuse: logs (also *.gz) of a previous run are "
+                             "parsed again without profiling.",
+                        default="file")
+
+    parser.add_argument('--devices',
+                        action="store", dest="devices",
+                        help="Comma separated CUDA_VISIBLE_DEVICES ids, metric runs of separate kernels are spread over "
+                             "these devices and run at the same time.")
+
+    parser.add_argument('--timing-device',
+                        action="store", dest="timing_device",
+                        help="With --devices: device of all timing runs, the first of the devices by default.")
+
+    parser.add_argument('--trace-out',
+                        action="store", dest="trace_out",
+                        help="Save the time spent in every collection stage as Chrome trace-event JSON with a specified name.")
+
+    parser.add_argument('--store',
+                        action="store", dest="store",
+                        help="Also save the results into the results store database with a specified name.")
+
+    parser.add_argument('-p', '--platform',
+                        action="store", dest="platform",
+                        help="Platform name saved with the results into the results store.",
+                        default="")
+
+    parser.add_argument('--dashboard',
+                        action="store", dest="dashboard",
+                        help="URL of a live dashboard (visualization.py --serve), points of every kernel are sent "
+                             "to it as soon as the kernel is profiled, $ROOFLINE_DASHBOARD by default.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collects data of GPU application for further roofline analysis.')
+    add_collector_arguments(parser)
     args = parser.parse_args()
 
     if not os.path.exists(profiling_data_path):
         os.makedirs(profiling_data_path)
 
     try:
-        kernels_list = words = args.kernels.split(",")
+        kernels_list = parse_kernels_list(args.kernels)
+        cache = None
+        if not args.no_cache:
+            cache = ProfilingCache()
+        levels = args.levels.split(",")
+        timing_settings = TimingSettings(args.timing_warmup, args.timing_min_runs, args.timing_runs, args.timing_ci)
+        sampling = None
+        if args.sample_count is not None or args.sample_stride > 1 or args.sample_warmup > 0:
+            sampling = SamplingSettings(args.sample_warmup, args.sample_count, args.sample_stride)
+
+        metric_list = get_metric_list(args.mode, levels)
+        if args.backend == "ncu":
+            print "collecting " + str(len(get_ncu_metric_list(metric_list))) + " ncu metrics with " + \
+                  args.replay_mode + " replay"
+        else:
+            # nvprof reports neither counter groups nor replay passes before a run, so no estimate is printed
+            print "collecting " + str(len(metric_list)) + " nvprof metrics (" + ", ".join(metric_list) + "), " \
+                  "nvprof schedules the replay passes itself"
         if args.app_params is None:
             args.app_params = []
 
-        result_file = open(args.target_app + "_profiling_results.txt", "w")
+        result_file_name = args.target_app + "_profiling_results.txt"
+        if args.metric_file != "none":
+            result_file_name = args.metric_file
+        result_file = open(result_file_name, "w")
         result_file.write("APP: %s " % args.target_app)
 
         for app_arg in args.app_params:
             result_file.write(" %s " % app_arg)
         result_file.write("\n")
         result_file.write("MODE: %s\n" % args.mode)
+        publisher = PointPublisher(get_dashboard_url(args.dashboard), args.target_app, args.mode)
 
-        kernel_pos = 1
-        for kernel_name in kernels_list:
-            find_approximate_name = False
-            if "*" in kernel_name:
-                find_approximate_name = True
-                kernel_name = kernel_name.replace("*", "")
-            result_file.write("KERNEL %d: %s \n" % (kernel_pos, kernel_name))
-            profiling_data = profile_application(args.target_app, args.app_params, kernel_name, args.mode,
-                                                 find_approximate_name)
-            kernel_pos += 1
+        if args.devices is not None:
+            devices = parse_device_list(args.devices)
+            with span("profile_application_kernels_on_devices", kernels=args.kernels):
+                profiling_data_array = profile_application_kernels_on_devices(args.target_app, args.app_params,
+                                                                              kernels_list, args.mode, devices,
+                                                                              args.timing_device, args.single_run,
+                                                                              cache, levels, timing_settings,
+                                                                              args.trace, args.backend,
+                                                                              args.replay_mode, args.log_mode,
+                                                                              sampling)
+            kernel_pos = 1
+            for profiling_data in profiling_data_array:
+                result_file.write("KERNEL %d: %s \n" % (kernel_pos, profiling_data.get_kernel_name()))
+                kernel_pos += 1
 
-            profiling_data.save_to_file(result_file)
+                profiling_data.save_to_file(result_file)
+                publisher.publish(profiling_data.get_kernel_name(), profiling_data.get_roofline_points())
+        elif args.single_run:
+            with span("profile_application_kernels", kernels=args.kernels):
+                profiling_data_array = profile_application_kernels(args.target_app, args.app_params, kernels_list,
+                                                                   args.mode, cache, levels, timing_settings,
+                                                                   args.trace, args.backend, args.replay_mode,
+                                                                   args.log_mode, sampling)
+            kernel_pos = 1
+            for profiling_data in profiling_data_array:
+                result_file.write("KERNEL %d: %s \n" % (kernel_pos, profiling_data.get_kernel_name()))
+                kernel_pos += 1
+
+                profiling_data.save_to_file(result_file)
+                publisher.publish(profiling_data.get_kernel_name(), profiling_data.get_roofline_points())
+        else:
+            profiling_data_array = []
+            kernel_pos = 1
+            for kernel_name, find_approximate_name in kernels_list:
+                result_file.write("KERNEL %d: %s \n" % (kernel_pos, kernel_name))
+                with span("profile_application", kernel=kernel_name):
+                    profiling_data = profile_application(args.target_app, args.app_params, kernel_name, args.mode,
+                                                         find_approximate_name, cache, levels, timing_settings,
+                                                         args.trace,
+                                                         args.backend, args.replay_mode, args.log_mode,
+                                                         sampling)
+                kernel_pos += 1
+
+                profiling_data.save_to_file(result_file)
+                publisher.publish(profiling_data.get_kernel_name(), profiling_data.get_roofline_points())
+                profiling_data_array.append(profiling_data)
 
         result_file.close()
 
+        if args.store is not None:
+            store = ResultsStore(args.store)
+            run_id = store.add_run(args.target_app, args.platform, args.mode,
+                                   metadata={"app_params": args.app_params, "collector": args.backend})
+            for profiling_data in profiling_data_array:
+                profiling_data.save_to_store(store, run_id)
+            store.commit()
+            store.close()
+
+        recorder.print_summary()
+        if args.trace_out is not None:
+            recorder.save_chrome_trace(args.trace_out)
+
     except Exception as e:
         print str(e)
         #clean_all()
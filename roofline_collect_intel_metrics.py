@@ -1,20 +1,174 @@
 #!/usr/bin/python
 
 from parse_cmd_file import read_cmd_file
-from paths import *
+from src.paths import *
 from subprocess import Popen, PIPE, call
+from multiprocessing import Pool, cpu_count
+from src.results_store import ResultsStore
+from src.timing_statistics import TimingSettings, measure_repeatedly
+from src.sde_hotspots import read_sde_hotspots
+from src.spans import span, recorder, get_file_size
+from src.log_streams import open_log, can_map_log, find_log, run_logged_command, log_modes
+from src.scaling_sweep import get_sweep_label, get_sweep_waves, get_sweep_environment
+from src.job_protocol import resource_lock, cpu_resource
+from src.live_points import PointPublisher, get_dashboard_url
+import os
+import mmap
+
+
+# counter name in the SDE mix table -> list of (ProfilingDataIntel.data field, weight), blocks of hotspots
+# are weighted by this table as well, vector instructions are weighted by their number of elements
+sde_counter_weights = {"mem-read-1": [("bytes_requested", 1)],
+                       "mem-read-2": [("bytes_requested", 2)],
+                       "mem-read-4": [("bytes_requested", 4)],
+                       "mem-read-8": [("bytes_requested", 8)],
+                       "mem-read-16": [("bytes_requested", 16)],
+                       "mem-read-32": [("bytes_requested", 32)],
+                       "mem-read-64": [("bytes_requested", 64)],
+                       "mem-write-1": [("bytes_requested", 1)],
+                       "mem-write-2": [("bytes_requested", 2)],
+                       "mem-write-4": [("bytes_requested", 4)],
+                       "mem-write-8": [("bytes_requested", 8)],
+                       "mem-write-16": [("bytes_requested", 16)],
+                       "mem-write-32": [("bytes_requested", 32)],
+                       "mem-write-64": [("bytes_requested", 64)],
+                       "elements_fp_single_1": [("float_instructions", 1)],
+                       "elements_fp_single_2": [("float_instructions", 2)],
+                       "elements_fp_single_4": [("float_instructions", 4)],
+                       "elements_fp_single_8": [("float_instructions", 8)],
+                       "elements_fp_single_16": [("float_instructions", 16)],
+                       "elements_fp_double_1": [("double_instructions", 1)],
+                       "elements_fp_double_2": [("double_instructions", 2)],
+                       "elements_fp_double_4": [("double_instructions", 4)],
+                       "elements_fp_double_8": [("double_instructions", 8)],
+                       "isa-ext-BASE": [("integer_instructions", 1),
+                                        ("float_instructions", 1)]}
+
+# perf event -> list of (ProfilingDataIntel.data field, weight), FP_ARITH_INST_RETIRED events are weighted
+# by the number of elements in a vector, uncore IMC CAS counts are converted to bytes (DRAM traffic, not
+# the bytes requested by instructions as counted by SDE)
+perf_event_weights = {"fp_arith_inst_retired.scalar_single": [("float_instructions", 1)],
+                      "fp_arith_inst_retired.128b_packed_single": [("float_instructions", 4)],
+                      "fp_arith_inst_retired.256b_packed_single": [("float_instructions", 8)],
+                      "fp_arith_inst_retired.512b_packed_single": [("float_instructions", 16)],
+                      "fp_arith_inst_retired.scalar_double": [("double_instructions", 1)],
+                      "fp_arith_inst_retired.128b_packed_double": [("double_instructions", 2)],
+                      "fp_arith_inst_retired.256b_packed_double": [("double_instructions", 4)],
+                      "fp_arith_inst_retired.512b_packed_double": [("double_instructions", 8)],
+                      "uncore_imc/cas_count_read/": [("bytes_requested", 1)],
+                      "uncore_imc/cas_count_write/": [("bytes_requested", 1)]}
+
+perf_byte_units = {"B": 1.0,
+                   "KiB": 1024.0,
+                   "MiB": 1024.0 * 1024.0,
+                   "GiB": 1024.0 * 1024.0 * 1024.0}
+
+# bytes transferred by a single CAS command, used when perf reports raw IMC counts
+cas_count_bytes = 64
+
+profiling_backends = ["sde", "perf"]
+
+sde_global_table_start = "$global-dynamic-counts"
+sde_global_table_end = "# END_GLOBAL_DYNAMIC_STATS"
+
+
+def parse_sde_counters_lines(lines):
+    counters = {}
+    for line in lines:
+        if line.startswith(sde_global_table_end):
+            break
+        tokens = line.split()
+        if len(tokens) < 2 or tokens[0].startswith("#"):
+            continue
+        if tokens[0].startswith("$"):  # next table has started
+            break
+        try:
+            counter_value = float(tokens[1])
+        except ValueError:
+            continue
+        counter_name = tokens[0].lstrip("*")
+        counters[counter_name] = counters.get(counter_name, 0) + counter_value
+    return counters
+
+
+def read_sde_global_counters(file_name, use_mmap=True):
+    # only the global table is read, everything before it is skipped and the parsing stops at its end
+    profiling_file = open_log(file_name)
+    try:
+        if use_mmap and can_map_log(file_name):
+            mapped_file = mmap.mmap(profiling_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                table_pos = mapped_file.find(sde_global_table_start)
+                if table_pos < 0:
+                    return {}
+                mapped_file.seek(table_pos)
+                mapped_file.readline()
+                return parse_sde_counters_lines(iter(mapped_file.readline, ""))
+            finally:
+                mapped_file.close()
+        for line in profiling_file:
+            if sde_global_table_start in line:
+                return parse_sde_counters_lines(profiling_file)
+        return {}
+    finally:
+        profiling_file.close()
+
+
+def parse_perf_counters_lines(lines):
+    # parses the output of perf stat -x, (value,unit,event,...), unsupported events are skipped
+    counters = {}
+    for line in lines:
+        if line.startswith("#") or line.strip() == "":
+            continue
+        fields = line.strip().split(",")
+        if len(fields) < 3:
+            continue
+        try:
+            counter_value = float(fields[0])
+        except ValueError:
+            continue
+        unit = fields[1]
+        event_name = fields[2].split(":")[0]
+        if unit in perf_byte_units:
+            counter_value *= perf_byte_units[unit]
+        elif event_name.startswith("uncore_imc/cas_count"):
+            counter_value *= cas_count_bytes
+        counters[event_name] = counters.get(event_name, 0) + counter_value
+    return counters
+
+
+def read_perf_counters(file_name):
+    perf_file = open_log(file_name)
+    counters = parse_perf_counters_lines(perf_file)
+    perf_file.close()
+    return counters
 
 
 class ProfilingDataIntel:
-    def __init__(self, name, arch):
+    def __init__(self, name, arch, output_path=profiling_data_path, backend="sde", hotspots_top_k=None,
+                 log_mode="file", environment=None):
         self.data = {"integer_instructions": 0,
                      "float_instructions": 0,
                      "double_instructions": 0,
                      "bytes_requested": 0}
 
         self.total_execution_time = 0.0
+        self.execution_time_statistics = None
         self.name = name
         self.arch = arch
+        self.output_path = output_path
+        self.counters = {}
+        if backend not in profiling_backends:
+            raise ValueError("ERROR: unknown profiling backend " + str(backend) + ", aborting...")
+        self.backend = backend
+        # hot basic blocks and marked regions are parsed from the SDE output only when requested
+        self.hotspots_top_k = hotspots_top_k
+        self.hotspots = []
+        if log_mode not in log_modes:
+            raise ValueError("ERROR: unknown log mode " + str(log_mode) + ", aborting...")
+        self.log_mode = log_mode
+        # environment of the profiled runs (thread count and affinity in scaling sweeps), inherited when None
+        self.environment = environment
 
     def get_ops_per_byte(self):
         ops_executed = self.data["float_instructions"]
@@ -24,123 +178,440 @@ class ProfilingDataIntel:
     def get_ops(self):
         return self.data["float_instructions"] / self.total_execution_time
 
-    def get_sde_command(self, application):
+    def get_ops_ci(self):
+        # the shortest time gives the highest performance
+        return (self.data["float_instructions"] / self.execution_time_statistics["ci_high"],
+                self.data["float_instructions"] / self.execution_time_statistics["ci_low"])
+
+    def get_sde_command(self, application, log_file_name=None):
+        if log_file_name is None:
+            log_file_name = self.output_path + "sde.out"
         result = ""
         result += software_path + "sde64 "
         result += " -" + self.arch + " "
         result += " -iform 1 -omix "
-        result +=  profiling_data_path + "sde.out "
+        result += log_file_name + " "
         result += " -top_blocks 5000 -start_ssc_mark 111:repeat -stop_ssc_mark 222:repeat -- "
         result += exec_data_path + application
         print result
         return result
 
-    def process_metrics_line(self, line, metric_name):
-        if str(metric_name) in line:
-            metric_value = float(line.split()[1])
-            return metric_value
-        else:
-            return 0
-
-    def parse_sde_output(self, file_name):
-        profiling_file = open(file_name, 'r')
-        found_final_table = False
-        for line in profiling_file:
-            if "$global-dynamic-counts" in line:
-                found_final_table = True
-
-            if found_final_table is False:
-                continue
-
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-read-1") * 1
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-read-2") * 2
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-read-4") * 4
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-read-8") * 8
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-read-16") * 16
-
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-write-1") * 1
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-write-2") * 2
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-write-4") * 4
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-write-8") * 8
-            self.data["bytes_requested"] += self.process_metrics_line(line, "mem-write-16") * 16
-
-            self.data["float_instructions"] += self.process_metrics_line(line, "elements_fp_single_1")
-            self.data["double_instructions"] += self.process_metrics_line(line, "elements_fp_double_1")
-
-            '''self.data["integer_instructions"] += self.process_metrics_line(line, "elements_i1_128")
-            self.data["integer_instructions"] += self.process_metrics_line(line, "elements_i8_16")
-            self.data["integer_instructions"] += self.process_metrics_line(line, "elements_i32_1")
-            self.data["integer_instructions"] += self.process_metrics_line(line, "elements_i32_4")
-            self.data["integer_instructions"] += self.process_metrics_line(line, "elements_i128_1")'''
+    def get_perf_command(self, application, log_file_name=None):
+        # without a log file perf prints the counters to stderr
+        result = ""
+        result += perf_path + " stat -x, "
+        if log_file_name is not None:
+            result += " -o " + log_file_name + " "
+        result += " -e " + ",".join(sorted(perf_event_weights.keys())) + " -- "
+        result += exec_data_path + application
+        print result
+        return result
 
-            self.data["integer_instructions"] += self.process_metrics_line(line, "isa-ext-BASE")
-            self.data["float_instructions"] += self.process_metrics_line(line, "isa-ext-BASE")
+    def process_counters(self, counters, counter_weights):
+        for counter_name, counter_value in counters.iteritems():
+            if counter_name in counter_weights:
+                for field_name, weight in counter_weights[counter_name]:
+                    self.data[field_name] += counter_value * weight
+
+    def parse_sde_output(self, file_name, use_mmap=True):
+        if self.hotspots_top_k is not None:
+            # global counters and hotspots are read by the same pass
+            self.counters = {}
+            self.hotspots = read_sde_hotspots(file_name, sde_counter_weights, self.hotspots_top_k, use_mmap,
+                                              global_counters=self.counters)
+        else:
+            self.counters = read_sde_global_counters(file_name, use_mmap)
+        self.process_counters(self.counters, sde_counter_weights)
 
         print "int: " + str(self.data["integer_instructions"]) + "\n"
         print "flt: " + str(self.data["float_instructions"]) + "\n"
         print "mem: " + str(self.data["bytes_requested"]) + "\n"
-        profiling_file.close()
 
-    def parse_prog_output(self, file_name):
-        profiling_file = open(file_name, 'r')
-        found_final_table = False
-        for line in profiling_file:
+    def parse_prog_output_lines(self, lines):
+        for line in lines:
             if "ROOFLINE TIME:" in line:
                 self.total_execution_time = float(line.split(" ")[2])
 
+    def parse_prog_output(self, file_name):
+        profiling_file = open_log(file_name)
+        self.parse_prog_output_lines(profiling_file)
         profiling_file.close()
 
+    def parse_sde_output_span(self, file_name):
+        with span("parse sde output", command=self.name) as parse_span:
+            parse_span.add_bytes(get_file_size(file_name))
+            self.parse_sde_output(file_name)
+
+    def get_hotspot_results(self):
+        # there is no time per block or region, so the execution time is split by dynamic instruction count
+        total_icount = self.counters.get("total", 0)
+        if total_icount == 0:
+            total_icount = sum(hotspot.icount for hotspot in self.hotspots)
+
+        results = []
+        for hotspot in self.hotspots:
+            if total_icount == 0 or hotspot.icount == 0:
+                continue
+            execution_time = self.total_execution_time * hotspot.icount / total_icount
+            results.append({"name": hotspot.name,
+                            "kind": hotspot.kind,
+                            "icount": hotspot.icount,
+                            "ops_per_byte": hotspot.get_ops_per_byte(),
+                            "ops": hotspot.get_ops() / execution_time,
+                            "execution_time": execution_time,
+                            "counters": dict(hotspot.counters, **hotspot.data)})
+        return results
+
     def collect_instructions_count(self, application):
         print "measuring metrics"
-        sde_command = self.get_sde_command(application)
-
-        # measure all required metrics
-        program_output = open(profiling_data_path + '/sde.txt', 'w')
-        cmd = Popen(sde_command, shell=True, stdout=program_output)
-        cmd.wait()
-        self.parse_sde_output("./tmp/sde.out")
 
-    def collect_execution_time(self, application):
+        # measure all required metrics, the SDE output is parsed after the run or streamed into the parser
+        program_output = None
+        if self.log_mode == "file":
+            program_output = open(self.output_path + 'sde.txt', 'w')
+        with span("sde run", command=self.name), resource_lock(cpu_resource):
+            run_logged_command(lambda log_file_name: self.get_sde_command(application, log_file_name),
+                               self.output_path + "sde.out", self.parse_sde_output_span, program_output,
+                               self.log_mode, self.environment)
+        if program_output is not None:
+            program_output.close()
+
+    def measure_execution_time(self, application):
         print "measuring time " + exec_data_path + application
-        program_output = open(profiling_data_path + '/sde.txt', 'w')
-        cmd = Popen(exec_data_path + application, shell=True, stdout=program_output)
-        cmd.wait()
-        self.parse_prog_output("./tmp/sde.txt")
-
-    def collect_data(self, profiling_command):
+        if self.log_mode == "reuse":
+            self.parse_prog_output(find_log(self.output_path + "program_output.txt"))
+            return [self.total_execution_time]
+        if self.log_mode == "stream":
+            # the program output is parsed from a pipe while the program runs
+            with span("timing run", command=self.name), resource_lock(cpu_resource, exclusive=True):
+                cmd = Popen(exec_data_path + application, shell=True, stdout=PIPE, env=self.environment)
+                self.parse_prog_output_lines(iter(cmd.stdout.readline, ""))
+                cmd.wait()
+            return [self.total_execution_time]
+        program_output = open(self.output_path + 'program_output.txt', 'w')
+        with span("timing run", command=self.name), resource_lock(cpu_resource, exclusive=True):
+            cmd = Popen(exec_data_path + application, shell=True, stdout=program_output, env=self.environment)
+            cmd.wait()
+        program_output.close()
+        with span("parse program output", command=self.name) as parse_span:
+            parse_span.add_bytes(get_file_size(self.output_path + "program_output.txt"))
+            self.parse_prog_output(self.output_path + "program_output.txt")
+        return [self.total_execution_time]
+
+    def collect_execution_time(self, application, timing_settings=TimingSettings()):
+        samples, statistics = measure_repeatedly(lambda: self.measure_execution_time(application), timing_settings)
+        if timing_settings.is_repeated():
+            # the median of repeated runs is used as the execution time
+            print "execution time statistics: " + str(statistics[0])
+            self.execution_time_statistics = statistics[0]
+            self.total_execution_time = statistics[0]["median"]
+
+    def measure_perf_run(self, application):
+        # hardware counters and execution time are collected by the same native run
+        print "measuring hardware counters and time " + exec_data_path + application
+        for key in self.data:
+            self.data[key] = 0
+        if self.log_mode == "stream":
+            # perf prints the counters to stderr at exit, both outputs are read from pipes
+            with span("perf run", command=self.name), resource_lock(cpu_resource, exclusive=True):
+                cmd = Popen(self.get_perf_command(application), shell=True, stdout=PIPE, stderr=PIPE,
+                            env=self.environment)
+                program_output, perf_output = cmd.communicate()
+            with span("parse perf output", command=self.name) as parse_span:
+                parse_span.add_bytes(len(program_output) + len(perf_output))
+                self.parse_prog_output_lines(program_output.splitlines())
+                self.counters = parse_perf_counters_lines(perf_output.splitlines())
+                self.process_counters(self.counters, perf_event_weights)
+            return [self.total_execution_time]
+
+        if self.log_mode == "file":
+            program_output = open(self.output_path + 'program_output.txt', 'w')
+            with span("perf run", command=self.name), resource_lock(cpu_resource, exclusive=True):
+                cmd = Popen(self.get_perf_command(application, self.output_path + "perf.txt"), shell=True,
+                            stdout=program_output, env=self.environment)
+                cmd.wait()
+            program_output.close()
+        with span("parse perf output", command=self.name) as parse_span:
+            parse_span.add_bytes(get_file_size(self.output_path + "program_output.txt") +
+                                 get_file_size(self.output_path + "perf.txt"))
+            self.parse_prog_output(find_log(self.output_path + "program_output.txt"))
+            self.counters = read_perf_counters(find_log(self.output_path + "perf.txt"))
+            self.process_counters(self.counters, perf_event_weights)
+        return [self.total_execution_time]
+
+    def collect_perf_data(self, application, timing_settings=TimingSettings()):
+        samples, statistics = measure_repeatedly(lambda: self.measure_perf_run(application), timing_settings)
+        if timing_settings.is_repeated():
+            print "execution time statistics: " + str(statistics[0])
+            self.execution_time_statistics = statistics[0]
+            self.total_execution_time = statistics[0]["median"]
+
+    def collect_data(self, profiling_command, timing_settings=TimingSettings()):
+        if self.backend == "perf":
+            self.collect_perf_data(profiling_command["application"], timing_settings)
+            return
         self.collect_instructions_count(profiling_command["application"])
-        self.collect_execution_time(profiling_command["application"])
+        self.collect_execution_time(profiling_command["application"], timing_settings)
 
 
-def profile_application(profiling_command, arch):
-    profiler = ProfilingDataIntel(profiling_command['name'], arch)
-    profiler.collect_data(profiling_command)
+def get_command_output_path(profiling_command, pos):
+    # every command file entry gets its own directory, so concurrent SDE runs do not overwrite each other
+    output_path = profiling_data_path + str(pos) + "_" + profiling_command["name"] + "/"
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+    return output_path
 
+
+def get_profiling_result(profiler):
     print profiler.data
 
-    return {"name": profiling_command["name"],
-            "ops_per_byte": profiler.get_ops_per_byte(),
-            "ops": profiler.get_ops()
+    counters = dict(profiler.counters)
+    counters.update(profiler.data)
+    result = {"name": profiler.name,
+              "ops_per_byte": profiler.get_ops_per_byte(),
+              "ops": profiler.get_ops(),
+              "execution_time": profiler.total_execution_time,
+              "counters": counters
     }
+    if profiler.execution_time_statistics is not None:
+        result["ops_low"], result["ops_high"] = profiler.get_ops_ci()
+    if profiler.hotspots:
+        result["hotspots"] = profiler.get_hotspot_results()
+    return result
+
+
+def profile_application(profiling_command, arch, pos=0, timing_settings=TimingSettings(), backend="sde",
+                        hotspots_top_k=None, log_mode="file"):
+    profiler = ProfilingDataIntel(profiling_command['name'], arch, get_command_output_path(profiling_command, pos),
+                                  backend, hotspots_top_k, log_mode)
+    profiler.collect_data(profiling_command, timing_settings)
+
+    return get_profiling_result(profiler)
+
+
+def collect_instructions_count_job(job):
+    profiling_command, arch, output_path, hotspots_top_k, log_mode = job
+    # a forked worker holds the events of its parent and of its earlier jobs, only the events of this job
+    # are merged into the trace of the parent
+    first_event = len(recorder.events)
+    profiler = ProfilingDataIntel(profiling_command['name'], arch, output_path, hotspots_top_k=hotspots_top_k,
+                                  log_mode=log_mode)
+    profiler.collect_instructions_count(profiling_command["application"])
+    return profiler, recorder.take_events(first_event)
+
+
+def profile_applications_parallel(profiling_cmd, arch, jobs_count, timing_settings=TimingSettings(),
+                                  hotspots_top_k=None, log_mode="file", publisher=None):
+    jobs = []
+    pos = 0
+    for cmd in profiling_cmd:
+        jobs.append((cmd, arch, get_command_output_path(cmd, pos), hotspots_top_k, log_mode))
+        pos += 1
+
+    # SDE instrumentation is single threaded and slow, so these passes are spread over a process pool,
+    # map keeps the results in command file order
+    pool = Pool(jobs_count)
+    try:
+        with span("sde pool", jobs=jobs_count):
+            results = pool.map(collect_instructions_count_job, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    profilers = []
+    for profiler, events in results:
+        profilers.append(profiler)
+        recorder.add_events(events)
+
+    # native timing runs are done one by one after all SDE runs, so they do not interfere with each other
+    profiling_data_array = []
+    for profiler, cmd in zip(profilers, profiling_cmd):
+        with span("profile_application", command=cmd["name"]):
+            profiler.collect_execution_time(cmd["application"], timing_settings)
+        profiling_data_array.append(get_profiling_result(profiler))
+        if publisher is not None:
+            publish_profiling_data(publisher, profiling_data_array[-1])
+    return profiling_data_array
+
+
+def collect_sweep_point_job(job):
+    # stage is "counts" (SDE pass), "time" (native timing runs) or "all" (everything the backend collects)
+    profiler, profiling_command, stage, timing_settings = job
+    first_event = len(recorder.events)
+    with span("sweep point " + stage, command=profiling_command["name"], threads=profiling_command["threads"]):
+        if stage == "counts":
+            profiler.collect_instructions_count(profiling_command["application"])
+        elif stage == "time":
+            profiler.collect_execution_time(profiling_command["application"], timing_settings)
+        else:
+            profiler.collect_data(profiling_command, timing_settings)
+    return profiler, recorder.take_events(first_event)
+
+
+def run_sweep_waves(profilers, sweep_cmd, waves, stage, timing_settings, concurrent):
+    # points of a wave run on disjoint cores, so they are run at the same time when concurrent is set
+    for wave in waves:
+        jobs = []
+        for pos, first_core in wave:
+            jobs.append((profilers[pos], sweep_cmd[pos], stage, timing_settings))
+        if concurrent and len(jobs) > 1:
+            pool = Pool(len(jobs))
+            try:
+                results = pool.map(collect_sweep_point_job, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [collect_sweep_point_job(job) for job in jobs]
+        for (pos, first_core), (profiler, events) in zip(wave, results):
+            profilers[pos] = profiler
+            recorder.add_events(events)
+
+
+def profile_scaling_sweep(profiling_cmd, arch, thread_counts, cores=None, timing_settings=TimingSettings(),
+                          backend="sde", hotspots_top_k=None, log_mode="file", affinity="close",
+                          concurrent_timing=False):
+    # every command is profiled at every thread count, threads are bound to their own cores,
+    # SDE passes of points which fit onto disjoint cores run at the same time, native runs (timing and perf)
+    # only when concurrent_timing is set, since they share caches and memory bandwidth
+    if cores is None:
+        cores = cpu_count()
+    sweep_cmd = []
+    for cmd in profiling_cmd:
+        for threads in thread_counts:
+            sweep_cmd.append(dict(cmd, threads=threads))
+    waves = get_sweep_waves([cmd["threads"] for cmd in sweep_cmd], cores)
+
+    profilers = [None] * len(sweep_cmd)
+    for wave in waves:
+        for pos, first_core in wave:
+            cmd = sweep_cmd[pos]
+            environment = get_sweep_environment(os.environ, cmd["threads"], first_core, cores, affinity)
+            output_path = get_command_output_path(dict(cmd, name=cmd["name"] + "_" + str(cmd["threads"]) + "t"), pos)
+            profilers[pos] = ProfilingDataIntel(cmd["name"], arch, output_path, backend, hotspots_top_k, log_mode,
+                                                environment)
+
+    if backend == "sde":
+        run_sweep_waves(profilers, sweep_cmd, waves, "counts", timing_settings, True)
+        run_sweep_waves(profilers, sweep_cmd, waves, "time", timing_settings, concurrent_timing)
+    else:
+        run_sweep_waves(profilers, sweep_cmd, waves, "all", timing_settings, concurrent_timing)
+
+    profiling_data_array = []
+    for profiler, cmd in zip(profilers, sweep_cmd):
+        result = get_profiling_result(profiler)
+        result["threads"] = cmd["threads"]
+        profiling_data_array.append(result)
+    return profiling_data_array
+
+
+def get_profiling_data_label(profiling_data):
+    return get_sweep_label(profiling_data["name"], profiling_data.get("threads"))
+
+
+def get_hotspot_label(profiling_data, hotspot):
+    return get_sweep_label(profiling_data["name"] + ": " + hotspot["name"], profiling_data.get("threads"))
 
 
 def save_profiling_data_to_file(file_name, profiling_data_array):
     file = open(file_name, "w")
 
     for profiling_data in profiling_data_array:
-        file.write(profiling_data["name"] + "|" + str(profiling_data["ops_per_byte"]) + "|" + str(float(profiling_data["ops"]) / (pow(10.0, 9))) + "\n")
+        file.write(get_profiling_data_label(profiling_data) + "|" + str(profiling_data["ops_per_byte"]) + "|" + str(float(profiling_data["ops"]) / (pow(10.0, 9))))
+        if "ops_low" in profiling_data:
+            file.write("|" + str(float(profiling_data["ops_low"]) / (pow(10.0, 9))) + "|" + str(float(profiling_data["ops_high"]) / (pow(10.0, 9))))
+        file.write("\n")
+        for hotspot in profiling_data.get("hotspots", []):
+            file.write(get_hotspot_label(profiling_data, hotspot) + "|" + str(hotspot["ops_per_byte"]) + "|" + str(float(hotspot["ops"]) / (pow(10.0, 9))) + "\n")
 
     file.close()
 
 
-def run_intel_analysis(input_file_name, output_file_name, arch):
+def get_profiling_data_points(profiling_data):
+    # [(label, execution time, counters, points)] of a command and its hotspots, points are in the format
+    # of ResultsStore.add_kernel
+    point = {"level": "L1",
+             "memory_roof": "L1",
+             "label": get_profiling_data_label(profiling_data),
+             "ai": profiling_data["ops_per_byte"],
+             "gops": float(profiling_data["ops"]) / (pow(10.0, 9))}
+    if "ops_low" in profiling_data:
+        point["gops_low"] = float(profiling_data["ops_low"]) / (pow(10.0, 9))
+        point["gops_high"] = float(profiling_data["ops_high"]) / (pow(10.0, 9))
+    kernels = [(get_profiling_data_label(profiling_data), profiling_data["execution_time"],
+                profiling_data["counters"], [point])]
+    for hotspot in profiling_data.get("hotspots", []):
+        hotspot_label = get_hotspot_label(profiling_data, hotspot)
+        hotspot_point = {"level": "L1",
+                         "memory_roof": "L1",
+                         "label": hotspot_label,
+                         "ai": hotspot["ops_per_byte"],
+                         "gops": float(hotspot["ops"]) / (pow(10.0, 9))}
+        kernels.append((hotspot_label, hotspot["execution_time"], hotspot["counters"], [hotspot_point]))
+    return kernels
+
+
+def save_profiling_data_to_store(store_path, app, arch, profiling_data_array, backend="sde", metadata=None):
+    # ProfilingDataIntel counts single precision float instructions as operations
+    store = ResultsStore(store_path)
+    run_id = store.add_run(app, arch, "sp", metadata=dict(metadata or {}, collector=backend))
+    for profiling_data in profiling_data_array:
+        for label, execution_time, counters, points in get_profiling_data_points(profiling_data):
+            store.add_kernel(run_id, label, execution_time, counters, points)
+    store.commit()
+    store.close()
+
+
+def publish_profiling_data(publisher, profiling_data):
+    for label, execution_time, counters, points in get_profiling_data_points(profiling_data):
+        publisher.publish(label, points)
+
+
+def run_intel_analysis(input_file_name, output_file_name, arch, jobs_count=None, store_path=None,
+                       timing_settings=TimingSettings(), backend="sde", hotspots_top_k=None, trace_out_file_name=None,
+                       log_mode="file", thread_counts=None, cores=None, affinity="close", concurrent_timing=False,
+                       dashboard_url=None):
+    # backend is "sde" for exact instruction counts or "perf" for quick hardware counter numbers,
+    # hotspots_top_k adds points for the hottest SDE basic blocks and marked regions,
+    # log_mode is "file", "stream" (outputs are parsed from FIFOs and pipes) or "reuse" (outputs of a previous
+    # run, also gzip compressed, are parsed again),
+    # thread_counts (a list) turns on the scaling sweep: every command is run with OMP_NUM_THREADS set to each
+    # of them on cores of its own (cores is the number of cores to use, all by default), affinity is the
+    # OMP_PROC_BIND policy, points are sent to the live dashboard at dashboard_url ($ROOFLINE_DASHBOARD by default)
+    # as soon as they are collected
     profiling_cmd = read_cmd_file(input_file_name)
-
-    profiling_data_array = []
-
-    pos = 0
-    for cmd in profiling_cmd:
-        profiling_data_array.append(profile_application(cmd, arch))
-        pos += 1
+    publisher = PointPublisher(get_dashboard_url(dashboard_url), os.path.splitext(output_file_name)[0], "sp")
+
+    if jobs_count is None:
+        jobs_count = cpu_count()
+
+    metadata = {}
+    if thread_counts is not None:
+        metadata = {"thread_counts": thread_counts, "affinity": affinity}
+        profiling_data_array = profile_scaling_sweep(profiling_cmd, arch, thread_counts, cores, timing_settings,
+                                                     backend, hotspots_top_k, log_mode, affinity, concurrent_timing)
+        for profiling_data in profiling_data_array:
+            publish_profiling_data(publisher, profiling_data)
+    # perf runs natively and measures time, so these runs are never done concurrently
+    elif jobs_count > 1 and backend == "sde":
+        profiling_data_array = profile_applications_parallel(profiling_cmd, arch, jobs_count, timing_settings,
+                                                             hotspots_top_k, log_mode, publisher)
+    else:
+        profiling_data_array = []
+
+        pos = 0
+        for cmd in profiling_cmd:
+            with span("profile_application", command=cmd["name"]):
+                profiling_data_array.append(profile_application(cmd, arch, pos, timing_settings, backend,
+                                                                hotspots_top_k, log_mode))
+            publish_profiling_data(publisher, profiling_data_array[-1])
+            pos += 1
 
     save_profiling_data_to_file(profiling_data_path + output_file_name, profiling_data_array)
+    if store_path is not None:
+        save_profiling_data_to_store(store_path, os.path.splitext(output_file_name)[0], arch, profiling_data_array,
+                                     backend, metadata)
+
+    # time spent in every stage, also saved as Chrome trace-event JSON when trace_out_file_name is set
+    recorder.print_summary()
+    if trace_out_file_name is not None:
+        recorder.save_chrome_trace(trace_out_file_name)
@@ -0,0 +1,172 @@
+#!/usr/bin/python
+
+import argparse
+import os
+import socket
+import sys
+
+from src.paths import *
+from src.job_protocol import connect, send_message, read_messages, send_request, get_default_socket_path
+from src.scaling_sweep import parse_thread_counts
+from roofline_collect_gpu_metrics import add_collector_arguments
+
+
+def get_gpu_job_request(args, collector_args):
+    results_file = None
+    if args.metric_file != "none":
+        results_file = os.path.abspath(args.metric_file)
+    return {"command": "submit",
+            "kind": "gpu",
+            "args": collector_args,
+            "app": args.target_app,
+            "results_file": results_file}
+
+
+def get_intel_job_request(args):
+    thread_counts = None
+    if args.threads is not None:
+        thread_counts = parse_thread_counts(args.threads)
+    return {"command": "submit",
+            "kind": "intel",
+            "args": {"input_file_name": args.input_file,
+                     "output_file_name": args.output_file,
+                     "arch": args.arch,
+                     "jobs_count": args.jobs,
+                     "store_path": args.store,
+                     "timing_settings": [args.timing_warmup, args.timing_min_runs, args.timing_runs, args.timing_ci],
+                     "backend": args.backend,
+                     "hotspots_top_k": args.hotspots,
+                     "log_mode": args.log_mode,
+                     "thread_counts": thread_counts,
+                     "cores": args.cores,
+                     "affinity": args.affinity}}
+
+
+def print_job(job):
+    print("job %s: %s, %s, priority %d, restarts %d" % (str(job["id"]), job["kind"], job["state"], job["priority"],
+                                                        job["restarts"]))
+
+
+def print_results(results):
+    for kernel, points in results["kernels"]:
+        for point in points:
+            print("%s (%s): AI %f, GOPS %f" % (kernel, point["level"], point["ai"], point["gops"]))
+
+
+def watch_job(socket_path, job_id, quiet=False):
+    # prints the output of the collector and its parsed results, returns the final state of the job
+    connection = connect(socket_path)
+    state = None
+    try:
+        send_message(connection, {"command": "watch", "job": job_id})
+        for message in read_messages(connection):
+            if "error" in message:
+                raise ValueError(message["error"])
+            if message["event"] == "output" and not quiet:
+                print(message["line"])
+            elif message["event"] == "results":
+                print_results(message["results"])
+            elif message["event"] == "state":
+                state = message["job"]["state"]
+                print_job(message["job"])
+    finally:
+        connection.close()
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Submits profiling jobs to the job server and follows them.')
+
+    parser.add_argument('--socket',
+                        action="store", dest="socket",
+                        help="Unix socket of the job server, the default one is relative to the directory the "
+                             "server was started in.",
+                        default=get_default_socket_path())
+
+    parser.add_argument('--priority',
+                        action="store", dest="priority", type=int,
+                        help="Jobs with a higher priority are started and get devices first.",
+                        default=0)
+
+    parser.add_argument('--no-wait',
+                        action="store_true", dest="no_wait",
+                        help="Only submit the job, do not follow its output.")
+
+    parser.add_argument('-q', '--quiet',
+                        action="store_true", dest="quiet",
+                        help="Do not print the output of the collector, only job states and results.")
+
+    subparsers = parser.add_subparsers(dest="command")
+
+    # the flags of roofline_collect_gpu_metrics.py, they are passed to the collector as they are
+    add_collector_arguments(subparsers.add_parser('submit', help="Submit a GPU collection job."))
+
+    intel_parser = subparsers.add_parser('submit-intel', help="Submit an Intel collection job.")
+    intel_parser.add_argument('-i', '--input', action="store", dest="input_file", required=True,
+                              help="Command file with the profiled applications.")
+    intel_parser.add_argument('-o', '--output', action="store", dest="output_file", required=True,
+                              help="Name of the results file.")
+    intel_parser.add_argument('-a', '--arch', action="store", dest="arch", required=True,
+                              help="SDE architecture of the node.")
+    intel_parser.add_argument('-j', '--jobs', action="store", dest="jobs", type=int,
+                              help="Number of parallel SDE runs, all cores by default.")
+    intel_parser.add_argument('--backend', action="store", dest="backend", default="sde")
+    intel_parser.add_argument('--hotspots', action="store", dest="hotspots", type=int)
+    intel_parser.add_argument('--log-mode', action="store", dest="log_mode", default="file")
+    intel_parser.add_argument('--threads', action="store", dest="threads",
+                              help="Comma separated thread counts of a scaling sweep.")
+    intel_parser.add_argument('--cores', action="store", dest="cores", type=int)
+    intel_parser.add_argument('--affinity', action="store", dest="affinity", default="close")
+    intel_parser.add_argument('--store', action="store", dest="store")
+    intel_parser.add_argument('--timing-runs', action="store", dest="timing_runs", type=int, default=1)
+    intel_parser.add_argument('--timing-min-runs', action="store", dest="timing_min_runs", type=int, default=5)
+    intel_parser.add_argument('--timing-warmup', action="store", dest="timing_warmup", type=int, default=0)
+    intel_parser.add_argument('--timing-ci', action="store", dest="timing_ci", type=float, default=0.05)
+
+    status_parser = subparsers.add_parser('status', help="Print the state of all jobs or of one job.")
+    status_parser.add_argument('job', nargs='?')
+
+    cancel_parser = subparsers.add_parser('cancel', help="Remove a queued job or stop a running one.")
+    cancel_parser.add_argument('job')
+
+    watch_parser = subparsers.add_parser('watch', help="Follow the output and results of a job.")
+    watch_parser.add_argument('job')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "status":
+            reply = send_request(args.socket, {"command": "status", "job": args.job})
+            for job in reply["jobs"]:
+                print_job(job)
+            return
+        if args.command == "cancel":
+            print_job(send_request(args.socket, {"command": "cancel", "job": args.job})["job"])
+            return
+        if args.command == "watch":
+            state = watch_job(args.socket, args.job, args.quiet)
+        else:
+            if args.command == "submit":
+                # everything after the subcommand is the command line of the collector
+                request = get_gpu_job_request(args, sys.argv[sys.argv.index("submit") + 1:])
+            else:
+                request = get_intel_job_request(args)
+            request["priority"] = args.priority
+            request["cwd"] = os.getcwd()
+            request["environment"] = dict(os.environ)
+            job = send_request(args.socket, request)["job"]
+            print_job(job)
+            if args.no_wait:
+                return
+            state = watch_job(args.socket, job["id"], args.quiet)
+        if state != "done":
+            sys.exit(1)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+    except socket.error as e:
+        print("ERROR: job server is not available at " + args.socket + " (" + str(e) + "), aborting...")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
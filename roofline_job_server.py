@@ -0,0 +1,48 @@
+#!/usr/bin/python
+
+import argparse
+import signal
+import sys
+
+from src.paths import *
+from src.job_server import JobServer
+
+
+def stop_on_signal(signal_number, frame):
+    raise KeyboardInterrupt()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs profiling jobs of several users one by one or side by side, '
+                                                 'metric passes share devices, timing passes get them exclusively.')
+
+    parser.add_argument('-d', '--jobs-dir',
+                        action="store", dest="jobs_dir",
+                        help="Directory of the job state, job outputs and results.",
+                        default=profiling_jobs_path)
+
+    parser.add_argument('--socket',
+                        action="store", dest="socket",
+                        help="Unix socket the server listens on, jobs-dir/server.sock by default.")
+
+    parser.add_argument('-j', '--max-jobs',
+                        action="store", dest="max_jobs", type=int,
+                        help="Maximal number of collectors running at the same time.",
+                        default=2)
+
+    parser.add_argument('--python',
+                        action="store", dest="python",
+                        help="Python interpreter the collectors are run with.",
+                        default=sys.executable)
+
+    args = parser.parse_args()
+
+    server = JobServer(args.jobs_dir, args.socket, args.max_jobs, args.python)
+    signal.signal(signal.SIGTERM, stop_on_signal)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("job server stopped")
+
+if __name__ == "__main__":
+    main()
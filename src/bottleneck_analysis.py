@@ -0,0 +1,113 @@
+#!/usr/bin/python
+
+import numpy
+
+peak_roof_prefix = "Peak "
+
+
+def get_peak_roof_name(precision):
+    return peak_roof_prefix + precision + " performance"
+
+
+def get_level_positions(levels, level_names):
+    # memory level of every point -> row of the roofs matrix, computed once per distinct level
+    unique_levels, inverse = numpy.unique(numpy.asarray(levels, dtype=str), return_inverse=True)
+    unique_positions = []
+    for level in unique_levels:
+        if level not in level_names:
+            raise ValueError("ERROR: no roof for memory level " + str(level) + ", aborting...")
+        unique_positions.append(level_names.index(level))
+    return numpy.asarray(unique_positions, dtype=int)[inverse]
+
+
+def classify_points(platform_characteristics, precision, ai, gops, levels):
+    # ai, gops and levels are arrays with one element per point, precision is a peak_performances key
+    # ("integer", "float", "double"), returns a dict of arrays with one element per point
+    ai = numpy.asarray(ai, dtype=float)
+    gops = numpy.asarray(gops, dtype=float)
+    peak_performance = float(platform_characteristics["peak_performances"][precision])
+    level_names = list(platform_characteristics["bandwidths"].keys())
+    bandwidths = numpy.asarray([platform_characteristics["bandwidths"][level] for level in level_names], dtype=float)
+
+    # attainable performance of every roof (rows) at the arithmetic intensity of every point (columns)
+    memory_roofs = bandwidths[:, numpy.newaxis] * ai[numpy.newaxis, :]
+    roofs = numpy.minimum(peak_performance, memory_roofs)
+    points = numpy.arange(len(ai))
+
+    level_positions = get_level_positions(levels, level_names)
+    roof_gops = roofs[level_positions, points]
+    memory_bound = memory_roofs[level_positions, points] < peak_performance
+    bounding_roof = numpy.where(memory_bound, numpy.asarray(level_names, dtype=object)[level_positions],
+                                get_peak_roof_name(precision))
+
+    # the top roof is the highest one at this intensity, the closest roof is the lowest one above the point
+    top_positions = numpy.argmax(roofs, axis=0)
+    top_roof_gops = roofs[top_positions, points]
+    top_roof = numpy.where(memory_roofs[top_positions, points] < peak_performance,
+                           numpy.asarray(level_names, dtype=object)[top_positions], get_peak_roof_name(precision))
+    roofs_above = numpy.where(roofs >= gops[numpy.newaxis, :], roofs, numpy.inf)
+    closest_positions = numpy.argmin(roofs_above, axis=0)
+    closest_roof_gops = roofs_above[closest_positions, points]
+    closest_roof = numpy.where(memory_roofs[closest_positions, points] < peak_performance,
+                               numpy.asarray(level_names, dtype=object)[closest_positions],
+                               get_peak_roof_name(precision))
+    # a point above all roofs has no closest roof
+    closest_roof = numpy.where(numpy.isinf(closest_roof_gops), "", closest_roof)
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        percent_of_roof = numpy.where(roof_gops > 0, 100.0 * gops / roof_gops, 100.0)
+        percent_of_top_roof = numpy.where(top_roof_gops > 0, 100.0 * gops / top_roof_gops, 100.0)
+        percent_of_closest_roof = numpy.where(numpy.isfinite(closest_roof_gops) & (closest_roof_gops > 0),
+                                              100.0 * gops / closest_roof_gops, 100.0)
+
+    return {"roof": bounding_roof,
+            "roof_gops": roof_gops,
+            "percent_of_roof": percent_of_roof,
+            "headroom_gops": numpy.maximum(roof_gops - gops, 0.0),
+            "bound": numpy.where(memory_bound, "memory", "compute"),
+            "top_roof": top_roof,
+            "top_roof_gops": top_roof_gops,
+            "percent_of_top_roof": percent_of_top_roof,
+            "closest_roof": closest_roof,
+            "percent_of_closest_roof": percent_of_closest_roof}
+
+
+def classify_profiling_data(platform_characteristics, precision, profiling_data_array):
+    # the same for the point dicts used by the visualization
+    return classify_points(platform_characteristics, precision,
+                           [profiling_data["ops_per_byte"] for profiling_data in profiling_data_array],
+                           [profiling_data["giops"] for profiling_data in profiling_data_array],
+                           [profiling_data["memory_roof"] for profiling_data in profiling_data_array])
+
+
+def get_description_texts(names, classification, units="GOP/s"):
+    texts = []
+    for pos in range(len(names)):
+        text = str(names[pos]) + "</br>"
+        text += classification["bound"][pos] + " bound, " + str(classification["roof"][pos]) + " roof: " + \
+                "%.1f" % classification["percent_of_roof"][pos] + "%, headroom " + \
+                "%.3g" % classification["headroom_gops"][pos] + " " + units + "</br>"
+        closest_roof = classification["closest_roof"][pos]
+        if closest_roof != "" and closest_roof != classification["top_roof"][pos]:
+            text += str(closest_roof) + " - closest roof: " + \
+                    "%.1f" % classification["percent_of_closest_roof"][pos] + "% </br>"
+        text += str(classification["top_roof"][pos]) + " - top roof: " + \
+                "%.1f" % classification["percent_of_top_roof"][pos] + "% </br>"
+        texts.append(text)
+    return texts
+
+
+classification_columns = ["roof", "bound", "roof_gops", "percent_of_roof", "headroom_gops", "top_roof",
+                          "percent_of_top_roof", "closest_roof", "percent_of_closest_roof"]
+
+
+def save_classification(file_name, profiling_data_array, classification):
+    import csv
+    output_file = open(file_name, 'w')
+    writer = csv.writer(output_file)
+    writer.writerow(["name", "level", "ai", "gops"] + classification_columns)
+    for pos in range(len(profiling_data_array)):
+        profiling_data = profiling_data_array[pos]
+        writer.writerow([profiling_data["name"], profiling_data["memory_roof"], profiling_data["ops_per_byte"],
+                         profiling_data["giops"]] + [classification[column][pos] for column in classification_columns])
+    output_file.close()
@@ -2,7 +2,7 @@
 
 
 import shutil
-from paths import *
+from src.paths import *
 
 
 def clean_all():
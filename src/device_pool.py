@@ -0,0 +1,88 @@
+#!/usr/bin/python
+
+import os
+import threading
+import time
+from subprocess import Popen
+
+from src.job_protocol import resource_lock, get_gpu_resource
+
+
+def parse_device_list(devices):
+    # "0,1,3" -> ["0", "1", "3"], ids are passed to CUDA_VISIBLE_DEVICES as they are (UUIDs work as well)
+    result = [device.strip() for device in str(devices).split(",") if device.strip() != ""]
+    if len(result) == 0:
+        raise ValueError("ERROR: no devices given, aborting...")
+    return result
+
+
+def get_device_environment(device):
+    environment = dict(os.environ)
+    environment["CUDA_VISIBLE_DEVICES"] = str(device)
+    return environment
+
+
+class DeviceJob:
+    def __init__(self, name, command, program_output_file_name=None):
+        self.name = name
+        self.command = command
+        self.program_output_file_name = program_output_file_name
+        self.device = None
+        self.start = 0.0
+        self.wall_time = 0.0
+        self.returncode = None
+
+    def run(self, device):
+        self.device = device
+        program_output = None
+        if self.program_output_file_name is not None:
+            program_output = open(self.program_output_file_name, 'w')
+        self.start = time.time()
+        try:
+            with resource_lock(get_gpu_resource(device)):
+                self.start = time.time()
+                cmd = Popen(self.command, shell=True, stdout=program_output, env=get_device_environment(device))
+                self.returncode = cmd.wait()
+        finally:
+            self.wall_time = time.time() - self.start
+            if program_output is not None:
+                program_output.close()
+
+    def get_event(self):
+        # in the format of SpanRecorder events, profilers run in child processes, so there is no self time
+        return {"name": "device job",
+                "start": self.start,
+                "wall_time": self.wall_time,
+                "self_time": 0.0,
+                "children_cpu_time": 0.0,
+                "bytes_parsed": 0,
+                "pid": os.getpid(),
+                "args": {"job": self.name, "device": self.device, "returncode": self.returncode}}
+
+
+def device_worker(device, jobs, next_job, lock):
+    while True:
+        with lock:
+            pos = next_job[0]
+            next_job[0] += 1
+        if pos >= len(jobs):
+            return
+        jobs[pos].run(device)
+
+
+def run_device_jobs(jobs, devices):
+    # one worker thread per device takes the next waiting job, so every device runs a single job at a time
+    # and a slow job does not hold back the others
+    next_job = [0]
+    lock = threading.Lock()
+    workers = []
+    for device in devices:
+        worker = threading.Thread(target=device_worker, args=(device, jobs, next_job, lock))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
+    for job in jobs:
+        if job.returncode != 0:
+            print("job " + job.name + " on device " + str(job.device) + " exited with code " + str(job.returncode))
@@ -0,0 +1,137 @@
+#!/usr/bin/python
+
+import math
+
+from src.timing_statistics import confidence_z
+
+
+class SamplingSettings:
+    # the first warmup invocations of every kernel are skipped, then every stride-th invocation is profiled,
+    # count limits the number of profiled invocations (all remaining ones are profiled when it is None)
+    def __init__(self, warmup=0, count=None, stride=1):
+        if warmup < 0 or stride < 1 or (count is not None and count < 1):
+            raise ValueError("ERROR: invalid invocation sampling settings, aborting...")
+        self.warmup = warmup
+        self.count = count
+        self.stride = stride
+
+    def is_window(self):
+        return self.stride == 1
+
+    def get_description(self):
+        return "sampling warmup %d, count %s, stride %d" % (self.warmup, str(self.count), self.stride)
+
+    def get_invocation_numbers(self, invocations_count):
+        # 1-based numbers of the sampled invocations of a kernel launched invocations_count times
+        numbers = list(range(self.warmup + 1, invocations_count + 1, self.stride))
+        if self.count is not None:
+            numbers = numbers[:self.count]
+        return numbers
+
+    def get_invocation_position(self, sample_pos):
+        # 0-based position of a sampled invocation among all invocations of the kernel
+        return self.warmup + sample_pos * self.stride
+
+
+# longer invocation filters would make the profiler command line too long (E2BIG)
+max_invocations_regex_length = 8192
+
+
+def get_digit_pattern(first_digit, last_digit):
+    if first_digit == last_digit:
+        return str(first_digit)
+    return "[%d-%d]" % (first_digit, last_digit)
+
+
+def get_any_digits_pattern(digits_count):
+    if digits_count == 0:
+        return ""
+    if digits_count == 1:
+        return "[0-9]"
+    return "[0-9]{%d}" % digits_count
+
+
+def get_same_length_range_patterns(first, last):
+    # patterns of the numbers between two numbers with the same number of digits, given as strings
+    if len(first) == 1:
+        return [get_digit_pattern(int(first), int(last))]
+    if first[0] == last[0]:
+        return [first[0] + pattern for pattern in get_same_length_range_patterns(first[1:], last[1:])]
+    rest_length = len(first) - 1
+    patterns = []
+    first_digit = int(first[0])
+    if first[1:] != "0" * rest_length:
+        patterns.extend(first[0] + pattern for pattern in get_same_length_range_patterns(first[1:], "9" * rest_length))
+        first_digit += 1
+    last_digit = int(last[0])
+    last_patterns = []
+    if last[1:] != "9" * rest_length:
+        last_patterns = [last[0] + pattern for pattern in get_same_length_range_patterns("0" * rest_length, last[1:])]
+        last_digit -= 1
+    if first_digit == 0 and last_digit == 9:
+        patterns.append(get_any_digits_pattern(rest_length + 1))
+    elif first_digit <= last_digit:
+        patterns.append(get_digit_pattern(first_digit, last_digit) + get_any_digits_pattern(rest_length))
+    return patterns + last_patterns
+
+
+def get_range_patterns(first, last):
+    # patterns of all numbers from first to last, e.g. 5..123 -> [5-9], [1-9][0-9], 1[0-1][0-9], 12[0-3]
+    patterns = []
+    while first <= last:
+        length_last = min(last, 10 ** len(str(first)) - 1)
+        patterns.extend(get_same_length_range_patterns(str(first), str(length_last)))
+        first = length_last + 1
+    return patterns
+
+
+def get_invocations_regex(invocation_numbers):
+    # consecutive invocations are given as number ranges, so a window stays short however many invocations
+    # it has, invocations of a stride are listed one by one
+    patterns = []
+    run_start = 0
+    for pos in range(1, len(invocation_numbers) + 1):
+        if pos == len(invocation_numbers) or invocation_numbers[pos] != invocation_numbers[pos - 1] + 1:
+            patterns.extend(get_range_patterns(invocation_numbers[run_start], invocation_numbers[pos - 1]))
+            run_start = pos
+    regex = "^(" + "|".join(patterns) + ")$"
+    if len(regex) > max_invocations_regex_length:
+        raise ValueError("ERROR: filter of %d sampled invocations is %d characters long, which is too long for the "
+                         "profiler command line, use a smaller --sample-count or a larger --sample-stride, "
+                         "aborting..." % (len(invocation_numbers), len(regex)))
+    return regex
+
+
+def get_finite_population_correction(samples_count, population_size):
+    return float(population_size - samples_count) / float(population_size - 1)
+
+
+def get_total_estimate_error(samples, population_size):
+    # half width of the 95% confidence interval of population_size * mean(samples), relative to the estimate,
+    # invocations are sampled without replacement, so the error is zero once all of them are sampled
+    samples_count = len(samples)
+    if samples_count < 2 or population_size <= samples_count:
+        return 0.0
+    mean = sum(samples) / float(samples_count)
+    if mean == 0:
+        return 0.0
+    variance = sum((sample - mean) ** 2 for sample in samples) / float(samples_count - 1)
+    correction = get_finite_population_correction(samples_count, population_size)
+    return confidence_z * math.sqrt(variance / samples_count * correction) / abs(mean)
+
+
+def get_ratio_estimate_error(numerators, denominators, population_size):
+    # the same for sum(numerators) / sum(denominators) (arithmetic intensity), linearized ratio estimator
+    samples_count = len(numerators)
+    if samples_count < 2 or population_size <= samples_count:
+        return 0.0
+    numerators_sum = float(sum(numerators))
+    denominators_sum = float(sum(denominators))
+    if numerators_sum == 0 or denominators_sum == 0:
+        return 0.0
+    ratio = numerators_sum / denominators_sum
+    variance = sum((numerator - ratio * denominator) ** 2
+                   for numerator, denominator in zip(numerators, denominators)) / float(samples_count - 1)
+    correction = get_finite_population_correction(samples_count, population_size)
+    mean_denominator = denominators_sum / samples_count
+    return confidence_z * math.sqrt(variance / samples_count * correction) / (mean_denominator * abs(ratio))
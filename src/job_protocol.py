@@ -0,0 +1,145 @@
+#!/usr/bin/python
+
+import json
+import os
+import socket
+from contextlib import contextmanager
+from subprocess import Popen, PIPE
+
+from src.paths import *
+
+# set by the job server for the collectors it runs, a collector started by hand also takes part
+# in device scheduling when ROOFLINE_JOB_SOCKET is set
+job_socket_variable = "ROOFLINE_JOB_SOCKET"
+job_id_variable = "ROOFLINE_JOB_ID"
+
+cpu_resource = "cpu"
+
+# the resource of a collector without CUDA_VISIBLE_DEVICES, it may use every GPU, so it overlaps all of them
+all_gpus_resource = "gpu:all"
+
+# GPU index -> UUID as listed by nvidia-smi, filled on first use
+gpu_uuids = None
+
+
+def get_default_socket_path():
+    return os.path.join(profiling_jobs_path, "server.sock")
+
+
+def get_gpu_uuids():
+    # indexes are in PCI bus order like those of CUDA_VISIBLE_DEVICES with CUDA_DEVICE_ORDER=PCI_BUS_ID,
+    # without nvidia-smi devices are known by the ids they are given
+    global gpu_uuids
+    if gpu_uuids is None:
+        gpu_uuids = {}
+        try:
+            query = Popen([nvidia_smi_path, "--query-gpu=index,uuid", "--format=csv,noheader"], stdout=PIPE)
+            output = query.communicate()[0].decode("utf-8", "replace")
+        except OSError:
+            return gpu_uuids
+        if query.returncode == 0:
+            for line in output.splitlines():
+                fields = [field.strip() for field in line.split(",")]
+                if len(fields) == 2:
+                    gpu_uuids[fields[0]] = fields[1]
+    return gpu_uuids
+
+
+def get_gpu_resource(device=None):
+    # "gpu:" and the sorted physical ids of the devices, so an index and the UUID of the same GPU
+    # give the same resource, "0,2" is a resource of two GPUs
+    if device is None:
+        device = os.environ.get("CUDA_VISIBLE_DEVICES")
+    if device is None or str(device).strip() == "":
+        return all_gpus_resource
+    ids = set()
+    for device_id in str(device).split(","):
+        device_id = device_id.strip()
+        if device_id != "":
+            ids.add(get_gpu_uuids().get(device_id, device_id))
+    return "gpu:" + ",".join(sorted(ids))
+
+
+def get_resource_ids(resource):
+    kind, ids = (resource.split(":", 1) + [""])[:2]
+    return kind, set(ids.split(","))
+
+
+def resources_overlap(resource, other_resource):
+    # GPU resources overlap when they share a device, all GPUs overlap every GPU resource
+    if resource == other_resource:
+        return True
+    kind, ids = get_resource_ids(resource)
+    other_kind, other_ids = get_resource_ids(other_resource)
+    if kind != "gpu" or other_kind != "gpu":
+        return False
+    if all_gpus_resource in (resource, other_resource):
+        return True
+    return len(ids & other_ids) > 0
+
+
+def connect(socket_path):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(socket_path)
+    return connection
+
+
+def send_message(connection, message):
+    # messages are JSON objects, one per line
+    connection.sendall((json.dumps(message) + "\n").encode("utf-8"))
+
+
+def read_messages(connection):
+    buffered = b""
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            return
+        buffered += chunk
+        while b"\n" in buffered:
+            line, buffered = buffered.split(b"\n", 1)
+            if line.strip():
+                yield json.loads(line.decode("utf-8"))
+
+
+def send_request(socket_path, message):
+    # a request with a single reply
+    connection = connect(socket_path)
+    try:
+        send_message(connection, message)
+        reply = next(read_messages(connection), None)
+    finally:
+        connection.close()
+    if reply is None:
+        raise ValueError("ERROR: job server closed the connection, aborting...")
+    if "error" in reply:
+        raise ValueError(reply["error"])
+    return reply
+
+
+@contextmanager
+def resource_lock(resource, exclusive=False):
+    # metric passes share a device, timing passes hold it exclusively, the lock is held while the connection
+    # to the job server is open, so it is released even when the collector is killed
+    socket_path = os.environ.get(job_socket_variable)
+    connection = None
+    if socket_path is not None:
+        job_id = os.environ.get(job_id_variable, "pid:" + str(os.getpid()))
+        try:
+            connection = connect(socket_path)
+            send_message(connection, {"command": "acquire", "job": job_id, "resource": resource,
+                                      "exclusive": exclusive})
+            reply = next(read_messages(connection), None)
+        except socket.error:
+            if connection is not None:
+                connection.close()
+            connection = None
+            print("job server is not available at " + socket_path + ", " + resource + " is used without a lock")
+        if connection is not None and (reply is None or not reply.get("granted", False)):
+            connection.close()
+            raise ValueError("ERROR: job server did not grant " + resource + ", aborting...")
+    try:
+        yield
+    finally:
+        if connection is not None:
+            connection.close()
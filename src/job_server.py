@@ -0,0 +1,432 @@
+#!/usr/bin/python
+
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from subprocess import Popen, PIPE, STDOUT
+
+from src.paths import *
+from src.job_protocol import send_message, read_messages, job_socket_variable, job_id_variable, resources_overlap
+from src.results_store import read_results_text_file
+
+job_kinds = ["gpu", "intel"]
+finished_states = ["done", "failed", "cancelled"]
+
+# messages waiting for a watcher, a watcher with more is dropped, as is one which does not take a message in time
+max_watcher_messages = 10000
+watcher_send_timeout = 10.0  # seconds
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run_intel_analysis has no command line, its keyword arguments are passed as JSON
+intel_job_code = "import json, sys\n" \
+                 "from src.timing_statistics import TimingSettings\n" \
+                 "import roofline_collect_intel_metrics\n" \
+                 "arguments = json.loads(sys.argv[1])\n" \
+                 "if 'timing_settings' in arguments:\n" \
+                 "    arguments['timing_settings'] = TimingSettings(*arguments['timing_settings'])\n" \
+                 "roofline_collect_intel_metrics.run_intel_analysis(**arguments)\n"
+
+
+class ResourceLocks:
+    # readers-writer locks of devices (metric passes are readers, timing passes are writers),
+    # requests of the same job never block each other, requests of overlapping resources (GPU sets
+    # sharing a device) block each other like requests of the same one, all methods are called with condition held
+    def __init__(self, condition):
+        self.condition = condition
+        self.holders = {}
+        self.waiters = []
+        self.sequence = 0
+
+    def can_grant(self, resource, job, exclusive):
+        for holder_resource in self.holders:
+            if not resources_overlap(resource, holder_resource):
+                continue
+            for holder_job, holder_exclusive in self.holders[holder_resource]:
+                if holder_job != job and (exclusive or holder_exclusive):
+                    return False
+        return True
+
+    def is_first_waiter(self, waiter):
+        # waiters are served by priority, then in arrival order, a waiting timing pass holds back
+        # metric passes of other jobs which come after it, so it is not starved
+        for other in sorted(self.waiters):
+            if other is waiter:
+                return True
+            if not resources_overlap(other[2], waiter[2]):
+                continue
+            if other[3] != waiter[3] and (other[4] or waiter[4]):
+                return False
+        return True
+
+    def acquire(self, resource, job, exclusive, priority=0):
+        waiter = [-priority, self.sequence, resource, job, exclusive]
+        self.sequence += 1
+        self.waiters.append(waiter)
+        while not (self.is_first_waiter(waiter) and self.can_grant(resource, job, exclusive)):
+            self.condition.wait()
+        self.waiters.remove(waiter)
+        self.holders.setdefault(resource, []).append((job, exclusive))
+        self.condition.notify_all()
+
+    def release(self, resource, job, exclusive):
+        self.holders[resource].remove((job, exclusive))
+        if len(self.holders[resource]) == 0:
+            del self.holders[resource]
+        self.condition.notify_all()
+
+    def get_state(self):
+        return {"holders": self.holders,
+                "waiting": [{"resource": waiter[2], "job": waiter[3], "exclusive": waiter[4]}
+                            for waiter in sorted(self.waiters)]}
+
+
+def get_job_view(job):
+    # jobs as sent to clients, without the environment they were submitted with
+    view = dict(job)
+    del view["environment"]
+    return view
+
+
+class JobServer:
+    def __init__(self, jobs_path=profiling_jobs_path, socket_path=None, max_jobs=2, python=sys.executable):
+        # at most max_jobs collectors run at the same time, their metric passes overlap,
+        # timing passes wait for exclusive access to their device
+        self.jobs_path = os.path.abspath(jobs_path)
+        if socket_path is None:
+            socket_path = os.path.join(self.jobs_path, "server.sock")
+        self.socket_path = os.path.abspath(socket_path)
+        self.state_file_name = os.path.join(self.jobs_path, "jobs.json")
+        self.max_jobs = max_jobs
+        self.python = python
+        self.condition = threading.Condition()
+        self.locks = ResourceLocks(self.condition)
+        self.jobs = []
+        self.next_job_id = 1
+        self.processes = {}
+        self.output_files = {}
+        self.watchers = {}
+        self.stopping = False
+        if not os.path.exists(self.jobs_path):
+            os.makedirs(self.jobs_path)
+        self.load_state()
+
+    def load_state(self):
+        # jobs which were running when the server stopped are queued again
+        if not os.path.isfile(self.state_file_name):
+            return
+        state_file = open(self.state_file_name, 'r')
+        state = json.load(state_file)
+        state_file.close()
+        self.next_job_id = state["next_job_id"]
+        self.jobs = state["jobs"]
+        for job in self.jobs:
+            if job["state"] == "running":
+                job["state"] = "queued"
+                job["restarts"] += 1
+                print("job " + str(job["id"]) + " was interrupted, queued again")
+            elif job["state"] == "cancelling":
+                job["state"] = "cancelled"
+        self.save_state()
+
+    def save_state(self):
+        # written to a temporary file first, so a crash never leaves a broken state file
+        temporary_file_name = self.state_file_name + ".tmp"
+        state_file = open(temporary_file_name, 'w')
+        json.dump({"next_job_id": self.next_job_id, "jobs": self.jobs}, state_file, indent=1)
+        state_file.close()
+        os.rename(temporary_file_name, self.state_file_name)
+
+    def find_job(self, job_id):
+        for job in self.jobs:
+            if str(job["id"]) == str(job_id):
+                return job
+        raise ValueError("ERROR: unknown job " + str(job_id) + ", aborting...")
+
+    def get_job_priority(self, job_id):
+        # lock requests of collectors started by hand come with their pid instead of a job id
+        for job in self.jobs:
+            if str(job["id"]) == str(job_id):
+                return job["priority"]
+        return 0
+
+    def submit(self, request):
+        if request.get("kind") not in job_kinds:
+            raise ValueError("ERROR: unknown job kind " + str(request.get("kind")) + ", aborting...")
+        job_id = self.next_job_id
+        self.next_job_id += 1
+        work_path = os.path.join(self.jobs_path, str(job_id))
+        results_path = os.path.join(work_path, "profiling_results") + "/"
+        job = {"id": job_id,
+               "kind": request["kind"],
+               "args": request["args"],
+               "priority": int(request.get("priority", 0)),
+               "cwd": request["cwd"],
+               "environment": request.get("environment", {}),
+               "state": "queued",
+               "submitted": time.time(),
+               "started": None,
+               "finished": None,
+               "returncode": None,
+               "restarts": 0,
+               "work_path": work_path,
+               "results_path": results_path,
+               "output_file": os.path.join(work_path, "output.txt"),
+               "results_file": request.get("results_file"),
+               "results": None}
+        if job["kind"] == "gpu" and job["results_file"] is None:
+            job["results_file"] = results_path + request["app"] + "_profiling_results.txt"
+            job["args"] = job["args"] + ["-f", job["results_file"]]
+        if job["kind"] == "intel":
+            job["results_file"] = results_path + job["args"]["output_file_name"]
+        self.jobs.append(job)
+        self.save_state()
+        print("job " + str(job_id) + " queued with priority " + str(job["priority"]))
+        self.schedule()
+        return job
+
+    def get_job_command(self, job):
+        if job["kind"] == "gpu":
+            return [self.python, os.path.join(repository_path, "roofline_collect_gpu_metrics.py")] + job["args"]
+        return [self.python, "-c", intel_job_code, json.dumps(job["args"])]
+
+    def get_job_environment(self, job):
+        environment = dict(job["environment"])
+        environment["ROOFLINE_PROFILING_RESULTS"] = job["results_path"]
+        environment[job_socket_variable] = self.socket_path
+        environment[job_id_variable] = str(job["id"])
+        if job["kind"] == "intel":
+            python_path = [repository_path]
+            if environment.get("PYTHONPATH"):
+                python_path.append(environment["PYTHONPATH"])
+            environment["PYTHONPATH"] = os.pathsep.join(python_path)
+        return environment
+
+    def schedule(self):
+        # queued jobs start by priority, then in submission order, while fewer than max_jobs are running
+        while not self.stopping and len(self.processes) < self.max_jobs:
+            queued = [job for job in self.jobs if job["state"] == "queued"]
+            if len(queued) == 0:
+                return
+            job = max(queued, key=lambda queued_job: (queued_job["priority"], -queued_job["id"]))
+            self.start_job(job)
+
+    def start_job(self, job):
+        if not os.path.exists(job["results_path"]):
+            os.makedirs(job["results_path"])
+        output_file = open(job["output_file"], 'ab')
+        try:
+            # the collector gets a process group of its own, so cancelling it also stops the profiler
+            process = Popen(self.get_job_command(job), cwd=job["cwd"], env=self.get_job_environment(job),
+                            stdout=PIPE, stderr=STDOUT, preexec_fn=os.setsid)
+        except OSError as e:
+            output_file.write((str(e) + "\n").encode("utf-8"))
+            output_file.close()
+            self.finish_job(job, None, "failed")
+            return
+        job["state"] = "running"
+        job["started"] = time.time()
+        self.processes[job["id"]] = process
+        self.output_files[job["id"]] = output_file
+        self.save_state()
+        print("job " + str(job["id"]) + " started")
+        self.notify_watchers(job, {"event": "state", "job": get_job_view(job)})
+        reader = threading.Thread(target=self.read_job_output, args=(job, process))
+        reader.daemon = True
+        reader.start()
+
+    def read_job_output(self, job, process):
+        for line in iter(process.stdout.readline, b""):
+            with self.condition:
+                self.output_files[job["id"]].write(line)
+                self.output_files[job["id"]].flush()
+                self.notify_watchers(job, {"event": "output",
+                                           "line": line.decode("utf-8", "replace").rstrip("\n")})
+        process.wait()
+        with self.condition:
+            self.output_files.pop(job["id"]).close()
+            del self.processes[job["id"]]
+            if self.stopping:
+                return
+            if job["state"] == "cancelling":
+                self.finish_job(job, process.returncode, "cancelled")
+            elif process.returncode == 0:
+                self.finish_job(job, process.returncode, "done")
+            else:
+                self.finish_job(job, process.returncode, "failed")
+            self.schedule()
+
+    def read_job_results(self, job):
+        if job["results_file"] is None or not os.path.isfile(job["results_file"]):
+            return None
+        app, mode, kernels = read_results_text_file(job["results_file"])
+        return {"app": app, "mode": mode, "kernels": kernels}
+
+    def finish_job(self, job, returncode, state):
+        job["returncode"] = returncode
+        job["state"] = state
+        job["finished"] = time.time()
+        if state == "done":
+            job["results"] = self.read_job_results(job)
+        self.save_state()
+        print("job " + str(job["id"]) + " " + state)
+        if job["results"] is not None:
+            self.notify_watchers(job, {"event": "results", "results": job["results"]})
+        self.notify_watchers(job, {"event": "state", "job": get_job_view(job)})
+        self.watchers.pop(job["id"], None)
+        self.condition.notify_all()
+
+    def cancel(self, job_id):
+        job = self.find_job(job_id)
+        if job["state"] == "queued":
+            self.finish_job(job, None, "cancelled")
+        elif job["state"] == "running":
+            job["state"] = "cancelling"
+            os.killpg(self.processes[job["id"]].pid, signal.SIGTERM)
+        return job
+
+    def notify_watchers(self, job, message):
+        # messages are queued and sent by the thread of every watcher outside of the condition, a watcher
+        # which does not keep up is dropped
+        watchers = self.watchers.get(job["id"], [])
+        for watcher in list(watchers):
+            if len(watcher["messages"]) >= max_watcher_messages:
+                print("watcher of job " + str(job["id"]) + " does not read its messages, dropped")
+                watcher["dropped"] = True
+                watchers.remove(watcher)
+            else:
+                watcher["messages"].append(message)
+        self.condition.notify_all()
+
+    def remove_watcher(self, job, watcher):
+        watchers = self.watchers.get(job["id"], [])
+        if watcher in watchers:
+            watchers.remove(watcher)
+
+    def watch(self, connection, job_id):
+        # the output so far, then new output lines, the parsed results and state changes until the job finishes
+        with self.condition:
+            job = self.find_job(job_id)
+            messages = [{"event": "state", "job": get_job_view(job)}]
+            if os.path.isfile(job["output_file"]):
+                output_file = open(job["output_file"], 'rb')
+                for line in output_file:
+                    messages.append({"event": "output", "line": line.decode("utf-8", "replace").rstrip("\n")})
+                output_file.close()
+            finished = job["state"] in finished_states
+            if finished and job["results"] is not None:
+                messages.append({"event": "results", "results": job["results"]})
+            # messages of the job from now on are queued for this watcher
+            watcher = {"messages": [], "dropped": False}
+            if not finished:
+                self.watchers.setdefault(job["id"], []).append(watcher)
+        connection.settimeout(watcher_send_timeout)
+        while True:
+            try:
+                for message in messages:
+                    send_message(connection, message)
+            except socket.error:
+                with self.condition:
+                    self.remove_watcher(job, watcher)
+                return
+            if finished:
+                return
+            with self.condition:
+                while len(watcher["messages"]) == 0 and not watcher["dropped"] and \
+                        job["state"] not in finished_states and not self.stopping:
+                    self.condition.wait()
+                if watcher["dropped"]:
+                    return
+                messages = watcher["messages"]
+                watcher["messages"] = []
+                finished = job["state"] in finished_states or self.stopping
+
+    def hold_lock(self, connection, request):
+        # the lock is granted when the reply is sent and released when the collector closes the connection
+        resource = request["resource"]
+        job_id = str(request["job"])
+        exclusive = bool(request.get("exclusive", False))
+        with self.condition:
+            self.locks.acquire(resource, job_id, exclusive, self.get_job_priority(job_id))
+        try:
+            send_message(connection, {"granted": True})
+            while connection.recv(4096):
+                pass
+        except socket.error:
+            pass
+        finally:
+            with self.condition:
+                self.locks.release(resource, job_id, exclusive)
+
+    def handle_request(self, connection, request):
+        command = request.get("command")
+        if command == "acquire":
+            self.hold_lock(connection, request)
+            return
+        if command == "watch":
+            self.watch(connection, request["job"])
+            return
+        with self.condition:
+            if command == "submit":
+                reply = {"job": get_job_view(self.submit(request))}
+            elif command == "status":
+                jobs = self.jobs
+                if request.get("job") is not None:
+                    jobs = [self.find_job(request["job"])]
+                reply = {"jobs": [get_job_view(job) for job in jobs], "locks": self.locks.get_state()}
+            elif command == "cancel":
+                reply = {"job": get_job_view(self.cancel(request["job"]))}
+            else:
+                raise ValueError("ERROR: unknown command " + str(command) + ", aborting...")
+        send_message(connection, reply)
+
+    def handle_connection(self, connection):
+        try:
+            request = next(read_messages(connection), None)
+            if request is not None:
+                try:
+                    self.handle_request(connection, request)
+                except ValueError as e:
+                    send_message(connection, {"error": str(e)})
+        except socket.error:
+            pass
+        finally:
+            connection.close()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        listener.listen(64)
+        print("job server listening on " + self.socket_path)
+        with self.condition:
+            self.schedule()
+        try:
+            while True:
+                connection, address = listener.accept()
+                handler = threading.Thread(target=self.handle_connection, args=(connection,))
+                handler.daemon = True
+                handler.start()
+        finally:
+            listener.close()
+            os.remove(self.socket_path)
+            self.stop()
+
+    def stop(self):
+        # running collectors are stopped and stay queued in the saved state, so they run again after a restart
+        with self.condition:
+            self.stopping = True
+            for job in self.jobs:
+                if job["id"] in self.processes:
+                    os.killpg(self.processes[job["id"]].pid, signal.SIGTERM)
+                    job["state"] = "queued"
+                    job["restarts"] += 1
+                elif job["state"] == "cancelling":
+                    job["state"] = "cancelled"
+            self.save_state()
+            self.condition.notify_all()
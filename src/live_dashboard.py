@@ -0,0 +1,220 @@
+#!/usr/bin/python
+
+import json
+import socket
+import threading
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+# query parameters of the page and of the event stream, every one takes comma separated values
+point_filters = ["app", "kernel", "level"]
+
+keepalive_interval = 15.0  # seconds
+
+page_template = """<html>
+<head>
+<meta charset="utf-8" />
+<title>%(title)s</title>
+<script src="plotly.js"></script>
+</head>
+<body>
+<form method="get" action="/">
+app <input name="app" value="%(app)s" /> kernel <input name="kernel" value="%(kernel)s" />
+level <input name="level" value="%(level)s" /> <input type="submit" value="filter" />
+<span id="status">connecting...</span>
+</form>
+%(plot_div)s
+<script>
+// points arrive as ready traces, the figure itself is never rebuilt
+var plot = document.getElementsByClassName('plotly-graph-div')[0];
+var statusLabel = document.getElementById('status');
+var pointsCount = 0;
+var source = new EventSource('events' + window.location.search);
+source.addEventListener('point', function(event) {
+    var entry = JSON.parse(event.data);
+    Plotly.addTraces(plot, entry.traces);
+    pointsCount += 1;
+    statusLabel.textContent = pointsCount + ' points, last: ' + entry.name;
+});
+source.onerror = function() { statusLabel.textContent = 'reconnecting... (' + pointsCount + ' points)'; };
+</script>
+</body>
+</html>
+"""
+
+
+def escape_html(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\"", "&quot;")
+
+
+def get_plotter_point(kernel, point):
+    # a point in the format of ResultsStore.add_kernel -> the format used by RooflinePlotter
+    plotter_point = {"name": point["label"],
+                     "kernel": kernel,
+                     "level": point["level"],
+                     "ops_per_byte": point["ai"],
+                     "giops": point["gops"],
+                     "memory_roof": point["memory_roof"]}
+    if "gops_low" in point:
+        plotter_point["giops_low"] = point["gops_low"]
+        plotter_point["giops_high"] = point["gops_high"]
+    if "ai_percentiles" in point:
+        plotter_point["ops_per_byte_percentiles"] = point["ai_percentiles"]
+        plotter_point["giops_percentiles"] = point["gops_percentiles"]
+    return plotter_point
+
+
+def parse_filters(query):
+    # {"app": set of apps, ...}, missing or empty parameters do not filter
+    filters = {}
+    values = parse_qs(query)
+    for key in point_filters:
+        selected = set()
+        for value in values.get(key, []):
+            selected.update(item.strip() for item in value.split(",") if item.strip() != "")
+        if selected:
+            filters[key] = selected
+    return filters
+
+
+def matches_filters(entry, filters):
+    for key in filters:
+        if entry[key] not in filters[key]:
+            return False
+    return True
+
+
+class LiveDashboard:
+    # points of all collectors in the order they arrived, get_traces(points) returns the plotly traces
+    # of every point as JSON data, they are built once and sent to all browsers as they are
+    def __init__(self, title, plot_div, plotlyjs, get_traces):
+        self.title = title
+        self.plot_div = plot_div
+        self.plotlyjs = plotlyjs
+        self.get_traces = get_traces
+        self.entries = []
+        self.condition = threading.Condition()
+
+    def add_points(self, app, points):
+        # points are in the RooflinePlotter format with kernel and level keys
+        if len(points) == 0:
+            return 0
+        traces = self.get_traces(points)
+        with self.condition:
+            for point, point_traces in zip(points, traces):
+                self.entries.append({"id": len(self.entries) + 1,
+                                     "app": str(app),
+                                     "kernel": str(point["kernel"]),
+                                     "level": str(point["level"]),
+                                     "name": str(point["name"]),
+                                     "traces": point_traces})
+            self.condition.notify_all()
+        return len(points)
+
+    def wait_for_entries(self, filters, after=0, timeout=None):
+        # matching entries with ids above after, waits for new ones up to timeout when there are none yet,
+        # returns them with the id to continue after
+        with self.condition:
+            if len(self.entries) <= after and timeout is not None:
+                self.condition.wait(timeout)
+            entries = [entry for entry in self.entries[after:] if matches_filters(entry, filters)]
+            return entries, max(after, len(self.entries))
+
+    def get_page(self, filters):
+        fields = {"title": escape_html(self.title), "plot_div": self.plot_div}
+        for key in point_filters:
+            fields[key] = escape_html(",".join(sorted(filters.get(key, []))))
+        return page_template % fields
+
+
+class DashboardRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type, status=200):
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        filters = parse_filters(url.query)
+        dashboard = self.server.dashboard
+        if url.path == "/":
+            self.send_body(dashboard.get_page(filters), "text/html; charset=utf-8")
+        elif url.path == "/plotly.js":
+            self.send_body(dashboard.plotlyjs, "application/javascript")
+        elif url.path == "/points":
+            entries, after = dashboard.wait_for_entries(filters)
+            self.send_body(json.dumps(entries), "application/json")
+        elif url.path == "/events":
+            self.send_events(filters)
+        else:
+            self.send_body("not found", "text/plain", 404)
+
+    def send_events(self, filters):
+        # server-sent events, a reconnecting browser sends the id of the last point it got and continues from it
+        dashboard = self.server.dashboard
+        after = int(self.headers.get("Last-Event-ID") or 0)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                entries, after = dashboard.wait_for_entries(filters, after, keepalive_interval)
+                if len(entries) == 0:
+                    self.wfile.write(b": keepalive\n\n")
+                for entry in entries:
+                    event = "id: %d\nevent: point\ndata: %s\n\n" % (entry["id"], json.dumps(entry))
+                    self.wfile.write(event.encode("utf-8"))
+                self.wfile.flush()
+        except (socket.error, IOError):
+            return
+
+    def do_POST(self):
+        # {"app": ..., "mode": ..., "kernel": ..., "points": [...]} from a collector
+        url = urlparse(self.path)
+        if url.path != "/points":
+            self.send_body("not found", "text/plain", 404)
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+            points = [get_plotter_point(request["kernel"], point) for point in request["points"]]
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_body("ERROR: invalid points, " + str(e), "text/plain", 400)
+            return
+        count = self.server.dashboard.add_points(request.get("app", ""), points)
+        self.send_body(json.dumps({"points": count}), "application/json")
+
+
+class DashboardServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, dashboard):
+        HTTPServer.__init__(self, address, DashboardRequestHandler)
+        self.dashboard = dashboard
+
+
+def serve_dashboard(dashboard, host="localhost", port=8050):
+    server = DashboardServer((host, port), dashboard)
+    print("live roofline dashboard at http://%s:%d/" % (host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("live roofline dashboard stopped")
+    finally:
+        server.server_close()
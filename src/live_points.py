@@ -0,0 +1,44 @@
+#!/usr/bin/python
+
+import json
+import os
+
+try:
+    from urllib2 import urlopen, Request
+except ImportError:
+    from urllib.request import urlopen, Request
+
+# collectors publish points to this dashboard URL when it is set and no --dashboard flag is given
+dashboard_variable = "ROOFLINE_DASHBOARD"
+
+publish_timeout = 2.0  # seconds
+
+
+def get_dashboard_url(dashboard_url=None):
+    if dashboard_url is None:
+        return os.environ.get(dashboard_variable)
+    return dashboard_url
+
+
+class PointPublisher:
+    # sends the points of every finished kernel to the live dashboard, points are dicts with level, memory_roof,
+    # label, ai and gops keys like in ResultsStore.add_kernel, a dashboard which can not be reached is reported
+    # once and the collection goes on without it
+    def __init__(self, dashboard_url, app, mode):
+        self.dashboard_url = dashboard_url
+        self.app = app
+        self.mode = mode
+        self.failed = False
+
+    def publish(self, kernel, points):
+        if self.dashboard_url is None or self.failed:
+            return
+        body = json.dumps({"app": self.app, "mode": self.mode, "kernel": kernel, "points": points})
+        request = Request(self.dashboard_url.rstrip("/") + "/points", body.encode("utf-8"),
+                          {"Content-Type": "application/json"})
+        try:
+            urlopen(request, timeout=publish_timeout).read()
+        except IOError as e:
+            print("live dashboard " + self.dashboard_url + " is not available (" + str(e) + "), points are not "
+                  "published")
+            self.failed = True
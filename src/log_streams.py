@@ -0,0 +1,128 @@
+#!/usr/bin/python
+
+import errno
+import fcntl
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from subprocess import Popen
+
+# file: profilers write logs into profiling_results and they are parsed after the run
+# stream: logs are sent through a FIFO in a local temporary directory and parsed while the profiler runs
+# reuse: logs of a previous run (plain or gzip compressed) are parsed again, nothing is run
+log_modes = ["file", "stream", "reuse"]
+
+# FIFO name -> its reader opened before the profiler was started, open_log hands it to the parser
+fifo_readers = {}
+
+
+def open_log(file_name):
+    if file_name in fifo_readers:
+        return fifo_readers.pop(file_name)
+    # archived logs can be gzip compressed
+    if file_name.endswith(".gz"):
+        if sys.version_info[0] >= 3:
+            return gzip.open(file_name, 'rt')
+        return gzip.open(file_name, 'r')
+    return open(file_name, 'r')
+
+
+def find_log(file_name):
+    if not os.path.exists(file_name) and os.path.isfile(file_name + ".gz"):
+        return file_name + ".gz"
+    if not os.path.exists(file_name):
+        raise ValueError("ERROR: log " + file_name + " not found, aborting...")
+    return file_name
+
+
+def can_map_log(file_name):
+    # FIFOs and compressed logs can only be read sequentially
+    return os.path.isfile(file_name) and not file_name.endswith(".gz") and os.path.getsize(file_name) > 0
+
+
+def open_fifo_reader(fifo_name):
+    # a non-blocking open does not wait for a writer, the reader is switched to blocking reads afterwards
+    fifo_fd = os.open(fifo_name, os.O_RDONLY | os.O_NONBLOCK)
+    fcntl.fcntl(fifo_fd, fcntl.F_SETFL, fcntl.fcntl(fifo_fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+    return os.fdopen(fifo_fd, 'r')
+
+
+def release_fifo_writer(cmd, writer_fd):
+    # the parser gets an end of file only when the profiler has finished, even if it never opened the FIFO
+    cmd.wait()
+    os.close(writer_fd)
+
+
+def drain_fifo(fifo_fd, watcher):
+    # the rest of the log is read after the parser has stopped, so the profiler never blocks on a full pipe
+    # or gets SIGPIPE, returns the number of unparsed bytes
+    discarded = 0
+    while True:
+        try:
+            data = os.read(fifo_fd, 65536)
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+            data = None
+        if data:
+            discarded += len(data)
+            continue
+        if data is not None and not watcher.is_alive():
+            return discarded
+        time.sleep(0.01)
+
+
+def stream_logged_command(get_command, log_file_name, parse_log, program_output=None, environment=None):
+    fifo_path = tempfile.mkdtemp(prefix="roofline_")
+    fifo_name = os.path.join(fifo_path, os.path.basename(log_file_name))
+    os.mkfifo(fifo_name)
+    fifo_fd = None
+    writer_fd = None
+    try:
+        # all ends are opened before the profiler starts, so nobody waits in open() for a profiler which has
+        # already exited: the reader of the parser, a reader which keeps the FIFO open after parsing (it is read
+        # only then) and a writer which is closed by the watcher once the profiler has finished
+        fifo_readers[fifo_name] = open_fifo_reader(fifo_name)
+        fifo_fd = os.open(fifo_name, os.O_RDONLY | os.O_NONBLOCK)
+        writer_fd = os.open(fifo_name, os.O_WRONLY | os.O_NONBLOCK)
+        cmd = Popen(get_command(fifo_name), shell=True, stdout=program_output, env=environment, close_fds=True)
+        watcher = threading.Thread(target=release_fifo_writer, args=(cmd, writer_fd))
+        watcher.daemon = True
+        watcher.start()
+        writer_fd = None
+        parse_log(fifo_name)
+        discarded = drain_fifo(fifo_fd, watcher)
+        watcher.join()
+        if discarded > 0:
+            print("skipped " + str(discarded) + " bytes of " + os.path.basename(log_file_name) +
+                  " left after parsing")
+        return cmd.returncode
+    finally:
+        reader = fifo_readers.pop(fifo_name, None)
+        if reader is not None:
+            reader.close()
+        for fd in [fifo_fd, writer_fd]:
+            if fd is not None:
+                os.close(fd)
+        shutil.rmtree(fifo_path, ignore_errors=True)
+
+
+def run_logged_command(get_command, log_file_name, parse_log, program_output=None, log_mode="file",
+                       environment=None):
+    # get_command(log file name) returns a shell command which writes its log into that file,
+    # parse_log(file name) reads the log, environment of the command is inherited when it is None
+    if log_mode not in log_modes:
+        raise ValueError("ERROR: unknown log mode " + str(log_mode) + ", aborting...")
+    if log_mode == "reuse":
+        parse_log(find_log(log_file_name))
+        return 0
+    if log_mode == "stream":
+        return stream_logged_command(get_command, log_file_name, parse_log, program_output, environment)
+    cmd = Popen(get_command(log_file_name), shell=True, stdout=program_output, env=environment)
+    cmd.wait()
+    parse_log(log_file_name)
+    return cmd.returncode
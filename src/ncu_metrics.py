@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+import csv
+
+from src.log_streams import open_log
+
+# nvprof metric -> list of (ncu metric, weight), transactions are replaced by 32 byte sectors (or shared memory
+# wavefronts), so the derived quantities of ProfilingDataGPU (bytes requested, flop counts) stay unchanged
+ncu_metric_weights = {"gld_transactions": [("l1tex__t_sectors_pipe_lsu_mem_global_op_ld.sum", 1)],
+                      "gst_transactions": [("l1tex__t_sectors_pipe_lsu_mem_global_op_st.sum", 1)],
+                      "atomic_transactions": [("l1tex__t_sectors_pipe_lsu_mem_global_op_atom.sum", 1),
+                                              ("l1tex__t_sectors_pipe_lsu_mem_global_op_red.sum", 1)],
+                      "local_load_transactions": [("l1tex__t_sectors_pipe_lsu_mem_local_op_ld.sum", 1)],
+                      "local_store_transactions": [("l1tex__t_sectors_pipe_lsu_mem_local_op_st.sum", 1)],
+                      "shared_load_transactions": [("l1tex__data_pipe_lsu_wavefronts_mem_shared_op_ld.sum", 1)],
+                      "shared_store_transactions": [("l1tex__data_pipe_lsu_wavefronts_mem_shared_op_st.sum", 1)],
+                      "l2_read_transactions": [("lts__t_sectors_op_read.sum", 1)],
+                      "l2_write_transactions": [("lts__t_sectors_op_write.sum", 1)],
+                      "dram_read_transactions": [("dram__sectors_read.sum", 1)],
+                      "dram_write_transactions": [("dram__sectors_write.sum", 1)],
+                      "flop_count_dp": [("smsp__sass_thread_inst_executed_op_dadd_pred_on.sum", 1),
+                                        ("smsp__sass_thread_inst_executed_op_dmul_pred_on.sum", 1),
+                                        ("smsp__sass_thread_inst_executed_op_dfma_pred_on.sum", 2)],
+                      "flop_count_sp": [("smsp__sass_thread_inst_executed_op_fadd_pred_on.sum", 1),
+                                        ("smsp__sass_thread_inst_executed_op_fmul_pred_on.sum", 1),
+                                        ("smsp__sass_thread_inst_executed_op_ffma_pred_on.sum", 2)],
+                      "inst_integer": [("smsp__sass_thread_inst_executed_op_integer_pred_on.sum", 1)],
+                      "gld_efficiency": [("smsp__sass_average_data_bytes_per_sector_mem_global_op_ld.pct", 1)],
+                      "gst_efficiency": [("smsp__sass_average_data_bytes_per_sector_mem_global_op_st.pct", 1)],
+                      "shared_efficiency": [("smsp__sass_average_data_bytes_per_wavefront_mem_shared.pct", 1)]}
+
+ncu_duration_metric = "gpu__time_duration.sum"
+
+replay_modes = ["application", "kernel"]
+
+# units printed by ncu --print-units base
+ncu_time_units = {"second": 1.0,
+                  "msecond": 1.0e-3,
+                  "usecond": 1.0e-6,
+                  "nsecond": 1.0e-9}
+
+
+def get_ncu_metric_list(metric_list):
+    # the fewest ncu metrics needed for a list of nvprof metrics, each ncu metric is collected once
+    ncu_metric_list = []
+    for metric in metric_list:
+        if metric not in ncu_metric_weights:
+            raise ValueError("ERROR: no ncu equivalent of metric " + str(metric) + ", aborting...")
+        for ncu_metric, weight in ncu_metric_weights[metric]:
+            if ncu_metric not in ncu_metric_list:
+                ncu_metric_list.append(ncu_metric)
+    return ncu_metric_list
+
+
+def get_nvprof_values(ncu_values, metric_list):
+    # values of a single kernel invocation in nvprof metric names, as strings like in nvprof trace rows
+    values = {}
+    for metric in metric_list:
+        value = 0.0
+        found = False
+        for ncu_metric, weight in ncu_metric_weights[metric]:
+            if ncu_metric in ncu_values:
+                value += weight * ncu_values[ncu_metric]
+                found = True
+        if found:
+            values[metric] = repr(value)
+    return values
+
+
+def parse_metric_value(value, unit):
+    value = value.replace(",", "")
+    if value == "" or value == "n/a":
+        return None
+    return float(value) * ncu_time_units.get(unit, 1.0)
+
+
+def read_ncu_csv(file_name):
+    # streams an ncu --csv log (one row per invocation and metric) and yields every kernel invocation as
+    # (kernel name, {ncu metric: value}), rows of one invocation are consecutive, so a single pass is enough
+    ncu_file = open_log(file_name)
+    header = None
+    invocation_id = None
+    kernel_name = ""
+    ncu_values = {}
+    try:
+        for row in csv.reader(line for line in ncu_file if not line.startswith("==")):
+            if len(row) == 0:
+                continue
+            if header is None:
+                header = row
+                id_pos = header.index("ID")
+                name_pos = header.index("Kernel Name")
+                metric_pos = header.index("Metric Name")
+                unit_pos = header.index("Metric Unit")
+                value_pos = header.index("Metric Value")
+                continue
+            if row[id_pos] != invocation_id:
+                if invocation_id is not None:
+                    yield kernel_name, ncu_values
+                invocation_id = row[id_pos]
+                kernel_name = row[name_pos]
+                ncu_values = {}
+            value = parse_metric_value(row[value_pos], row[unit_pos])
+            if value is not None:
+                ncu_values[row[metric_pos]] = value
+        if invocation_id is not None:
+            yield kernel_name, ncu_values
+    finally:
+        ncu_file.close()
@@ -0,0 +1,33 @@
+#!/usr/bin/python
+
+# nvprof metrics required to compute the operations count in each precision mode
+ops_metrics = {"int": ["inst_integer"],
+               "sp": ["flop_count_sp"],
+               "dp": ["flop_count_dp"]}
+
+# nvprof metrics required to compute the bytes requested (and hit rate) on each memory level
+level_metrics = {"L1": ["gld_transactions", "gst_transactions", "atomic_transactions",
+                        "local_load_transactions", "local_store_transactions",
+                        "shared_load_transactions", "shared_store_transactions",
+                        "l2_read_transactions", "l2_write_transactions"],
+                 "L2": ["l2_read_transactions", "l2_write_transactions", "dram_read_transactions"],
+                 "DRAM": ["dram_read_transactions", "dram_write_transactions"],
+                 "program": ["gld_transactions", "gst_transactions",
+                             "shared_load_transactions", "shared_store_transactions",
+                             "gld_efficiency", "gst_efficiency", "shared_efficiency"]}
+
+all_levels = ["L1", "L2", "DRAM", "program"]
+
+def get_metric_list(mode, levels=all_levels):
+    if mode not in ops_metrics:
+        raise ValueError("ERROR: unknown mode " + str(mode) + ", aborting...")
+
+    metric_list = list(ops_metrics[mode])
+    for level in levels:
+        if level not in level_metrics:
+            raise ValueError("ERROR: unknown memory level " + str(level) + ", aborting...")
+        for metric in level_metrics[level]:
+            if metric not in metric_list:
+                metric_list.append(metric)
+    return metric_list
+
@@ -0,0 +1,45 @@
+#!/usr/bin/python
+
+import csv
+
+from src.log_streams import open_log
+
+time_units = {"s": 1.0,
+              "ms": 1.0e-3,
+              "us": 1.0e-6,
+              "ns": 1.0e-9}
+
+
+def is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def read_csv_trace(file_name):
+    # streams rows of an nvprof --csv --print-gpu-trace log as dicts, the file is never loaded as a whole,
+    # durations are converted to seconds using the units row printed after the header
+    trace_file = open_log(file_name)
+    header = None
+    duration_scale = 1.0
+    try:
+        for row in csv.reader(line for line in trace_file if not line.startswith("==")):
+            if len(row) == 0:
+                continue
+            if header is None:
+                header = row
+                continue
+            values = dict(zip(header, row))
+            duration = values.get("Duration", "")
+            if duration != "" and not is_number(duration):
+                duration_scale = time_units.get(duration, 1.0)
+                continue
+            if duration != "":
+                values["Duration"] = float(duration) * duration_scale
+            if "Name" not in values and "Kernel" in values:
+                values["Name"] = values["Kernel"]
+            yield values
+    finally:
+        trace_file.close()
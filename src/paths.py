@@ -1,7 +1,19 @@
 #!/usr/bin/python
 
+import os
+
 software_path = "./software/"
-profiling_data_path = "./profiling_results/"
+# the job server gives every job a results directory of its own
+profiling_data_path = os.environ.get("ROOFLINE_PROFILING_RESULTS", "./profiling_results/")
 exec_data_path = "./"
 nvprof_path = "nvprof"
-#nvprof_path = "/usr/local/cuda-9.2/bin/nvprof"
\ No newline at end of file
+#nvprof_path = "/usr/local/cuda-9.2/bin/nvprof"
+profiling_cache_path = "./profiling_cache/"
+profiling_cache_max_size = 256 * 1024 * 1024 # bytes
+
+# kept next to the results, so jobs of the job server write stores of their own as well
+results_store_path = os.path.join(profiling_data_path, "results.db")
+perf_path = "perf"
+ncu_path = "ncu"
+nvidia_smi_path = "nvidia-smi"
+profiling_jobs_path = "./profiling_jobs/"
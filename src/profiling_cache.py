@@ -0,0 +1,89 @@
+#!/usr/bin/python
+
+import hashlib
+import json
+import os
+
+from src.paths import *
+
+
+def get_file_hash(file_name):
+    file_hash = hashlib.sha256()
+    hashed_file = open(file_name, 'rb')
+    chunk = hashed_file.read(1024 * 1024)
+    while chunk:
+        file_hash.update(chunk)
+        chunk = hashed_file.read(1024 * 1024)
+    hashed_file.close()
+    return file_hash.hexdigest()
+
+
+class ProfilingCache:
+    def __init__(self, cache_path=profiling_cache_path, max_size=profiling_cache_max_size):
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.file_hashes = {}
+
+    def get_executable_hash(self, file_name):
+        # the same binary is usually checked for every kernel, so its hash is computed once per size and mtime
+        file_stat = os.stat(file_name)
+        stat_key = (file_name, file_stat.st_size, file_stat.st_mtime)
+        if stat_key not in self.file_hashes:
+            self.file_hashes[stat_key] = get_file_hash(file_name)
+        return self.file_hashes[stat_key]
+
+    def get_key(self, executable, application_params, mode, kernel_name, find_approximate_name, metric_names,
+                settings_description=""):
+        key = hashlib.sha256()
+        key.update(self.get_executable_hash(executable).encode("utf-8"))
+        key_fields = [" ".join(application_params), mode, kernel_name, str(find_approximate_name),
+                      ",".join(sorted(metric_names.split(",")))]
+        if settings_description != "":
+            key_fields.append(settings_description)
+        key.update("\n".join(key_fields).encode("utf-8"))
+        return key.hexdigest()
+
+    def get_entry_file_name(self, key):
+        return os.path.join(self.cache_path, key + ".json")
+
+    def get(self, key):
+        entry_file_name = self.get_entry_file_name(key)
+        if not os.path.isfile(entry_file_name):
+            return None
+        try:
+            entry_file = open(entry_file_name, 'r')
+            entry = json.load(entry_file)
+            entry_file.close()
+        except ValueError:
+            os.remove(entry_file_name)
+            return None
+        os.utime(entry_file_name, None)  # recently used entries are evicted last
+        return entry
+
+    def put(self, key, entry):
+        if not os.path.exists(self.cache_path):
+            os.makedirs(self.cache_path)
+        entry_file_name = self.get_entry_file_name(key)
+        tmp_file_name = entry_file_name + ".tmp"
+        entry_file = open(tmp_file_name, 'w')
+        json.dump(entry, entry_file)
+        entry_file.close()
+        os.rename(tmp_file_name, entry_file_name)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for file_name in os.listdir(self.cache_path):
+            if not file_name.endswith(".json"):
+                continue
+            file_stat = os.stat(os.path.join(self.cache_path, file_name))
+            entries.append((file_stat.st_mtime, file_stat.st_size, file_name))
+            total_size += file_stat.st_size
+
+        entries.sort()
+        for mtime, size, file_name in entries:
+            if total_size <= self.max_size:
+                break
+            os.remove(os.path.join(self.cache_path, file_name))
+            total_size -= size
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+
+import csv
+
+from src.bottleneck_analysis import classify_profiling_data
+
+# allowed drop of the percent of roof of a point, in percentage points
+default_regression_threshold = 5.0
+
+comparison_columns = ["kernel", "level", "memory_roof", "old_ai", "new_ai", "ai_change", "old_gops", "new_gops",
+                      "gops_change", "old_percent_of_roof", "new_percent_of_roof", "percent_of_roof_change",
+                      "regression"]
+
+
+def get_point_key(profiling_data):
+    # points of two result sets are matched by kernel name and memory level
+    kernel = profiling_data.get("kernel", profiling_data["name"])
+    level = profiling_data.get("level", profiling_data["memory_roof"])
+    return str(kernel).strip(), str(level).strip()
+
+
+def get_relative_change(old_value, new_value):
+    # in percent of the old value
+    if old_value == 0:
+        if new_value == 0:
+            return 0.0
+        return float("inf")
+    return 100.0 * (new_value - old_value) / old_value
+
+
+def get_points_positions(profiling_data_array):
+    # key -> position of its first point, keys in the order of the points
+    positions = {}
+    keys = []
+    for pos in range(len(profiling_data_array)):
+        key = get_point_key(profiling_data_array[pos])
+        if key not in positions:
+            positions[key] = pos
+            keys.append(key)
+    return positions, keys
+
+
+def compare_points(platform_characteristics, precision, baseline_data, candidate_data,
+                   threshold=default_regression_threshold):
+    # precision is a peak_performances key, a matched point is a regression when its percent of roof
+    # drops by more than threshold percentage points
+    baseline_positions, baseline_keys = get_points_positions(baseline_data)
+    candidate_positions, candidate_keys = get_points_positions(candidate_data)
+    baseline_classification = None
+    candidate_classification = None
+    if baseline_data and candidate_data:
+        baseline_classification = classify_profiling_data(platform_characteristics, precision, baseline_data)
+        candidate_classification = classify_profiling_data(platform_characteristics, precision, candidate_data)
+
+    points = []
+    for key in candidate_keys:
+        if key not in baseline_positions:
+            continue
+        old_pos = baseline_positions[key]
+        new_pos = candidate_positions[key]
+        old_data = baseline_data[old_pos]
+        new_data = candidate_data[new_pos]
+        point = {"kernel": key[0],
+                 "level": key[1],
+                 "memory_roof": str(new_data["memory_roof"]).strip(),
+                 "old_ai": float(old_data["ops_per_byte"]),
+                 "new_ai": float(new_data["ops_per_byte"]),
+                 "old_gops": float(old_data["giops"]),
+                 "new_gops": float(new_data["giops"]),
+                 "old_percent_of_roof": float(baseline_classification["percent_of_roof"][old_pos]),
+                 "new_percent_of_roof": float(candidate_classification["percent_of_roof"][new_pos])}
+        point["ai_change"] = get_relative_change(point["old_ai"], point["new_ai"])
+        point["gops_change"] = get_relative_change(point["old_gops"], point["new_gops"])
+        point["percent_of_roof_change"] = point["new_percent_of_roof"] - point["old_percent_of_roof"]
+        point["regression"] = point["percent_of_roof_change"] < -threshold
+        points.append(point)
+
+    return {"points": points,
+            "threshold": threshold,
+            "only_in_baseline": [key for key in baseline_keys if key not in candidate_positions],
+            "only_in_candidate": [key for key in candidate_keys if key not in baseline_positions]}
+
+
+def get_regressions(comparison):
+    return [point for point in comparison["points"] if point["regression"]]
+
+
+def get_failures(comparison, allow_missing=False):
+    # reasons to fail the CI gate: regressions, an empty candidate and, unless allowed, baseline points
+    # missing in the candidate, a kernel which was not profiled at all must not pass as an improvement
+    failures = []
+    for point in get_regressions(comparison):
+        failures.append("regression: " + point["kernel"] + " (" + point["level"] + ")")
+    if not comparison["points"] and not comparison["only_in_candidate"]:
+        failures.append("candidate has no points")
+    elif not allow_missing:
+        for kernel, level in comparison["only_in_baseline"]:
+            failures.append("missing in candidate: " + kernel + " (" + level + ")")
+    return failures
+
+
+def print_comparison(comparison):
+    points = comparison["points"]
+    name_width = len("kernel (level)")
+    for point in points:
+        name_width = max(name_width, len(point["kernel"] + " (" + point["level"] + ")"))
+    print("%-*s %10s %10s %12s %12s %9s" % (name_width, "kernel (level)", "AI, %", "GOPS, %", "old % roof",
+                                            "new % roof", "change"))
+    for point in points:
+        status = ""
+        if point["regression"]:
+            status = " REGRESSION"
+        print("%-*s %+10.1f %+10.1f %12.1f %12.1f %+9.1f%s" % (name_width, point["kernel"] + " (" + point["level"] + ")",
+                                                               point["ai_change"], point["gops_change"],
+                                                               point["old_percent_of_roof"],
+                                                               point["new_percent_of_roof"],
+                                                               point["percent_of_roof_change"], status))
+    for kernel, level in comparison["only_in_baseline"]:
+        print("only in baseline: " + kernel + " (" + level + ")")
+    for kernel, level in comparison["only_in_candidate"]:
+        print("only in candidate: " + kernel + " (" + level + ")")
+    regressions = get_regressions(comparison)
+    print("%d of %d points dropped more than %.1f percentage points below their baseline percent of roof" %
+          (len(regressions), len(points), comparison["threshold"]))
+    if comparison["only_in_baseline"]:
+        print("%d baseline points are missing in the candidate" % len(comparison["only_in_baseline"]))
+
+
+def save_comparison(file_name, comparison):
+    output_file = open(file_name, 'w')
+    writer = csv.writer(output_file)
+    writer.writerow(comparison_columns)
+    for point in comparison["points"]:
+        writer.writerow([point[column] for column in comparison_columns])
+    output_file.close()
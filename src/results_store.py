@@ -0,0 +1,272 @@
+#!/usr/bin/python
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+
+from src.paths import *
+
+store_schema = ["CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, app TEXT, platform TEXT, mode TEXT, "
+                "date TEXT, metadata TEXT)",
+                "CREATE TABLE IF NOT EXISTS kernels (id INTEGER PRIMARY KEY, run_id INTEGER REFERENCES runs(id), "
+                "kernel TEXT, execution_time REAL, counters TEXT)",
+                "CREATE TABLE IF NOT EXISTS points (id INTEGER PRIMARY KEY, kernel_id INTEGER REFERENCES kernels(id), "
+                "level TEXT, memory_roof TEXT, label TEXT, ai REAL, gops REAL, gops_low REAL, gops_high REAL, "
+                "ai_percentiles TEXT, gops_percentiles TEXT)",
+                "CREATE INDEX IF NOT EXISTS runs_app ON runs(app)",
+                "CREATE INDEX IF NOT EXISTS runs_platform ON runs(platform)",
+                "CREATE INDEX IF NOT EXISTS runs_date ON runs(date)",
+                "CREATE INDEX IF NOT EXISTS kernels_run ON kernels(run_id)",
+                "CREATE INDEX IF NOT EXISTS kernels_kernel ON kernels(kernel)",
+                "CREATE INDEX IF NOT EXISTS points_kernel ON points(kernel_id)"]
+
+
+# columns added after the first version of the schema, they are created in existing stores on open
+store_added_columns = [("points", "gops_low", "REAL"),
+                       ("points", "gops_high", "REAL"),
+                       ("points", "ai_percentiles", "TEXT"),
+                       ("points", "gops_percentiles", "TEXT")]
+
+
+def get_current_date():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ResultsStore:
+    def __init__(self, db_path=results_store_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir != "" and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.connection = sqlite3.connect(db_path)
+        for statement in store_schema:
+            self.connection.execute(statement)
+        self.add_missing_columns()
+        self.connection.commit()
+
+    def add_missing_columns(self):
+        for table, column, column_type in store_added_columns:
+            existing_columns = []
+            for row in self.connection.execute("PRAGMA table_info(" + table + ")"):
+                existing_columns.append(row[1])
+            if column not in existing_columns:
+                self.connection.execute("ALTER TABLE " + table + " ADD COLUMN " + column + " " + column_type)
+
+    def close(self):
+        self.connection.close()
+
+    def add_run(self, app, platform, mode, date=None, metadata=None):
+        if date is None:
+            date = get_current_date()
+        cursor = self.connection.execute("INSERT INTO runs (app, platform, mode, date, metadata) VALUES (?, ?, ?, ?, ?)",
+                                         (app, platform, mode, date, json.dumps(metadata or {})))
+        return cursor.lastrowid
+
+    def add_kernel(self, run_id, kernel, execution_time, counters, points):
+        # points is a list of dicts with level, memory_roof, label, ai and gops keys,
+        # gops_low and gops_high (confidence interval of performance), ai_percentiles and gops_percentiles
+        # (percentiles of single kernel invocations) are optional
+        cursor = self.connection.execute("INSERT INTO kernels (run_id, kernel, execution_time, counters) "
+                                         "VALUES (?, ?, ?, ?)",
+                                         (run_id, kernel, execution_time, json.dumps(counters or {})))
+        kernel_id = cursor.lastrowid
+        point_rows = []
+        for point in points:
+            ai_percentiles = None
+            gops_percentiles = None
+            if "ai_percentiles" in point:
+                ai_percentiles = json.dumps(point["ai_percentiles"])
+                gops_percentiles = json.dumps(point["gops_percentiles"])
+            point_rows.append((kernel_id, point["level"], point["memory_roof"], point["label"], point["ai"],
+                               point["gops"], point.get("gops_low"), point.get("gops_high"), ai_percentiles,
+                               gops_percentiles))
+        self.connection.executemany("INSERT INTO points (kernel_id, level, memory_roof, label, ai, gops, gops_low, "
+                                    "gops_high, ai_percentiles, gops_percentiles) "
+                                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", point_rows)
+        return kernel_id
+
+    def commit(self):
+        self.connection.commit()
+
+    def get_runs(self, app=None, platform=None, date_from=None, date_to=None):
+        query = "SELECT id, app, platform, mode, date, metadata FROM runs WHERE 1 = 1"
+        params = []
+        for condition, value in [("app = ?", app), ("platform = ?", platform),
+                                 ("date >= ?", date_from), ("date <= ?", date_to)]:
+            if value is not None:
+                query += " AND " + condition
+                params.append(value)
+        query += " ORDER BY date, id"
+        runs = []
+        for run_id, app, platform, mode, date, metadata in self.connection.execute(query, params):
+            runs.append({"id": run_id, "app": app, "platform": platform, "mode": mode, "date": date,
+                         "metadata": json.loads(metadata)})
+        return runs
+
+    def get_latest_run(self, app=None, platform=None):
+        runs = self.get_runs(app, platform)
+        if len(runs) == 0:
+            return None
+        return runs[-1]
+
+    def get_points(self, run_id, kernel=None, level=None):
+        # returns points in the format used by RooflinePlotter
+        query = "SELECT kernels.kernel, kernels.execution_time, points.level, points.memory_roof, points.label, " \
+                "points.ai, points.gops, points.gops_low, points.gops_high, points.ai_percentiles, " \
+                "points.gops_percentiles FROM points JOIN kernels ON points.kernel_id = kernels.id " \
+                "WHERE kernels.run_id = ?"
+        params = [run_id]
+        if kernel is not None:
+            query += " AND kernels.kernel = ?"
+            params.append(kernel)
+        if level is not None:
+            query += " AND points.level = ?"
+            params.append(level)
+        query += " ORDER BY points.id"
+        points = []
+        for kernel, execution_time, level, memory_roof, label, ai, gops, gops_low, gops_high, ai_percentiles, \
+                gops_percentiles in self.connection.execute(query, params):
+            point = {"name": label,
+                     "kernel": kernel,
+                     "level": level,
+                     "ops_per_byte": ai,
+                     "giops": gops,
+                     "memory_roof": memory_roof,
+                     "execution_time": execution_time}
+            if gops_low is not None:
+                point["giops_low"] = gops_low
+                point["giops_high"] = gops_high
+            if ai_percentiles is not None:
+                point["ops_per_byte_percentiles"] = json.loads(ai_percentiles)
+                point["giops_percentiles"] = json.loads(gops_percentiles)
+            points.append(point)
+        return points
+
+    def get_counters(self, run_id, kernel):
+        row = self.connection.execute("SELECT counters FROM kernels WHERE run_id = ? AND kernel = ?",
+                                      (run_id, kernel)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def import_text_file(self, file_name, app=None, platform="", date=None):
+        # imports results files written by the GPU collector, the Intel collector or the visualizer format
+        if date is None:
+            date = datetime.datetime.fromtimestamp(os.path.getmtime(file_name)).strftime("%Y-%m-%d %H:%M:%S")
+        if app is None:
+            app = os.path.splitext(os.path.basename(file_name).replace("_profiling_results.txt", ""))[0]
+
+        file_app, mode, kernels = read_results_text_file(file_name)
+        if file_app is not None:
+            app = file_app
+
+        run_id = self.add_run(app, platform, mode, date, {"imported_from": os.path.abspath(file_name)})
+        for kernel, points in kernels:
+            self.add_kernel(run_id, kernel, None, None, points)
+        self.commit()
+        return run_id
+
+
+def is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def read_results_text_file(file_name):
+    # returns (app or None, mode, [(kernel, points)]) of a GPU collector, Intel collector or visualizer format file,
+    # points are dicts with level, memory_roof, label, ai and gops keys like in ResultsStore.add_kernel
+    app = None
+    mode = ""
+    kernels = []
+    kernels_pos = {}
+    results_file = open(file_name, 'r')
+    line_pos = 0
+    for line in results_file:
+        line_pos += 1
+        line = line.rstrip("\n")
+        if line.startswith("APP:"):
+            app = line.split()[1]
+            continue
+        if line.startswith("MODE:"):
+            mode = line.split()[1]
+            continue
+        if line_pos == 1 and "|" not in line:
+            mode = line.strip()
+            continue
+        if line.startswith("#") or line.startswith("//") or line.startswith("KERNEL") or "|" not in line:
+            continue
+
+        line_split = line.split("|")
+        label = line_split[0].strip()
+        point = {}
+        if len(line_split) == 3 or (len(line_split) == 5 and is_number(line_split[3])):
+            # Intel collector format: name|AI|GOPS[|GOPS low|GOPS high], GPU lines have a memory roof instead
+            ai = float(line_split[1])
+            gops = float(line_split[2])
+            memory_roof = "L1"
+            if len(line_split) == 5:
+                point["gops_low"] = float(line_split[3])
+                point["gops_high"] = float(line_split[4])
+            if mode == "":
+                mode = "sp"  # Intel collector counts single precision operations
+        else:
+            gops = float(line_split[1])
+            ai = float(line_split[2])
+            memory_roof = line_split[3].strip()
+            if len(line_split) >= 7 and line_split[5] != "":
+                point["gops_low"] = float(line_split[5])
+                point["gops_high"] = float(line_split[6])
+            if len(line_split) >= 9:
+                point["ai_percentiles"] = [float(value) for value in line_split[7].split(",")]
+                point["gops_percentiles"] = [float(value) for value in line_split[8].split(",")]
+
+        kernel = label
+        level = memory_roof
+        if " (" in label:
+            kernel = label[:label.index(" (")]
+            level = label[label.index(" (") + 2:].split(")")[0]
+
+        if kernel not in kernels_pos:
+            kernels_pos[kernel] = len(kernels)
+            kernels.append((kernel, []))
+        point.update({"level": level, "memory_roof": memory_roof, "label": label, "ai": ai, "gops": gops})
+        kernels[kernels_pos[kernel]][1].append(point)
+    results_file.close()
+    return app, mode, kernels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Imports profiling results text files into the results store.')
+
+    parser.add_argument('files', nargs='+',
+                        help="Profiling results files to import.")
+
+    parser.add_argument('-d', '--database',
+                        action="store", dest="database",
+                        help="Results store database file.",
+                        default=results_store_path)
+
+    parser.add_argument('-p', '--platform',
+                        action="store", dest="platform",
+                        help="Platform the imported results were collected on.",
+                        default="")
+
+    parser.add_argument('-a', '--app',
+                        action="store", dest="app",
+                        help="Application name, by default it is taken from the file.")
+
+    args = parser.parse_args()
+
+    store = ResultsStore(args.database)
+    for file_name in args.files:
+        run_id = store.import_text_file(file_name, args.app, args.platform)
+        print("imported " + file_name + " as run " + str(run_id))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
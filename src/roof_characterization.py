@@ -0,0 +1,389 @@
+#!/usr/bin/python
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import socket
+from subprocess import Popen, PIPE
+
+from src.paths import *
+
+# native micro-benchmarks, python can not get close to the peak numbers, so this source is compiled with
+# -march=native for the host it runs on, every benchmark runs on all cores (OpenMP threads)
+benchmark_source = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include <omp.h>
+
+#define ACCUMULATORS 12
+
+typedef float vfloat __attribute__((vector_size(VECTOR_BYTES)));
+typedef double vdouble __attribute__((vector_size(VECTOR_BYTES)));
+typedef int vint __attribute__((vector_size(VECTOR_BYTES)));
+
+volatile double benchmark_sink;
+
+#define PEAK_KERNEL(NAME, TYPE, SCALAR, B, C, OPERATION, OPS_PER_ELEMENT, ATTRIBUTES)            \
+ATTRIBUTES static double NAME(long iterations)                                                  \
+{                                                                                               \
+    double start = omp_get_wtime();                                                             \
+    double sink = 0.0;                                                                          \
+    _Pragma("omp parallel reduction(+: sink)")                                                  \
+    {                                                                                           \
+        TYPE acc[ACCUMULATORS];                                                                 \
+        TYPE b = (TYPE){} + (SCALAR)(B);                                                        \
+        TYPE c = (TYPE){} + (SCALAR)(C);                                                        \
+        for (int j = 0; j < ACCUMULATORS; j++)                                                  \
+            acc[j] = (TYPE){} + (SCALAR)(j + omp_get_thread_num() + 1);                         \
+        for (long i = 0; i < iterations; i++)                                                   \
+        {                                                                                       \
+            _Pragma("GCC unroll 16")                                                            \
+            for (int j = 0; j < ACCUMULATORS; j++)                                              \
+                acc[j] = OPERATION;                                                             \
+        }                                                                                       \
+        for (int j = 0; j < ACCUMULATORS; j++)                                                  \
+            sink += (double)acc[j][0];                                                          \
+    }                                                                                           \
+    double elapsed = omp_get_wtime() - start;                                                   \
+    benchmark_sink = sink;                                                                      \
+    double ops = (double)iterations * ACCUMULATORS * (VECTOR_BYTES / sizeof(SCALAR)) *          \
+                 OPS_PER_ELEMENT * omp_get_max_threads();                                       \
+    return ops / elapsed / 1e9;                                                                 \
+}
+
+#define NO_CONTRACTION __attribute__((optimize("fp-contract=off")))
+
+PEAK_KERNEL(peak_float, vfloat, float, 0.999999f, 0.000001f, acc[j] * b + c, 2, )
+PEAK_KERNEL(peak_float_no_fma, vfloat, float, 0.999999f, 0.000001f, acc[j] * b + c, 2, NO_CONTRACTION)
+PEAK_KERNEL(peak_double, vdouble, double, 0.999999, 0.000001, acc[j] * b + c, 2, )
+PEAK_KERNEL(peak_double_no_fma, vdouble, double, 0.999999, 0.000001, acc[j] * b + c, 2, NO_CONTRACTION)
+PEAK_KERNEL(peak_integer, vint, int, 0x5bd1e995, 1, (acc[j] ^ b) + c, 2, )
+
+static double read_bandwidth_run(long elements, long repeats, double *elapsed)
+{
+    double start = 0.0;
+    double sink = 0.0;
+    #pragma omp parallel reduction(+: sink)
+    {
+        // every thread reads its own array, first touch keeps it in the local NUMA node
+        vfloat *data = aligned_alloc(64, elements * sizeof(vfloat));
+        for (long i = 0; i < elements; i++)
+            data[i] = (vfloat){} + 1.0f;
+        vfloat acc0 = {}, acc1 = {}, acc2 = {}, acc3 = {};
+        #pragma omp barrier
+        #pragma omp master
+        start = omp_get_wtime();
+        #pragma omp barrier
+        for (long r = 0; r < repeats; r++)
+        {
+            for (long i = 0; i < elements; i += 4)
+            {
+                acc0 += data[i];
+                acc1 += data[i + 1];
+                acc2 += data[i + 2];
+                acc3 += data[i + 3];
+            }
+        }
+        #pragma omp barrier
+        #pragma omp master
+        *elapsed = omp_get_wtime() - start;
+        acc0 += acc1 + acc2 + acc3;
+        sink += acc0[0];
+        free(data);
+    }
+    benchmark_sink = sink;
+    return (double)elements * sizeof(vfloat) * repeats * omp_get_max_threads();
+}
+
+static double read_bandwidth(long bytes_per_thread, double min_time)
+{
+    long elements = bytes_per_thread / sizeof(vfloat) / 4 * 4;
+    if (elements < 4)
+        elements = 4;
+    long repeats = 1;
+    double elapsed = 0.0;
+    double bytes = 0.0;
+    while (1)
+    {
+        bytes = read_bandwidth_run(elements, repeats, &elapsed);
+        if (elapsed >= min_time)
+            break;
+        repeats *= 2;
+    }
+    return bytes / elapsed / 1e9;
+}
+
+static double repeat_peak(double (*kernel)(long), double min_time)
+{
+    long iterations = 1024;
+    double best = 0.0;
+    while (1)
+    {
+        double start = omp_get_wtime();
+        double result = kernel(iterations);
+        double elapsed = omp_get_wtime() - start;
+        if (elapsed >= min_time)
+            return result > best ? result : best;
+        best = result > best ? result : best;
+        iterations *= 2;
+    }
+}
+
+int main(int argc, char **argv)
+{
+    double min_time = atof(argv[1]);
+    printf("THREADS %d\n", omp_get_max_threads());
+    printf("PEAK float %f\n", repeat_peak(peak_float, min_time));
+    printf("PEAK float_no_fma %f\n", repeat_peak(peak_float_no_fma, min_time));
+    printf("PEAK double %f\n", repeat_peak(peak_double, min_time));
+    printf("PEAK double_no_fma %f\n", repeat_peak(peak_double_no_fma, min_time));
+    printf("PEAK integer %f\n", repeat_peak(peak_integer, min_time));
+    for (int i = 2; i < argc; i++)
+    {
+        long bytes_per_thread = atol(argv[i]);
+        printf("BANDWIDTH %ld %f\n", bytes_per_thread, read_bandwidth(bytes_per_thread, min_time));
+    }
+    return 0;
+}
+"""
+
+characterization_cache_path = profiling_cache_path + "roofs/"
+compiler_path = "cc"
+benchmark_min_time = 0.2  # seconds per measurement
+dram_min_bytes_per_thread = 16 * 1024 * 1024
+
+cache_size_units = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+
+
+def read_text_file(file_name):
+    text_file = open(file_name, 'r')
+    text = text_file.read().strip()
+    text_file.close()
+    return text
+
+
+def count_cpu_list(cpu_list):
+    # "0-3,8-11" -> 8
+    count = 0
+    for cpu_range in cpu_list.split(","):
+        if "-" in cpu_range:
+            first, last = cpu_range.split("-")
+            count += int(last) - int(first) + 1
+        elif cpu_range != "":
+            count += 1
+    return count
+
+
+def get_cache_levels(cpu_path="/sys/devices/system/cpu/cpu0/cache/"):
+    # data and unified caches of the first core as (level, size in bytes, number of cpus sharing it)
+    if not os.path.isdir(cpu_path):
+        raise ValueError("ERROR: cache description " + cpu_path + " is not available, aborting...")
+    levels = []
+    for index in sorted(os.listdir(cpu_path)):
+        if not index.startswith("index"):
+            continue
+        index_path = os.path.join(cpu_path, index)
+        if read_text_file(os.path.join(index_path, "type")) == "Instruction":
+            continue
+        size = read_text_file(os.path.join(index_path, "size"))
+        size_bytes = int(size.rstrip("KMG")) * cache_size_units.get(size[-1], 1)
+        shared_cpus = count_cpu_list(read_text_file(os.path.join(index_path, "shared_cpu_list")))
+        levels.append((int(read_text_file(os.path.join(index_path, "level"))), size_bytes, max(shared_cpus, 1)))
+    return sorted(levels)
+
+
+def get_cpu_info():
+    model_name = platform.processor()
+    flags = []
+    if os.path.isfile("/proc/cpuinfo"):
+        for line in open("/proc/cpuinfo", 'r'):
+            if line.startswith("model name"):
+                model_name = line.split(":", 1)[1].strip()
+            elif line.startswith("flags"):
+                flags = line.split(":", 1)[1].split()
+                break
+    return model_name, flags
+
+
+def get_vector_bytes(cpu_flags):
+    if "avx512f" in cpu_flags:
+        return 64
+    if "avx" in cpu_flags:
+        return 32
+    return 16
+
+
+def get_memory_size():
+    if os.path.isfile("/proc/meminfo"):
+        for line in open("/proc/meminfo", 'r'):
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def get_host_description(threads=None):
+    model_name, cpu_flags = get_cpu_info()
+    if threads is None:
+        threads = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.sysconf("SC_NPROCESSORS_ONLN")
+    return {"host": socket.gethostname(),
+            "cpu": model_name,
+            "threads": threads,
+            "vector_bytes": get_vector_bytes(cpu_flags),
+            "caches": get_cache_levels(),
+            "memory": get_memory_size()}
+
+
+def get_host_fingerprint(host_description):
+    fingerprint = hashlib.sha256(json.dumps(host_description, sort_keys=True).encode("utf-8"))
+    return fingerprint.hexdigest()[:16]
+
+
+def get_sweep_sizes(host_description):
+    # working set sizes per thread: powers of two and their midpoints from 4 KB to well beyond the last cache
+    threads = host_description["threads"]
+    last_cache_bytes = 0
+    for level, size_bytes, shared_cpus in host_description["caches"]:
+        last_cache_bytes = max(last_cache_bytes, size_bytes * max(threads // shared_cpus, 1))
+    dram_bytes_per_thread = max(4 * last_cache_bytes // threads, dram_min_bytes_per_thread)
+
+    sizes = []
+    size = 4 * 1024
+    while size < dram_bytes_per_thread:
+        sizes.append(size)
+        if size + size // 2 < dram_bytes_per_thread:
+            sizes.append(size + size // 2)
+        size *= 2
+    sizes.append(dram_bytes_per_thread)
+    return sizes
+
+
+def compile_benchmark(host_description, fingerprint):
+    source_file_name = characterization_cache_path + "roof_benchmark.c"
+    binary_file_name = characterization_cache_path + "roof_benchmark_" + fingerprint
+    if os.path.isfile(binary_file_name):
+        return binary_file_name
+    source_file = open(source_file_name, 'w')
+    source_file.write(benchmark_source)
+    source_file.close()
+    compile_command = [compiler_path, "-O3", "-march=native", "-fopenmp",
+                       "-DVECTOR_BYTES=" + str(host_description["vector_bytes"]),
+                       "-o", binary_file_name, source_file_name]
+    print(" ".join(compile_command))
+    cmd = Popen(compile_command, stdout=PIPE, stderr=PIPE)
+    output, errors = cmd.communicate()
+    if cmd.returncode != 0:
+        raise ValueError("ERROR: failed to compile roof benchmarks: " + errors.decode("utf-8", "replace") +
+                         ", aborting...")
+    return binary_file_name
+
+
+def run_benchmark(binary_file_name, threads, sizes, min_time):
+    environment = dict(os.environ)
+    environment["OMP_NUM_THREADS"] = str(threads)
+    environment.setdefault("OMP_PROC_BIND", "spread")
+    environment.setdefault("OMP_PLACES", "cores")
+    command = [binary_file_name, str(min_time)] + [str(size) for size in sizes]
+    print(" ".join(command))
+    cmd = Popen(command, stdout=PIPE, env=environment)
+    output, errors = cmd.communicate()
+    if cmd.returncode != 0:
+        raise ValueError("ERROR: roof benchmarks failed with code " + str(cmd.returncode) + ", aborting...")
+
+    peak_performances = {}
+    bandwidth_sweep = []
+    for line in output.decode("utf-8").splitlines():
+        tokens = line.split()
+        if len(tokens) == 3 and tokens[0] == "PEAK":
+            peak_performances[tokens[1]] = float(tokens[2])
+        elif len(tokens) == 3 and tokens[0] == "BANDWIDTH":
+            bandwidth_sweep.append([int(tokens[1]), float(tokens[2])])
+    return peak_performances, bandwidth_sweep
+
+
+def get_level_bandwidths(host_description, bandwidth_sweep):
+    # a cache level gets the best bandwidth measured for working sets which fit into it, but clearly do not
+    # fit into the previous level, DRAM gets the bandwidth of the largest working set, levels are named
+    # like the memory roofs of the collected points ("L1", "L2", "L3", "DRAM")
+    bandwidths = {}
+    previous_bytes = 0
+    for level, size_bytes, shared_cpus in host_description["caches"]:
+        level_bytes = size_bytes // min(shared_cpus, host_description["threads"])
+        candidates = [bandwidth for size, bandwidth in bandwidth_sweep if 2 * previous_bytes < size <= level_bytes // 2]
+        if not candidates:
+            candidates = [bandwidth for size, bandwidth in bandwidth_sweep if previous_bytes < size <= level_bytes]
+        if candidates:
+            bandwidths["L" + str(level)] = round(max(candidates), 1)
+        previous_bytes = level_bytes
+    bandwidths["DRAM"] = round(bandwidth_sweep[-1][1], 1)
+    return bandwidths
+
+
+def characterize_platform(threads=None, min_time=benchmark_min_time, use_cache=True):
+    # returns a platform description in the visualization.platforms format, measured on this host
+    host_description = get_host_description(threads)
+    fingerprint = get_host_fingerprint(host_description)
+    result_file_name = characterization_cache_path + fingerprint + ".json"
+    if use_cache and os.path.isfile(result_file_name):
+        result_file = open(result_file_name, 'r')
+        platform_characteristics = json.load(result_file)
+        result_file.close()
+        # results cached with lowercase level names are measured again
+        if "DRAM" in platform_characteristics["bandwidths"]:
+            return platform_characteristics
+
+    if not os.path.exists(characterization_cache_path):
+        os.makedirs(characterization_cache_path)
+    binary_file_name = compile_benchmark(host_description, fingerprint)
+    peak_performances, bandwidth_sweep = run_benchmark(binary_file_name, host_description["threads"],
+                                                       get_sweep_sizes(host_description), min_time)
+    for key in peak_performances:
+        peak_performances[key] = round(peak_performances[key], 1)
+
+    platform_characteristics = {"bandwidths": get_level_bandwidths(host_description, bandwidth_sweep),  # GB/s
+                                "peak_performances": peak_performances,  # GIOP/s, GFLOP/s
+                                "bandwidth_sweep": bandwidth_sweep,
+                                "host": host_description,
+                                "fingerprint": fingerprint}
+
+    result_file = open(result_file_name + ".tmp", 'w')
+    json.dump(platform_characteristics, result_file, indent=4, sort_keys=True)
+    result_file.close()
+    os.rename(result_file_name + ".tmp", result_file_name)
+    return platform_characteristics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures cache, DRAM bandwidths and peak performances of this host.')
+
+    parser.add_argument('-o', '--output',
+                        action="store", dest="output",
+                        help="JSON file for the platform description, usable as the visualization -p argument.")
+
+    parser.add_argument('-j', '--threads',
+                        action="store", dest="threads", type=int,
+                        help="Number of threads, all available cores by default.")
+
+    parser.add_argument('--min-time',
+                        action="store", dest="min_time", type=float,
+                        help="Minimal duration of every measurement in seconds.",
+                        default=benchmark_min_time)
+
+    parser.add_argument('--force',
+                        action="store_true", dest="force",
+                        help="Measure again, even if results for this host are cached.")
+
+    args = parser.parse_args()
+
+    platform_characteristics = characterize_platform(args.threads, args.min_time, not args.force)
+    print("bandwidths (GB/s): " + json.dumps(platform_characteristics["bandwidths"], sort_keys=True))
+    print("peak performances (GOP/s): " + json.dumps(platform_characteristics["peak_performances"], sort_keys=True))
+    if args.output is not None:
+        output_file = open(args.output, 'w')
+        json.dump(platform_characteristics, output_file, indent=4, sort_keys=True)
+        output_file.close()
+
+
+if __name__ == "__main__":
+    main()
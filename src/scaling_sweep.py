@@ -0,0 +1,149 @@
+#!/usr/bin/python
+
+import re
+
+# OMP_PROC_BIND policies, threads of a sweep point are bound to its own cores either way
+affinity_policies = ["close", "spread"]
+
+# memory levels shared by all cores keep their full bandwidth when fewer cores are active,
+# the "shared_levels" key of a platform description overrides this list
+default_shared_levels = ["DRAM", "dram", "L3", "l3_cache", "LLC"]
+
+# a kernel is considered to hit a roof once it reaches this percent of it
+saturation_percent = 90.0
+
+sweep_label_pattern = re.compile(r"^(.*) \[(\d+) threads\]$")
+
+
+def parse_thread_counts(thread_counts):
+    # "1,2,4,8" -> [1, 2, 4, 8]
+    result = []
+    for thread_count in str(thread_counts).split(","):
+        if thread_count.strip() == "":
+            continue
+        if not thread_count.strip().isdigit() or int(thread_count) < 1:
+            raise ValueError("ERROR: invalid thread count " + thread_count + ", aborting...")
+        result.append(int(thread_count))
+    return result
+
+
+def get_sweep_label(name, threads=None):
+    if threads is None:
+        return name
+    return name + " [" + str(threads) + " threads]"
+
+
+def parse_sweep_label(label):
+    # -> (name, threads), threads is None for labels of points which are not a part of a sweep
+    match = sweep_label_pattern.match(label.strip())
+    if match is None:
+        return label.strip(), None
+    return match.group(1), int(match.group(2))
+
+
+def get_sweep_waves(thread_counts, cores):
+    # sweep points which fit onto disjoint cores together form a wave and may run at the same time,
+    # returns a list of waves, every wave is a list of (point position, first core), larger points are placed first
+    order = sorted(range(len(thread_counts)), key=lambda pos: -thread_counts[pos])
+    waves = []
+    free_cores = []
+    for pos in order:
+        placed = False
+        for wave_pos in range(len(waves)):
+            if thread_counts[pos] <= free_cores[wave_pos]:
+                waves[wave_pos].append((pos, cores - free_cores[wave_pos]))
+                free_cores[wave_pos] -= thread_counts[pos]
+                placed = True
+                break
+        if not placed:
+            waves.append([(pos, 0)])
+            free_cores.append(max(cores - thread_counts[pos], 0))
+    return waves
+
+
+def get_sweep_environment(base_environment, threads, first_core, cores, affinity="close"):
+    # OpenMP threads of a sweep point are bound to the cores first_core..first_core + threads - 1
+    if affinity not in affinity_policies:
+        raise ValueError("ERROR: unknown affinity " + str(affinity) + ", aborting...")
+    environment = dict(base_environment)
+    environment["OMP_NUM_THREADS"] = str(threads)
+    environment["OMP_PROC_BIND"] = affinity
+    if threads <= cores:
+        environment["OMP_PLACES"] = "{" + str(first_core) + "}:" + str(threads)
+    else:
+        environment["OMP_PLACES"] = "threads"
+    return environment
+
+
+def get_platform_cores(platform_characteristics, cores=None):
+    if cores is not None:
+        return cores
+    if "cores" in platform_characteristics:
+        return platform_characteristics["cores"]
+    if "host" in platform_characteristics:  # measured by roof_characterization
+        return platform_characteristics["host"]["threads"]
+    raise ValueError("ERROR: number of cores of the platform is unknown, set it with --cores or a \"cores\" key of "
+                     "the platform description, aborting...")
+
+
+def scale_platform_characteristics(platform_characteristics, active_cores, cores):
+    # peak performances and bandwidths of private levels scale with the number of active cores, shared levels
+    # keep their full bandwidth, but can not be used faster than the private levels of the active cores
+    scale = float(min(active_cores, cores)) / float(cores)
+    shared_levels = platform_characteristics.get("shared_levels", default_shared_levels)
+    bandwidths = platform_characteristics["bandwidths"]
+    scaled_bandwidths = {}
+    private_bandwidths = []
+    for level in bandwidths:
+        if level not in shared_levels:
+            scaled_bandwidths[level] = bandwidths[level] * scale
+            private_bandwidths.append(scaled_bandwidths[level])
+    for level in bandwidths:
+        if level in shared_levels:
+            scaled_bandwidths[level] = bandwidths[level]
+            if private_bandwidths:
+                scaled_bandwidths[level] = min(bandwidths[level], max(private_bandwidths))
+    scaled_peak_performances = {}
+    for key in platform_characteristics["peak_performances"]:
+        scaled_peak_performances[key] = platform_characteristics["peak_performances"][key] * scale
+    return {"bandwidths": scaled_bandwidths,
+            "peak_performances": scaled_peak_performances}
+
+
+def get_slowest_level(platform_characteristics):
+    bandwidths = platform_characteristics["bandwidths"]
+    return min(bandwidths, key=lambda level: bandwidths[level])
+
+
+def get_percent_of_roof(platform_characteristics, precision, level, ai, gops):
+    roof = min(platform_characteristics["peak_performances"][precision],
+               platform_characteristics["bandwidths"][level] * ai)
+    if roof <= 0:
+        return 0.0
+    return 100.0 * gops / roof
+
+
+def get_scaling_paths(profiling_data_array):
+    # sweep points grouped into paths, {name: [(threads, point)]} sorted by the number of threads
+    paths = {}
+    for profiling_data in profiling_data_array:
+        name, threads = parse_sweep_label(profiling_data["name"])
+        if threads is None:
+            continue
+        paths.setdefault(name, []).append((threads, profiling_data))
+    for name in paths:
+        paths[name].sort(key=lambda path_point: path_point[0])
+    return paths
+
+
+def get_saturation_threads(path, platform_characteristics, precision, cores, level=None):
+    # the smallest number of threads at which a kernel reaches saturation_percent of the roof of level
+    # (the slowest level, usually DRAM, by default), None when it never does
+    if level is None:
+        level = get_slowest_level(platform_characteristics)
+    for threads, profiling_data in path:
+        scaled_characteristics = scale_platform_characteristics(platform_characteristics, threads, cores)
+        if get_percent_of_roof(scaled_characteristics, precision, level, profiling_data["ops_per_byte"],
+                               profiling_data["giops"]) >= saturation_percent:
+            return threads
+    return None
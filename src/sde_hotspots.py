@@ -0,0 +1,206 @@
+#!/usr/bin/python
+
+import heapq
+import mmap
+import re
+
+from src.log_streams import open_log, can_map_log
+
+# size of a memory operand in the SDE (XED) disassembly
+memory_operand_bytes = {"byte": 1,
+                        "word": 2,
+                        "dword": 4,
+                        "qword": 8,
+                        "xmmword": 16,
+                        "ymmword": 32,
+                        "zmmword": 64}
+
+memory_operand_pattern = re.compile(r"\b(byte|word|dword|qword|xmmword|ymmword|zmmword) ptr\b")
+fp_arithmetic_pattern = re.compile(r"^v?(add|sub|mul|div|min|max|sqrt|fn?madd\d*|fn?msub\d*)(ps|pd|ss|sd)$")
+
+# instructions with memory operand syntax which do not access memory
+no_access_mnemonics = ["lea", "nop", "prefetcht0", "prefetcht1", "prefetcht2", "prefetchnta"]
+
+
+def get_vector_width(operands):
+    if "zmm" in operands:
+        return 512
+    if "ymm" in operands:
+        return 256
+    return 128
+
+
+def get_instruction_counters(extension, mnemonic, operands):
+    # SDE mix counters of one execution ("isa-ext-AVX2", "mem-read-32", "elements_fp_double_4", ...), so blocks
+    # are weighted by the same table as the counters of regions and of the whole program
+    counters = {"isa-ext-" + extension: 1}
+    if mnemonic not in no_access_mnemonics:
+        # the first operand is the destination
+        for operand_pos, operand in enumerate(operands.split(",")):
+            for operand_size in memory_operand_pattern.findall(operand):
+                access = "mem-read-"
+                if operand_pos == 0:
+                    access = "mem-write-"
+                counter_name = access + str(memory_operand_bytes[operand_size])
+                counters[counter_name] = counters.get(counter_name, 0) + 1
+
+    fp_match = fp_arithmetic_pattern.match(mnemonic)
+    if fp_match is not None:
+        suffix = fp_match.group(2)
+        if suffix == "ss":
+            counters["elements_fp_single_1"] = 1
+        elif suffix == "sd":
+            counters["elements_fp_double_1"] = 1
+        elif suffix == "ps":
+            counters["elements_fp_single_" + str(get_vector_width(operands) // 32)] = 1
+        else:
+            counters["elements_fp_double_" + str(get_vector_width(operands) // 64)] = 1
+    return counters
+
+
+def parse_attributes(line):
+    # "BLOCK: 1 PC: 401234 ICOUNT: 100 FN: main" -> {"BLOCK": "1", "PC": "401234", ...}
+    attributes = {}
+    tokens = line.lstrip("#").split()
+    pos = 0
+    while pos < len(tokens) - 1:
+        if tokens[pos].endswith(":"):
+            attributes[tokens[pos][:-1]] = tokens[pos + 1]
+            pos += 2
+        else:
+            pos += 1
+    return attributes
+
+
+class SDEHotspot:
+    def __init__(self, kind, name, icount=0):
+        self.kind = kind
+        self.name = name
+        self.icount = icount
+        self.executions = 1
+        self.counters = {}
+        self.data = {"float_instructions": 0,
+                     "double_instructions": 0,
+                     "bytes_requested": 0}
+
+    def process_instruction(self, line, counter_weights):
+        # "XDIS 401234: AVX2 C5FD5807 vaddpd ymm0, ymm0, ymmword ptr [rdi]"
+        tokens = line.split(None, 5)
+        if len(tokens) < 5:
+            return
+        mnemonic = tokens[4].lower()
+        operands = ""
+        if len(tokens) > 5:
+            operands = tokens[5].lower()
+        counters = get_instruction_counters(tokens[2], mnemonic, operands)
+        for counter_name, counter_value in counters.items():
+            self.process_counter(counter_name, counter_value * self.executions, counter_weights)
+
+    def process_counter(self, counter_name, counter_value, counter_weights):
+        self.counters[counter_name] = self.counters.get(counter_name, 0) + counter_value
+        if counter_name == "total":
+            self.icount = counter_value
+        if counter_name in counter_weights:
+            for field_name, weight in counter_weights[counter_name]:
+                if field_name in self.data:
+                    self.data[field_name] += counter_value * weight
+
+    def get_ops(self):
+        return self.data["float_instructions"]
+
+    def get_ops_per_byte(self):
+        if self.data["bytes_requested"] == 0:
+            return 0.0
+        return float(self.get_ops()) / float(self.data["bytes_requested"])
+
+
+def iterate_lines(file_name, use_mmap):
+    sde_file = open_log(file_name)
+    try:
+        if use_mmap and can_map_log(file_name):
+            mapped_file = mmap.mmap(sde_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for line in iter(mapped_file.readline, ""):
+                    yield line
+            finally:
+                mapped_file.close()
+        else:
+            for line in sde_file:
+                yield line
+    finally:
+        sde_file.close()
+
+
+def read_sde_hotspots(file_name, counter_weights, top_k=None, use_mmap=True,
+                      skip_tables=("global-dynamic-counts", "dynamic-counts-for-tid"), global_counters=None):
+    # streams over an SDE mix output and returns the hot blocks (from -top_blocks) and counter tables
+    # of marked regions, sorted by dynamic instruction count, only top_k of them are kept in memory,
+    # counters of the global table are added to global_counters, so a streamed output is read only once
+    hotspots_heap = []
+    hotspot_pos = [0]
+
+    def finish(hotspot):
+        if hotspot is None or (hotspot.icount == 0 and hotspot.get_ops() == 0):
+            return
+        hotspot_pos[0] += 1
+        item = (hotspot.icount, -hotspot_pos[0], hotspot)
+        if top_k is None or len(hotspots_heap) < top_k:
+            heapq.heappush(hotspots_heap, item)
+        elif item[:2] > hotspots_heap[0][:2]:
+            heapq.heapreplace(hotspots_heap, item)
+
+    current = None
+    global_table = False
+    for line in iterate_lines(file_name, use_mmap):
+        stripped = line.lstrip("#").strip()
+        if stripped.startswith("BLOCK:"):
+            finish(current)
+            attributes = parse_attributes(line)
+            name = "block " + attributes.get("BLOCK", "") + " " + attributes.get("FN", "") + \
+                   " @" + attributes.get("PC", "")
+            current = SDEHotspot("block", name, float(attributes.get("ICOUNT", 0)))
+            current.executions = float(attributes.get("EXECUTIONS", 1))
+            continue
+        if stripped.startswith("$"):
+            finish(current)
+            table_name = stripped[1:].strip()
+            current = None
+            global_table = table_name.startswith("global-dynamic-counts")
+            if not table_name.startswith(skip_tables):
+                current = SDEHotspot("region", table_name)
+            continue
+        if stripped.startswith("END_"):
+            finish(current)
+            current = None
+            global_table = False
+            continue
+        if global_table and global_counters is not None:
+            tokens = line.split()
+            if len(tokens) >= 2 and not tokens[0].startswith("#"):
+                try:
+                    counter_value = float(tokens[1])
+                except ValueError:
+                    continue
+                counter_name = tokens[0].lstrip("*")
+                global_counters[counter_name] = global_counters.get(counter_name, 0) + counter_value
+            continue
+        if current is None:
+            continue
+        if line.startswith("XDIS"):
+            current.process_instruction(line, counter_weights)
+            continue
+        if line.startswith("#"):
+            continue
+        tokens = line.split()
+        if len(tokens) >= 2 and current.kind == "region":
+            try:
+                counter_value = float(tokens[1])
+            except ValueError:
+                continue
+            current.process_counter(tokens[0].lstrip("*"), counter_value, counter_weights)
+    finish(current)
+
+    hotspots = []
+    for icount, pos, hotspot in sorted(hotspots_heap, reverse=True):
+        hotspots.append(hotspot)
+    return hotspots
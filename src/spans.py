@@ -0,0 +1,127 @@
+#!/usr/bin/python
+
+import json
+import os
+import time
+
+
+def get_children_cpu_time():
+    # user and system time of finished child processes (profilers, profiled applications)
+    process_times = os.times()
+    return process_times[2] + process_times[3]
+
+
+class Span:
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+        self.bytes_parsed = 0
+        self.nested_time = 0.0
+
+    def add_bytes(self, bytes_parsed):
+        self.bytes_parsed += bytes_parsed
+
+    def __enter__(self):
+        self.start = time.time()
+        self.children_cpu_start = get_children_cpu_time()
+        self.recorder.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_time = time.time() - self.start
+        self.recorder.stack.pop()
+        if self.recorder.stack:
+            self.recorder.stack[-1].nested_time += wall_time
+        self.recorder.add_event({"name": self.name,
+                                 "start": self.start,
+                                 "wall_time": wall_time,
+                                 "self_time": wall_time - self.nested_time,
+                                 "children_cpu_time": get_children_cpu_time() - self.children_cpu_start,
+                                 "bytes_parsed": self.bytes_parsed,
+                                 "pid": os.getpid(),
+                                 "args": self.args})
+        return False
+
+
+class SpanRecorder:
+    def __init__(self):
+        self.events = []
+        self.stack = []
+
+    def span(self, name, **args):
+        return Span(self, name, args)
+
+    def add_event(self, event):
+        self.events.append(event)
+
+    def add_events(self, events):
+        # spans recorded by worker processes
+        self.events.extend(events)
+
+    def take_events(self, first_event=0):
+        # events recorded since first_event, a forked worker also holds the events its parent had recorded
+        events = self.events[first_event:]
+        del self.events[first_event:]
+        return events
+
+    def get_chrome_trace(self):
+        trace_events = []
+        for event in self.events:
+            args = dict(event["args"])
+            args["children_cpu_time"] = event["children_cpu_time"]
+            args["bytes_parsed"] = event["bytes_parsed"]
+            trace_events.append({"name": event["name"],
+                                 "cat": "roofline",
+                                 "ph": "X",
+                                 "ts": int(event["start"] * 1000000),
+                                 "dur": int(event["wall_time"] * 1000000),
+                                 "pid": event["pid"],
+                                 "tid": event["pid"],
+                                 "args": args})
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, file_name):
+        # the file can be opened by chrome://tracing or Perfetto
+        trace_file = open(file_name, 'w')
+        json.dump(self.get_chrome_trace(), trace_file, default=str)
+        trace_file.close()
+
+    def get_summary(self):
+        # (stage, calls, wall time, self time, child process cpu time, bytes parsed), the most expensive first
+        stages = {}
+        for event in self.events:
+            if event["name"] not in stages:
+                stages[event["name"]] = [event["name"], 0, 0.0, 0.0, 0.0, 0]
+            stage = stages[event["name"]]
+            stage[1] += 1
+            stage[2] += event["wall_time"]
+            stage[3] += event["self_time"]
+            stage[4] += event["children_cpu_time"]
+            stage[5] += event["bytes_parsed"]
+        return sorted(stages.values(), key=lambda stage: stage[3], reverse=True)
+
+    def print_summary(self):
+        summary = self.get_summary()
+        if not summary:
+            return
+        name_width = max(len("stage"), max(len(stage[0]) for stage in summary))
+        print("%-*s %7s %10s %10s %12s %10s" % (name_width, "stage", "calls", "wall, s", "self, s", "child cpu, s",
+                                              "parsed, MB"))
+        for name, calls, wall_time, self_time, children_cpu_time, bytes_parsed in summary:
+            print("%-*s %7d %10.3f %10.3f %12.3f %10.3f" % (name_width, name, calls, wall_time, self_time,
+                                                          children_cpu_time, bytes_parsed / (1024.0 * 1024.0)))
+
+
+# spans of the current process, all pipeline stages are recorded into it
+recorder = SpanRecorder()
+
+
+def span(name, **args):
+    return recorder.span(name, **args)
+
+
+def get_file_size(file_name):
+    if os.path.isfile(file_name):
+        return os.path.getsize(file_name)
+    return 0
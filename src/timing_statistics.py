@@ -0,0 +1,95 @@
+#!/usr/bin/python
+
+import math
+
+# z value for a two-sided 95% confidence interval
+confidence_z = 1.96
+
+
+class TimingSettings:
+    def __init__(self, warmup_runs=0, min_runs=1, max_runs=1, relative_ci_width=0.05):
+        self.warmup_runs = warmup_runs
+        self.min_runs = max(1, min(min_runs, max_runs))
+        self.max_runs = max(1, max_runs)
+        self.relative_ci_width = relative_ci_width
+
+    def is_repeated(self):
+        return self.max_runs > 1
+
+    def get_description(self):
+        if not self.is_repeated():
+            return ""
+        return "warmup %d, runs %d-%d, ci %f" % (self.warmup_runs, self.min_runs, self.max_runs,
+                                                 self.relative_ci_width)
+
+
+def get_quantile(sorted_samples, quantile):
+    pos = quantile * (len(sorted_samples) - 1)
+    low = int(math.floor(pos))
+    high = int(math.ceil(pos))
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (pos - low)
+
+
+def reject_outliers(samples):
+    # Tukey fences, samples further than 1.5 IQR from the quartiles are dropped
+    sorted_samples = sorted(samples)
+    if len(sorted_samples) < 4:
+        return sorted_samples
+    q1 = get_quantile(sorted_samples, 0.25)
+    q3 = get_quantile(sorted_samples, 0.75)
+    iqr = q3 - q1
+    result = []
+    for sample in sorted_samples:
+        if q1 - 1.5 * iqr <= sample <= q3 + 1.5 * iqr:
+            result.append(sample)
+    return result
+
+
+def get_statistics(samples):
+    # median and its distribution-free confidence interval, computed from order statistics
+    sorted_samples = reject_outliers(samples)
+    n = len(sorted_samples)
+    median = get_quantile(sorted_samples, 0.5)
+    offset = confidence_z * math.sqrt(n) / 2.0
+    low_rank = max(0, int(math.floor(n / 2.0 - offset)))
+    high_rank = min(n - 1, int(math.ceil(n / 2.0 + offset)) - 1)
+    if high_rank < low_rank:
+        high_rank = low_rank
+    return {"median": median,
+            "ci_low": sorted_samples[low_rank],
+            "ci_high": sorted_samples[high_rank],
+            "runs": len(samples),
+            "outliers": len(samples) - n}
+
+
+def is_stable(statistics, relative_ci_width):
+    if statistics["median"] == 0:
+        return True
+    return (statistics["ci_high"] - statistics["ci_low"]) / statistics["median"] <= relative_ci_width
+
+
+def measure_repeatedly(measure, settings):
+    # measure() runs the application once and returns a list of times (one per measured kernel),
+    # repetition stops after max_runs or as soon as every confidence interval is tight enough
+    for run in range(settings.warmup_runs):
+        measure()
+
+    samples = []
+    statistics = []
+    for run in range(settings.max_runs):
+        times = measure()
+        if len(samples) == 0:
+            samples = [[] for time in times]
+        for pos in range(len(times)):
+            samples[pos].append(times[pos])
+
+        if len(samples[0]) < settings.min_runs:
+            continue
+        statistics = [get_statistics(kernel_samples) for kernel_samples in samples]
+        stable = True
+        for kernel_statistics in statistics:
+            if not is_stable(kernel_statistics, settings.relative_ci_width):
+                stable = False
+        if stable:
+            break
+    return samples, statistics
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import roofline_collect_gpu_metrics as gpu
+except SyntaxError:  # the collector is written for python 2
+    gpu = None
+
+fixtures_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+kernels = [("daxpy", False), ("reduce", False), ("scale", False)]
+
+
+def read_log_device(file_name):
+    # the stand-in nvprof starts every log with the devices it was given
+    log = open(file_name)
+    line = log.readline()
+    log.close()
+    return line.split(":", 1)[1].strip()
+
+
+@unittest.skipIf(gpu is None, "GPU collector can not be compiled")
+class DeviceJobsTest(unittest.TestCase):
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp(prefix="roofline_test_")
+        self.paths = (gpu.nvprof_path, gpu.exec_data_path, gpu.profiling_data_path)
+        gpu.nvprof_path = os.path.join(fixtures_path, "bin", "nvprof")
+        gpu.exec_data_path = os.path.join(fixtures_path, "bin") + "/"
+        gpu.profiling_data_path = self.output_path
+
+    def tearDown(self):
+        gpu.nvprof_path, gpu.exec_data_path, gpu.profiling_data_path = self.paths
+        shutil.rmtree(self.output_path, ignore_errors=True)
+
+    def get_metrics_log(self, kernel_pos, kernel_name):
+        return gpu.get_metrics_file_name("roofline_app", gpu.get_device_job_name(kernel_pos, [
+            gpu.ProfilingDataGPU("roofline_app", "dp", kernel_name, False)], False))
+
+    def test_kernels_are_spread_over_devices(self):
+        profiling_data_array = gpu.profile_application_kernels_on_devices("roofline_app", [], kernels, "dp",
+                                                                          ["0", "1"], timing_device="1")
+
+        # every kernel has a log of its own, the slow daxpy run holds one device while the other runs the rest
+        devices = [read_log_device(self.get_metrics_log(pos + 1, kernels[pos][0])) for pos in range(len(kernels))]
+        self.assertEqual(sorted(set(devices)), ["0", "1"])
+        self.assertNotEqual(devices[0], devices[1])
+        self.assertEqual(devices[1], devices[2])
+        self.assertLess(os.path.getmtime(self.get_metrics_log(3, "scale")),
+                        os.path.getmtime(self.get_metrics_log(1, "daxpy")))
+        for pos in range(len(kernels)):
+            self.assertTrue(os.path.isfile(gpu.get_program_output_file_name(
+                "roofline_app", gpu.get_device_job_name(pos + 1, [profiling_data_array[pos]], False))))
+        # timing runs are done on the timing device only
+        timing_logs = [file_name for file_name in os.listdir(self.output_path)
+                       if file_name.endswith(gpu.execution_times_file_name)]
+        self.assertEqual(len(timing_logs), len(kernels))
+        for file_name in timing_logs:
+            self.assertEqual(read_log_device(os.path.join(self.output_path, file_name)), "1")
+
+        # results are merged in the order of the kernels, not in the order the runs finished
+        self.assertEqual([profiling_data.kernel_name for profiling_data in profiling_data_array],
+                         [kernel_name for kernel_name, find_approximate_name in kernels])
+        self.assertEqual([profiling_data.data["dram_read_transactions"] for profiling_data in profiling_data_array],
+                         [10 * 100, 2 * 3, 2 * 5])
+        self.assertEqual([profiling_data.invocations_count for profiling_data in profiling_data_array], [10, 2, 2])
+        self.assertAlmostEqual(profiling_data_array[1].total_execution_time, 1.5e-3)
+
+    def test_single_run_collects_all_kernels_in_one_job(self):
+        profiling_data_array = gpu.profile_application_kernels_on_devices("roofline_app", [], kernels[1:], "dp",
+                                                                          ["0", "1"], single_run=True)
+        self.assertEqual(read_log_device(gpu.get_metrics_file_name("roofline_app", "kernels")), "0")
+        self.assertEqual([profiling_data.kernel_name for profiling_data in profiling_data_array], ["reduce", "scale"])
+        self.assertEqual([profiling_data.data["dram_read_transactions"] for profiling_data in profiling_data_array],
+                         [2 * 3, 2 * 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import unittest
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules of src which visualization.py imports on demand, with "from src.<module> import ..."
+visualization_modules = ["spans", "scaling_sweep", "live_dashboard", "roof_characterization", "results_store"]
+# these need numpy, which is installed only where plotly is
+numpy_modules = ["bottleneck_analysis", "regression_compare"]
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def get_import_error(module):
+    # imported in a fresh interpreter from the repository root, like visualization.py is run, so no import path
+    # added by another test can hide a module which is not importable as a part of the src package
+    environment = dict(os.environ)
+    environment.pop("PYTHONPATH", None)
+    command = subprocess.Popen([sys.executable, "-c", "import visualization\nimport src." + module],
+                               cwd=repository_path, env=environment, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    output = command.communicate()[0]
+    if command.returncode != 0:
+        return output.decode("utf-8", "replace")
+    return None
+
+
+class PackageImportsTest(unittest.TestCase):
+    def test_visualization_modules(self):
+        for module in visualization_modules:
+            self.assertEqual(get_import_error(module), None)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_modules(self):
+        for module in numpy_modules:
+            self.assertEqual(get_import_error(module), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
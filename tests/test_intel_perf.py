@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+tests_path = os.path.dirname(os.path.abspath(__file__))
+fixtures_path = os.path.join(tests_path, "fixtures")
+
+try:
+    import roofline_collect_intel_metrics as intel
+    intel_import_error = None
+except (ImportError, SyntaxError) as e:
+    # parse_cmd_file is installed with the command file tools, not with this repository,
+    # and the collector itself is written for python 2
+    intel = None
+    intel_import_error = str(e)
+
+
+@unittest.skipIf(intel is None, "Intel collector can not be imported: %s" % intel_import_error)
+class PerfCountersTest(unittest.TestCase):
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp(prefix="roofline_test_") + "/"
+        self.paths = (intel.perf_path, intel.exec_data_path)
+        intel.perf_path = os.path.join(fixtures_path, "bin", "perf")
+        intel.exec_data_path = os.path.join(fixtures_path, "bin") + "/"
+
+    def tearDown(self):
+        intel.perf_path, intel.exec_data_path = self.paths
+        shutil.rmtree(self.output_path, ignore_errors=True)
+
+    def check_profiling_data(self, profiling_data):
+        # packed instructions are weighted by their vector width, raw CAS counts are 64 byte transfers
+        # and counts given in MiB are converted to bytes, events which were not counted add nothing
+        self.assertEqual(profiling_data.data["double_instructions"], 1000 + 500 * 4)
+        self.assertEqual(profiling_data.data["float_instructions"], 10 * 4)
+        self.assertEqual(profiling_data.data["bytes_requested"], 200 * 64 + 1.5 * 1024 * 1024)
+        self.assertEqual(profiling_data.total_execution_time, 0.5)
+
+    def test_unsupported_events_are_skipped(self):
+        counters = intel.read_perf_counters(os.path.join(fixtures_path, "perf_stat.csv"))
+        self.assertNotIn("fp_arith_inst_retired.scalar_single", counters)
+        self.assertNotIn("fp_arith_inst_retired.512b_packed_double", counters)
+        self.assertEqual(counters["uncore_imc/cas_count_read/"], 200 * 64)
+
+    def test_perf_run_with_log_file(self):
+        profiling_data = intel.ProfilingDataIntel("app", "skx", self.output_path, "perf")
+        profiling_data.collect_data({"application": "roofline_app"})
+        self.check_profiling_data(profiling_data)
+
+    def test_streamed_perf_run(self):
+        profiling_data = intel.ProfilingDataIntel("app", "skx", self.output_path, "perf", log_mode="stream")
+        profiling_data.collect_data({"application": "roofline_app"})
+        self.check_profiling_data(profiling_data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import re
+import unittest
+
+from src.invocation_sampling import SamplingSettings, get_invocations_regex, get_range_patterns
+
+
+def get_matching_numbers(regex, last_number):
+    pattern = re.compile(regex)
+    return [number for number in range(1, last_number + 1) if pattern.match(str(number))]
+
+
+class InvocationsRegexTest(unittest.TestCase):
+    def test_range_patterns(self):
+        self.assertEqual(get_range_patterns(5, 123), ["[5-9]", "[1-9][0-9]", "1[0-1][0-9]", "12[0-3]"])
+        self.assertEqual(get_range_patterns(1000, 1999), ["1[0-9]{3}"])
+
+    def test_window_matches_exactly_its_invocations(self):
+        for first, last in [(1, 1), (7, 9), (9, 10), (11, 2000), (95, 1005), (1234, 1299)]:
+            regex = get_invocations_regex(list(range(first, last + 1)))
+            self.assertEqual(get_matching_numbers(regex, 2100), list(range(first, last + 1)))
+
+    def test_window_of_many_invocations_is_short(self):
+        self.assertLess(len(get_invocations_regex(SamplingSettings(10).get_invocation_numbers(10 ** 6))), 200)
+
+    def test_stride(self):
+        invocation_numbers = SamplingSettings(3, None, 7).get_invocation_numbers(500)
+        self.assertEqual(get_matching_numbers(get_invocations_regex(invocation_numbers), 600), invocation_numbers)
+
+    def test_too_long_filter_is_rejected(self):
+        invocation_numbers = SamplingSettings(0, None, 3).get_invocation_numbers(10 ** 5)
+        self.assertRaises(ValueError, get_invocations_regex, invocation_numbers)
+
+
+if __name__ == "__main__":
+    unittest.main()
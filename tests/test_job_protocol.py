@@ -0,0 +1,40 @@
+import os
+import unittest
+
+from src import job_protocol
+
+
+class GpuResourceTest(unittest.TestCase):
+    def setUp(self):
+        self.gpu_uuids = job_protocol.gpu_uuids
+        job_protocol.gpu_uuids = {"0": "GPU-aaaa", "1": "GPU-bbbb"}
+
+    def tearDown(self):
+        job_protocol.gpu_uuids = self.gpu_uuids
+
+    def test_devices_are_resolved_to_physical_ids(self):
+        self.assertEqual(job_protocol.get_gpu_resource("0"), job_protocol.get_gpu_resource("GPU-aaaa"))
+        self.assertEqual(job_protocol.get_gpu_resource("1,0"), job_protocol.get_gpu_resource("GPU-aaaa, GPU-bbbb"))
+        # devices unknown to nvidia-smi keep their ids
+        self.assertEqual(job_protocol.get_gpu_resource("7"), "gpu:7")
+
+    def test_unset_devices_lock_every_gpu(self):
+        environment = dict(os.environ)
+        os.environ.pop("CUDA_VISIBLE_DEVICES", None)
+        try:
+            self.assertEqual(job_protocol.get_gpu_resource(), job_protocol.all_gpus_resource)
+        finally:
+            os.environ.clear()
+            os.environ.update(environment)
+
+    def test_overlapping_resources(self):
+        overlap = job_protocol.resources_overlap
+        self.assertTrue(overlap(job_protocol.get_gpu_resource("0,1"), job_protocol.get_gpu_resource("1")))
+        self.assertFalse(overlap(job_protocol.get_gpu_resource("0"), job_protocol.get_gpu_resource("1")))
+        self.assertTrue(overlap(job_protocol.all_gpus_resource, job_protocol.get_gpu_resource("1")))
+        self.assertFalse(overlap(job_protocol.all_gpus_resource, job_protocol.cpu_resource))
+        self.assertTrue(overlap(job_protocol.cpu_resource, job_protocol.cpu_resource))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import re
+import unittest
+
+try:
+    import roofline_collect_gpu_metrics as gpu
+except SyntaxError:  # the collector is written for python 2
+    gpu = None
+
+templated_name = "reduce<double, 256>"
+kernel_names = ["reduce<double, 256>", "reduce<float, 256>", "reduce", "Vector::operator()", "axpy(double*)",
+                "axpy[2]|scale"]
+
+
+def get_nvprof_kernel_pattern(kernels_filter):
+    # '::<kernel>:<invocations>' -> <kernel>, the kernel field must not contain field separators
+    fields = kernels_filter.strip("'").split(":")
+    return fields[2]
+
+
+@unittest.skipIf(gpu is None, "GPU collector can not be compiled")
+class KernelFilterTest(unittest.TestCase):
+    def get_matching_names(self, pattern):
+        return [kernel_name for kernel_name in kernel_names if re.match("^(" + pattern + ")$", kernel_name)]
+
+    def test_templated_name_matches_only_itself(self):
+        pattern = get_nvprof_kernel_pattern(gpu.get_nvprof_kernels_filter([templated_name]))
+        self.assertEqual(self.get_matching_names(pattern), [templated_name])
+
+    def test_names_with_special_characters(self):
+        names = ["Vector::operator()", "axpy(double*)", "axpy[2]|scale"]
+        pattern = get_nvprof_kernel_pattern(gpu.get_nvprof_kernels_filter(names, "[0-9]+"))
+        self.assertEqual(self.get_matching_names(pattern), names)
+        self.assertTrue(gpu.get_nvprof_kernels_filter(names, "[0-9]+").endswith(":[0-9]+'"))
+
+    def test_ncu_filter(self):
+        kernels_filter = gpu.get_ncu_kernels_filter([gpu.ProfilingDataGPU("app", "dp", templated_name, False,
+                                                                          backend="ncu")])
+        pattern = kernels_filter.strip("'")[len("regex:"):]
+        self.assertEqual([kernel_name for kernel_name in kernel_names if re.match(pattern, kernel_name)],
+                         [templated_name])
+
+
+if __name__ == "__main__":
+    unittest.main()
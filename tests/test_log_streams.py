@@ -0,0 +1,85 @@
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from src.log_streams import run_logged_command, open_log
+
+
+def stop_hanging_test(signal_number, frame):
+    raise AssertionError("streamed command did not finish")
+
+
+def read_log_lines(file_name, lines, delay=0.0):
+    time.sleep(delay)
+    log = open_log(file_name)
+    lines.extend(line.strip() for line in log)
+    log.close()
+
+
+class StreamedLogTest(unittest.TestCase):
+    def setUp(self):
+        signal.signal(signal.SIGALRM, stop_hanging_test)
+        signal.alarm(10)
+
+    def tearDown(self):
+        signal.alarm(0)
+
+    def run_streamed(self, command, delay=0.0, parse_log=None):
+        lines = []
+        if parse_log is None:
+            parse_log = lambda file_name: read_log_lines(file_name, lines, delay)
+        returncode = run_logged_command(lambda log_file_name: command.replace("LOG", log_file_name), "test.log",
+                                        parse_log, log_mode="stream")
+        return returncode, lines
+
+    def test_log_is_parsed(self):
+        self.assertEqual(self.run_streamed("printf 'a\\nb\\n' > LOG"), (0, ["a", "b"]))
+
+    def test_profiler_exits_before_the_parser_opens_the_log(self):
+        self.assertEqual(self.run_streamed("printf 'a\\n' > LOG", 0.5), (0, ["a"]))
+
+    def test_profiler_never_opens_the_log(self):
+        self.assertEqual(self.run_streamed("exit 3", 0.5), (3, []))
+
+    def test_rest_of_the_log_is_drained_after_parsing(self):
+        # the parser reads a single chunk without buffering, so everything else has to be drained
+        read_bytes = []
+
+        def parse_first_chunk(file_name):
+            log = open_log(file_name)
+            read_bytes.append(len(os.read(log.fileno(), 4096)))
+            log.close()
+
+        status_path = tempfile.mkdtemp(prefix="roofline_test_")
+        status_file_name = os.path.join(status_path, "status")
+        stdout = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            returncode, lines = self.run_streamed("seq 100000 > LOG; echo $? > " + status_file_name,
+                                                  parse_log=parse_first_chunk)
+        finally:
+            sys.stdout = stdout
+        status_file = open(status_file_name)
+        status = status_file.read().strip()
+        status_file.close()
+        shutil.rmtree(status_path, ignore_errors=True)
+
+        self.assertEqual(returncode, 0)
+        # the writer was neither blocked nor killed by a closed FIFO, and nothing of its output was lost
+        self.assertEqual(status, "0")
+        written_bytes = sum(len(str(number)) + 1 for number in range(1, 100001))
+        self.assertIn("skipped " + str(written_bytes - read_bytes[0]) + " bytes of test.log left after parsing",
+                      output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
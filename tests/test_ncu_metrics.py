@@ -0,0 +1,68 @@
+import os
+import unittest
+
+from src.ncu_metrics import read_ncu_csv, get_nvprof_values, ncu_duration_metric
+from src.nvprof_metrics import get_metric_list
+
+try:
+    import roofline_collect_gpu_metrics as gpu
+except SyntaxError:  # the collector is written for python 2
+    gpu = None
+
+fixtures_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+metrics_file_name = os.path.join(fixtures_path, "ncu_metrics.csv")
+durations_file_name = os.path.join(fixtures_path, "ncu_durations.csv")
+
+
+class ReadNcuCsvTest(unittest.TestCase):
+    def test_invocations_are_read_in_order(self):
+        invocations = list(read_ncu_csv(metrics_file_name))
+        self.assertEqual([kernel_name for kernel_name, ncu_values in invocations],
+                         ["daxpy(double *, double *, int)", "reduce(const double *, double *, int)",
+                          "daxpy(double *, double *, int)"])
+        # thousands separators are removed, n/a values are left out
+        ncu_values = invocations[0][1]
+        self.assertEqual(ncu_values["smsp__sass_thread_inst_executed_op_dfma_pred_on.sum"], 1048576.0)
+        self.assertNotIn("smsp__sass_average_data_bytes_per_wavefront_mem_shared.pct", ncu_values)
+
+    def test_nvprof_values(self):
+        metric_list = get_metric_list("dp")
+        invocations = list(read_ncu_csv(metrics_file_name))
+        values = get_nvprof_values(invocations[1][1], metric_list)
+        # an FMA is two flops, atomics and reductions are both atomic transactions
+        self.assertEqual(float(values["flop_count_dp"]), 261120 + 1024)
+        self.assertEqual(float(values["atomic_transactions"]), 32)
+        self.assertEqual(float(values["gld_transactions"]), 65536)
+        self.assertEqual(float(values["shared_load_transactions"]), 8192)
+        self.assertEqual(float(values["l2_read_transactions"]), 65568)
+        self.assertEqual(float(values["dram_write_transactions"]), 32)
+        self.assertEqual(float(values["gst_efficiency"]), 12.5)
+        self.assertEqual(float(get_nvprof_values(invocations[0][1], metric_list)["flop_count_dp"]), 2 * 1048576)
+        # metrics without values in the log are missing, not zero
+        self.assertNotIn("shared_efficiency", get_nvprof_values(invocations[0][1], metric_list))
+
+    def test_durations_are_converted_to_seconds(self):
+        durations = [ncu_values[ncu_duration_metric] for kernel_name, ncu_values in read_ncu_csv(durations_file_name)]
+        self.assertEqual(len(durations), 3)
+        self.assertAlmostEqual(durations[0], 83552e-9)
+        self.assertAlmostEqual(durations[1], 12320e-9)
+
+
+@unittest.skipIf(gpu is None, "GPU collector can not be compiled")
+class NcuProfilingDataTest(unittest.TestCase):
+    def test_kernel_counters_and_time(self):
+        daxpy = gpu.ProfilingDataGPU("daxpy_app", "dp", "daxpy", False, backend="ncu")
+        reduce = gpu.ProfilingDataGPU("daxpy_app", "dp", "reduce", False, backend="ncu")
+        gpu.parse_ncu_metrics_file_for_kernels(metrics_file_name, [daxpy, reduce])
+        gpu.parse_ncu_execution_time_file_for_kernels(durations_file_name, [daxpy, reduce])
+
+        self.assertEqual(daxpy.data["flop_count_dp"], 2 * 2 * 1048576)
+        self.assertEqual(daxpy.data["dram_read_transactions"], 2 * 262144)
+        self.assertEqual(reduce.data["flop_count_dp"], 261120 + 1024)
+        self.assertEqual(daxpy.invocations_count, 2)
+        self.assertAlmostEqual(daxpy.total_execution_time, (83552 + 82976) * 1e-9)
+        self.assertAlmostEqual(reduce.total_execution_time, 12320e-9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+import unittest
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_results_store_path(profiling_results_path):
+    # paths are read from the environment when src.paths is imported, so it is imported in a fresh interpreter
+    environment = dict(os.environ)
+    environment["ROOFLINE_PROFILING_RESULTS"] = profiling_results_path
+    command = subprocess.Popen([sys.executable, "-c", "from src.paths import *\nprint(results_store_path)"],
+                               cwd=repository_path, env=environment, stdout=subprocess.PIPE)
+    return command.communicate()[0].decode("utf-8").strip()
+
+
+class ResultsStorePathTest(unittest.TestCase):
+    def test_store_is_in_the_profiling_results(self):
+        self.assertEqual(get_results_store_path("/tmp/job_1/profiling_results/"),
+                         "/tmp/job_1/profiling_results/results.db")
+        self.assertEqual(get_results_store_path("/tmp/job_1/profiling_results"),
+                         "/tmp/job_1/profiling_results/results.db")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+try:
+    from src.regression_compare import get_failures
+    import_error = None
+except ImportError as e:  # the bottleneck classification needs numpy
+    get_failures = None
+    import_error = str(e)
+
+
+def get_comparison(points, only_in_baseline=(), only_in_candidate=()):
+    return {"points": [{"kernel": kernel, "level": "L1", "regression": regression} for kernel, regression in points],
+            "threshold": 5.0,
+            "only_in_baseline": [(kernel, "L1") for kernel in only_in_baseline],
+            "only_in_candidate": [(kernel, "L1") for kernel in only_in_candidate]}
+
+
+@unittest.skipIf(get_failures is None, "comparison can not be imported: %s" % import_error)
+class ComparisonFailuresTest(unittest.TestCase):
+    def test_matched_points_pass(self):
+        self.assertEqual(get_failures(get_comparison([("a", False)], only_in_candidate=["b"])), [])
+
+    def test_regression_fails(self):
+        self.assertEqual(len(get_failures(get_comparison([("a", True), ("b", False)]))), 1)
+
+    def test_missing_baseline_point_fails_unless_allowed(self):
+        comparison = get_comparison([("a", False)], only_in_baseline=["b"])
+        self.assertEqual(get_failures(comparison), ["missing in candidate: b (L1)"])
+        self.assertEqual(get_failures(comparison, allow_missing=True), [])
+
+    def test_empty_candidate_fails(self):
+        comparison = get_comparison([], only_in_baseline=["a", "b"])
+        self.assertEqual(get_failures(comparison, allow_missing=True), ["candidate has no points"])
+        self.assertEqual(get_failures(get_comparison([])), ["candidate has no points"])
+
+
+if __name__ == "__main__":
+    unittest.main()
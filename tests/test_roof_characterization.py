@@ -0,0 +1,36 @@
+import unittest
+
+from src.roof_characterization import get_level_bandwidths
+from visualization import RooflinePlotter, P100_characteristics
+
+try:
+    import plotly
+except ImportError:
+    plotly = None
+
+host_description = {"caches": [(1, 32 * 1024, 1), (2, 1024 * 1024, 1), (3, 8 * 1024 * 1024, 4)], "threads": 4}
+# working set size in bytes -> GB/s
+bandwidth_sweep = [[4 * 1024, 900.0], [8 * 1024, 1000.0], [128 * 1024, 400.0], [256 * 1024, 380.0],
+                   [1536 * 1024, 150.0], [64 * 1024 * 1024, 60.0]]
+
+
+def get_platform_characteristics():
+    return {"bandwidths": get_level_bandwidths(host_description, bandwidth_sweep),
+            "peak_performances": {"double": 500.0, "double_no_fma": 250.0}}
+
+
+class LevelBandwidthsTest(unittest.TestCase):
+    def test_levels_are_named_like_memory_roofs(self):
+        bandwidths = get_level_bandwidths(host_description, bandwidth_sweep)
+        self.assertEqual(bandwidths, {"L1": 1000.0, "L2": 400.0, "L3": 150.0, "DRAM": 60.0})
+        self.assertTrue(set(P100_characteristics["bandwidths"]) <= set(bandwidths))
+
+    @unittest.skipIf(plotly is None, "plotly is not installed")
+    def test_no_fma_roof_is_drawn(self):
+        roofline = RooflinePlotter("local", get_platform_characteristics(), "dp")
+        roof_names = [roof["name"] for roof in roofline.generate_CARM_roof_plots()]
+        self.assertIn("no fma", roof_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import unittest
+
+from src.sde_hotspots import read_sde_hotspots
+
+try:
+    import roofline_collect_intel_metrics as intel
+    intel_import_error = None
+except (ImportError, SyntaxError) as e:
+    # parse_cmd_file is installed with the command file tools, not with this repository,
+    # and the collector itself is written for python 2
+    intel = None
+    intel_import_error = str(e)
+
+sde_output_file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sde_hotspots.out")
+
+
+@unittest.skipIf(intel is None, "Intel collector can not be imported: %s" % intel_import_error)
+class SDEHotspotsTest(unittest.TestCase):
+    def test_block_and_its_region_agree(self):
+        # the marked region holds exactly the instructions of the block
+        hotspots = read_sde_hotspots(sde_output_file_name, intel.sde_counter_weights)
+        self.assertEqual(sorted(hotspot.kind for hotspot in hotspots), ["block", "region"])
+        block = [hotspot for hotspot in hotspots if hotspot.kind == "block"][0]
+        region = [hotspot for hotspot in hotspots if hotspot.kind == "region"][0]
+
+        self.assertEqual(block.data, region.data)
+        self.assertEqual(block.get_ops_per_byte(), region.get_ops_per_byte())
+        # vector instructions are weighted by their number of elements
+        self.assertEqual(block.data["double_instructions"], 10 * 4)
+        self.assertEqual(block.data["bytes_requested"], 10 * (32 + 8))
+
+    def test_program_is_weighted_like_its_hotspots(self):
+        profiling_data = intel.ProfilingDataIntel("app", "skx", hotspots_top_k=10)
+        profiling_data.parse_sde_output(sde_output_file_name)
+        for hotspot in profiling_data.hotspots:
+            self.assertEqual(hotspot.data["float_instructions"], profiling_data.data["float_instructions"])
+            self.assertEqual(hotspot.data["bytes_requested"], profiling_data.data["bytes_requested"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from visualization import RooflinePlotter, P100_characteristics, get_report_page_name, plotlyjs_file_name
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+profiling_file_name = os.path.join(repository_path, "tmp", "P100_profiling_data.txt")
+
+try:
+    import plotly
+except ImportError:
+    plotly = None
+
+
+def get_point(**values):
+    point = {"name": "kA (DRAM)", "ops_per_byte": 0.25, "giops": 100.0, "memory_roof": "DRAM"}
+    point.update(values)
+    return point
+
+
+@unittest.skipIf(plotly is None, "plotly is not installed")
+class PointPlotTest(unittest.TestCase):
+    def setUp(self):
+        self.roofline = RooflinePlotter("P100", P100_characteristics, "dp")
+
+    def test_point_without_interval_has_no_error_bars(self):
+        trace = self.roofline.generate_roofline_point_plot(get_point())
+        self.assertEqual(list(trace["y"]), [0, 100.0])
+        self.assertFalse(trace["error_y"])
+
+    def test_point_with_interval_has_asymmetric_error_bars(self):
+        trace = self.roofline.generate_roofline_point_plot(get_point(giops_low=90.0, giops_high=120.0))
+        self.assertEqual(list(trace["error_y"]["array"]), [0, 20.0])
+        self.assertEqual(list(trace["error_y"]["arrayminus"]), [0, 10.0])
+
+
+class ReportPageNameTest(unittest.TestCase):
+    def test_same_file_names_get_numbered_pages(self):
+        page_names = set()
+        self.assertEqual(get_report_page_name("a/results.txt", page_names), "results.html")
+        self.assertEqual(get_report_page_name("b/results.txt", page_names), "results_2.html")
+        self.assertEqual(get_report_page_name("results_2.txt", page_names), "results_2_2.html")
+
+
+@unittest.skipIf(plotly is None, "plotly is not installed")
+class ReportTest(unittest.TestCase):
+    def setUp(self):
+        self.output_path = tempfile.mkdtemp(prefix="roofline_test_")
+        self.report_path = os.path.join(self.output_path, "report")
+        # two runs of the same name in different directories
+        self.file_names = []
+        for run_name in ["old", "new"]:
+            os.makedirs(os.path.join(self.output_path, run_name))
+            self.file_names.append(os.path.join(self.output_path, run_name, "P100_profiling_data.txt"))
+            shutil.copy(profiling_file_name, self.file_names[-1])
+
+    def tearDown(self):
+        shutil.rmtree(self.output_path, ignore_errors=True)
+
+    def run_report(self, *args):
+        command = [sys.executable, os.path.join(repository_path, "visualization.py"), self.file_names[0], "-p", "P100",
+                   "--report", self.report_path, "--report-file", self.file_names[1]] + list(args)
+        report = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = report.communicate()[0]
+        self.assertEqual(report.returncode, 0, output)
+
+    def read_page(self, file_name):
+        page_file = open(os.path.join(self.report_path, file_name))
+        page = page_file.read()
+        page_file.close()
+        return page
+
+    def test_every_file_gets_a_page(self):
+        self.run_report()
+        self.assertEqual(sorted(os.listdir(self.report_path)),
+                         sorted(["P100_profiling_data.html", "P100_profiling_data_2.html", plotlyjs_file_name]))
+        for page_name in ["P100_profiling_data.html", "P100_profiling_data_2.html"]:
+            page = self.read_page(page_name)
+            # the page loads the shared copy of plotly.js instead of embedding it
+            self.assertIn('<script src="%s"></script>' % plotlyjs_file_name, page)
+            self.assertEqual(page.count("Plotly.newPlot"), 1)
+            self.assertIn("__stepkernel_dds", page)
+            self.assertLess(len(page), 1024 * 1024)
+
+    def test_single_page(self):
+        self.run_report("--single-page", "all.html")
+        self.assertEqual(sorted(os.listdir(self.report_path)), sorted(["all.html", plotlyjs_file_name]))
+        self.assertEqual(self.read_page("all.html").count("Plotly.newPlot"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,10 @@
 #!/usr/bin/python
 
 
-import plotly
-import plotly.plotly as py
-import plotly.graph_objs as go
-import bisect
+# plotly and numpy are imported only by the methods which need them, so importing this module
+# (e.g. to reuse RooflinePlotter or the platform tables) stays cheap
+import os
+import sys
 
 tmp_data_prefix = "tmp/"
 
@@ -38,13 +38,31 @@ IBM_POWER_8_characteristics = {"bandwidths": {"dram": 184},        # GB/s
                                "peak_performances": {"integer": 395, # GIOP/s
                                                      "float": 395}}  # GFLOP/s
 
+platforms = {"P100": P100_characteristics,
+             "Intel_Haswell": Intel_Haswell_characteristics,
+             "Intel_Skylake": Intel_Skylake_characteristics,
+             "NEC_SX_Aurora_TSUBASA": NEC_SX_Aurora_TSUBASA_characteristics,
+             "IBM_POWER_8": IBM_POWER_8_characteristics}
+
+local_platform_name = "local"
+
 
 x_data_first = 1.0 / 256.0
 x_data_last = 1024
 
+plotlyjs_file_name = "plotly.min.js"
+
+# above this number of points one WebGL trace per memory level is drawn instead of a trace per kernel
+large_plot_threshold = 2000
+# above this number of points per memory level dense regions are merged into cells of a log-log grid
+density_binning_threshold = 20000
+density_bins = 128
+
 
 class RooflinePlotter:
-    def __init__(self, name, platform_characteristics, precision):
+    def __init__(self, name, platform_characteristics, precision, large_plot=None):
+        # large_plot is None to switch to the WebGL mode by the number of points, True or False to force it
+        self.large_plot = large_plot
         self.platform_characteristics = platform_characteristics
         self.total_execution_time = 0.0
         self.name = name
@@ -62,31 +80,29 @@ class RooflinePlotter:
     def get_no_fma_compute_roof(self, x, roof_bandwidth):
         return min(self.platform_characteristics["peak_performances"][self.precision + "_no_fma"], roof_bandwidth * x)
 
+    def get_roof_values(self, x_array, roof_bandwidth, peak_performance):
+        import numpy
+        # roof values for a whole array of arithmetic intensities at once
+        return numpy.minimum(float(peak_performance), float(roof_bandwidth) * numpy.asarray(x_array, dtype=float))
+
+    def get_compute_roofs(self, x_array, roof_bandwidth):
+        return self.get_roof_values(x_array, roof_bandwidth,
+                                    self.platform_characteristics["peak_performances"][self.precision])
+
     def calculate_intersection_points(self):
-        points_array = []
-        for key in self.platform_characteristics["bandwidths"]:
-            print(self.platform_characteristics["bandwidths"][key])
-            points_array.append(float(self.platform_characteristics["peak_performances"][self.precision]) /
-                                float(self.platform_characteristics["bandwidths"][key]))
-        return points_array
-
-    def create_x_data(self, x_min, x_max, additional_x_points):
-        x_array = []
-        current = x_min
-        prev = 0
-        intersection_points = self.calculate_intersection_points()
-        while current <= x_max:
-            x_array.append(current)
-            prev = current
-            current *= 2
-
-        for point in intersection_points:
-            bisect.insort(x_array, point)
-
-        for point in additional_x_points:
-            bisect.insort(x_array, point)
-
-        return x_array
+        import numpy
+        bandwidths = numpy.array(list(self.platform_characteristics["bandwidths"].values()), dtype=float)
+        return float(self.platform_characteristics["peak_performances"][self.precision]) / bandwidths
+
+    def get_roof_breakpoints(self, roof_bandwidth, peak_performance, x_min=x_data_first, x_max=x_data_last):
+        # on a log-log plot every roof consists of two segments, so only its ends and the ridge point are needed
+        ridge_point = float(peak_performance) / float(roof_bandwidth)
+        x_array = [x_min]
+        if x_min < ridge_point < x_max:
+            x_array.append(ridge_point)
+        x_array.append(x_max)
+        y_array = self.get_roof_values(x_array, roof_bandwidth, peak_performance)
+        return x_array, y_array.tolist()
 
     def performance_in_GIOPs(self, GIOP_count, time):
         return GIOP_count / (time * pow(10, 9))
@@ -94,69 +110,48 @@ class RooflinePlotter:
     def ops_per_byte(self, ops, bytes):
         return ops / bytes
 
-    def generate_CARM_roof_plots(self, additional_x_points):
-        x_data = self.create_x_data(x_data_first, x_data_last, additional_x_points)
+    def generate_CARM_roof_plots(self):
+        import plotly.graph_objs as go
+        peak_performances = self.platform_characteristics["peak_performances"]
+        bandwidths = self.platform_characteristics["bandwidths"]
         data = []
 
-        for key in self.platform_characteristics["bandwidths"]:
-            y_data = []
-            for x in x_data:
-                y_data.append(self.get_compute_roof(x, self.platform_characteristics["bandwidths"][key]))
+        for key in bandwidths:
+            x_data, y_data = self.get_roof_breakpoints(bandwidths[key], peak_performances[self.precision])
             data.append(go.Scatter(x=x_data, y=y_data, name=str(key)))
 
-        y_data = []
-        for x in x_data:
-            y_data.append(self.get_no_fma_compute_roof(x, self.platform_characteristics["bandwidths"]["L1"]))
-        data.append(go.Scatter(x=x_data, y=y_data, name="no fma"))
+        no_fma_key = self.precision + "_no_fma"
+        if no_fma_key in peak_performances and "L1" in bandwidths:
+            x_data, y_data = self.get_roof_breakpoints(bandwidths["L1"], peak_performances[no_fma_key])
+            data.append(go.Scatter(x=x_data, y=y_data, name="no fma"))
 
         return data
 
-    def get_point_description_text(self, profiling_data):
-        point_description_text = profiling_data["name"] + "</br>"
-        x = float(profiling_data["ops_per_byte"])
-
-        # memory bound case
-        top_roof_val = 0
-        top_roof_name = ""
-        min_distance = self.platform_characteristics["peak_performances"][self.precision]
-        closest_roof_val = 0
-        closest_roof_name = ""
-        point_val = profiling_data["giops"]
-        #for key in self.platform_characteristics["bandwidths"]:
-        key = profiling_data["memory_roof"]
-        roof_val = self.get_compute_roof(self.platform_characteristics["bandwidths"][key], x)
-        if roof_val >= top_roof_val:
-            top_roof_val = roof_val
-            top_roof_name = key
-        if (roof_val >= point_val) and (min_distance >= abs(roof_val - point_val)):
-            min_distance = abs(roof_val - point_val)
-            closest_roof_val = roof_val
-            closest_roof_name = key
-
-        # compute bound case
-        if closest_roof_val == self.platform_characteristics["peak_performances"][self.precision]:
-            closest_roof_name = "Peak integer performance"
-
-        if top_roof_val == self.platform_characteristics["peak_performances"][self.precision]:
-            top_roof_name = "Peak integer performance"
-
-        if closest_roof_val > 0:
-            distance_from_closest_roof = 100.0 * float(point_val) / float(closest_roof_val)
-        else:
-            distance_from_closest_roof = 100
-        if top_roof_val > 0:
-            distance_from_top_roof = 100.0 * float(point_val) / float(top_roof_val)
-        else:
-            distance_from_top_roof = 100
+    def get_units(self):
+        if self.precision == "integer":
+            return "GIOPS/s"
+        return "GFLOP/s"
+
+    def classify_points(self, profiling_data_array):
+        from src.bottleneck_analysis import classify_profiling_data
+        return classify_profiling_data(self.platform_characteristics, self.precision, profiling_data_array)
+
+    def get_points_description_texts(self, profiling_data_array):
+        from src.bottleneck_analysis import get_description_texts
+        from src.spans import span
+        # all points are classified at once, the hover texts are built from the classification
+        with span("classify points", points=len(profiling_data_array)):
+            classification = self.classify_points(profiling_data_array)
+        names = [profiling_data["name"] for profiling_data in profiling_data_array]
+        return get_description_texts(names, classification, self.get_units())
 
-        if top_roof_val != closest_roof_val:  # print closest roof only if it is different from top toof
-            point_description_text += closest_roof_name + " - closest roof: " + str(distance_from_closest_roof) + \
-                                      "% </br>"
-        point_description_text += top_roof_name + " -  top roof: " + str(distance_from_top_roof) + "% </br>"
-        return point_description_text
+    def get_point_description_text(self, profiling_data):
+        return self.get_points_description_texts([profiling_data])[0]
 
-    def generate_roofline_point_plot(self, profiling_data):
-        point_description_text = self.get_point_description_text(profiling_data)
+    def generate_roofline_point_plot(self, profiling_data, point_description_text=None):
+        import plotly.graph_objs as go
+        if point_description_text is None:
+            point_description_text = self.get_point_description_text(profiling_data)
         point_trace = go.Scatter(
             x=[profiling_data["ops_per_byte"], profiling_data["ops_per_byte"]],
             y=[0, profiling_data["giops"]],
@@ -165,40 +160,299 @@ class RooflinePlotter:
             text=['', point_description_text, ''],
             textposition='top center'
         )
+        if "giops_low" in profiling_data:
+            point_trace["error_y"] = dict(type='data', symmetric=False,
+                                          array=[0, profiling_data["giops_high"] - profiling_data["giops"]],
+                                          arrayminus=[0, profiling_data["giops"] - profiling_data["giops_low"]])
         return point_trace
 
+    def generate_invocations_band_plots(self, profiling_data):
+        # percentiles are 5, 25, 50, 75 and 95, the outer box covers 5-95 and the inner one 25-75 of the invocations
+        import plotly.graph_objs as go
+        x_percentiles = profiling_data["ops_per_byte_percentiles"]
+        y_percentiles = profiling_data["giops_percentiles"]
+        band_traces = []
+        for low_pos, high_pos, opacity in [(0, 4, 0.15), (1, 3, 0.3)]:
+            x_low, x_high = x_percentiles[low_pos], x_percentiles[high_pos]
+            y_low, y_high = y_percentiles[low_pos], y_percentiles[high_pos]
+            band_traces.append(go.Scatter(
+                x=[x_low, x_high, x_high, x_low, x_low],
+                y=[y_low, y_low, y_high, y_high, y_low],
+                name=profiling_data["name"] + " invocations",
+                mode='lines',
+                fill='toself',
+                opacity=opacity,
+                hoverinfo='name',
+                showlegend=False
+            ))
+        return band_traces
+
+    def get_density_cells(self, x_data, y_data, bins=density_bins):
+        import numpy
+        # points are merged into the cells of a log-log grid, a cell is drawn at the mean position of its points
+        # and represented by its fastest point
+        log_x = numpy.log10(x_data)
+        log_y = numpy.log10(y_data)
+        x_cells = ((log_x - log_x.min()) / max(log_x.max() - log_x.min(), 1e-12) * (bins - 1)).astype(int)
+        y_cells = ((log_y - log_y.min()) / max(log_y.max() - log_y.min(), 1e-12) * (bins - 1)).astype(int)
+        cells = x_cells * bins + y_cells
+
+        order = numpy.lexsort((-y_data, cells))
+        sorted_cells = cells[order]
+        starts = numpy.flatnonzero(numpy.concatenate(([True], sorted_cells[1:] != sorted_cells[:-1])))
+        counts = numpy.diff(numpy.concatenate((starts, [len(sorted_cells)])))
+        cell_x = numpy.power(10.0, numpy.add.reduceat(log_x[order], starts) / counts)
+        cell_y = numpy.power(10.0, numpy.add.reduceat(log_y[order], starts) / counts)
+        return cell_x, cell_y, counts, order[starts]
+
+    def generate_large_plot_point_plots(self, profiling_data_array):
+        import numpy
+        import plotly.graph_objs as go
+        categories = {}
+        for pos in range(len(profiling_data_array)):
+            categories.setdefault(profiling_data_array[pos]["memory_roof"], []).append(pos)
+
+        point_traces = []
+        for category in sorted(categories):
+            positions = categories[category]
+            x_data = numpy.array([profiling_data_array[pos]["ops_per_byte"] for pos in positions], dtype=float)
+            y_data = numpy.array([profiling_data_array[pos]["giops"] for pos in positions], dtype=float)
+            marker = dict(size=6)
+            if len(positions) > density_binning_threshold:
+                # points with zero values are not visible on the log axes anyway
+                visible = (x_data > 0) & (y_data > 0)
+                positions = numpy.asarray(positions)[visible]
+                x_data, y_data, counts, representatives = self.get_density_cells(x_data[visible], y_data[visible])
+                # a cell shows only its kernel count and fastest kernel, the other kernels of a cell can not be
+                # hovered at all
+                text = [str(count) + " kernels</br>fastest: " + profiling_data_array[pos]["name"]
+                        for count, pos in zip(counts, positions[representatives])]
+                marker = dict(size=(4 + 2 * numpy.log2(counts)).tolist(), color=numpy.log10(counts).tolist(),
+                              colorscale='Viridis')
+            else:
+                # only the kernel name, the classification text of the regular mode is not built
+                text = [profiling_data_array[pos]["name"] for pos in positions]
+            point_traces.append(go.Scattergl(
+                x=x_data.tolist(),
+                y=y_data.tolist(),
+                name=str(category).strip() + " (" + str(len(categories[category])) + " kernels)",
+                mode='markers',
+                text=text,
+                hoverinfo='x+y+text',
+                marker=marker
+            ))
+        return point_traces
+
+    def is_large_plot(self, profiling_data_array):
+        if self.large_plot is None:
+            return len(profiling_data_array) > large_plot_threshold
+        return self.large_plot
+
     def get_profiling_points_x_data(self, profiling_data_array):
         additional_x_points = []
         for profiling_data in profiling_data_array:
             additional_x_points.append(profiling_data["ops_per_byte"])
         return additional_x_points
 
-    def draw_plot(self, profiling_data_array):
-        profiling_points_x_data = [] #self.get_profiling_points_x_data(profiling_data_array)
-        plots_data = self.generate_CARM_roof_plots(profiling_points_x_data)
-
-        for profiling_data in profiling_data_array:
-            plots_data.append(self.generate_roofline_point_plot(profiling_data))
-
-        if self.precision == "double":
-            y_title = "GFLOP/s"
-        if self.precision == "float":
-            y_title = "GFLOP/s"
-        if self.precision == "integer":
-            y_title = "GIOPS/s"
+    def get_figure(self, profiling_data_array):
+        import plotly.graph_objs as go
+        plots_data = self.generate_CARM_roof_plots()
+
+        if self.is_large_plot(profiling_data_array):
+            # the per kernel classification texts, error bars and invocation bands are left out,
+            # visualization.py --classify gives the classification of every point
+            print("large plot mode: hover texts show kernel names (density cells: kernel count and fastest kernel) "
+                  "without the bottleneck classification, error bars and invocation bands are not drawn, "
+                  "use --large-plot off or --classify for them")
+            plots_data.extend(self.generate_large_plot_point_plots(profiling_data_array))
+            profiling_data_array = []
+
+        description_texts = []
+        if profiling_data_array:
+            description_texts = self.get_points_description_texts(profiling_data_array)
+        for profiling_data, description_text in zip(profiling_data_array, description_texts):
+            plots_data.append(self.generate_roofline_point_plot(profiling_data, description_text))
+            if "giops_percentiles" in profiling_data:
+                plots_data.extend(self.generate_invocations_band_plots(profiling_data))
+
+        y_title = self.get_units()
         xaxis = dict(autorange=True, showgrid=True, zeroline=True, showline=True, autotick=True, ticks='',
                      showticklabels=True, type='log', title='Arithmetic Intensity')
 
         yaxis = dict(autorange=True, showgrid=True, zeroline=True, showline=True, autotick=True, ticks='',
                      showticklabels=True, type='log', title=y_title)
 
-        plotly.offline.plot({
-            "data": plots_data,
-            "layout": go.Layout(title=self.name, xaxis=xaxis, yaxis=yaxis)
-        })
-
+        return {"data": plots_data,
+                "layout": go.Layout(title=self.name, xaxis=xaxis, yaxis=yaxis)}
+
+    def generate_comparison_plots(self, comparison):
+        import math
+        import plotly.graph_objs as go
+        # baseline points are drawn hollow, arrows lead from them to the candidate points,
+        # regressions are red and improvements of percent of roof green
+        points = [point for point in comparison["points"] if min(point["old_ai"], point["new_ai"],
+                                                                 point["old_gops"], point["new_gops"]) > 0]
+        names = [point["kernel"] + " (" + point["level"] + ")" for point in points]
+        colors = []
+        for point in points:
+            if point["regression"]:
+                colors.append("red")
+            elif point["percent_of_roof_change"] > 0:
+                colors.append("green")
+            else:
+                colors.append("gray")
+        texts = []
+        for name, point in zip(names, points):
+            texts.append(name + "</br>GOPS " + "%+.1f" % point["gops_change"] + "%, AI " +
+                         "%+.1f" % point["ai_change"] + "%</br>" + "%.1f" % point["old_percent_of_roof"] + "% -> " +
+                         "%.1f" % point["new_percent_of_roof"] + "% of the " + point["memory_roof"] + " roof")
+        point_traces = [go.Scatter(x=[point["old_ai"] for point in points],
+                                   y=[point["old_gops"] for point in points],
+                                   name="baseline",
+                                   mode='markers',
+                                   text=names,
+                                   marker=dict(symbol='circle-open', size=9, color='gray')),
+                        go.Scatter(x=[point["new_ai"] for point in points],
+                                   y=[point["new_gops"] for point in points],
+                                   name="candidate",
+                                   mode='markers',
+                                   text=texts,
+                                   marker=dict(size=9, color=colors))]
+        # annotation positions on log axes are given as logarithms
+        arrows = []
+        for point, color in zip(points, colors):
+            arrows.append(dict(x=math.log10(point["new_ai"]), y=math.log10(point["new_gops"]),
+                               ax=math.log10(point["old_ai"]), ay=math.log10(point["old_gops"]),
+                               xref='x', yref='y', axref='x', ayref='y', text='', showarrow=True,
+                               arrowhead=2, arrowwidth=1.5, arrowcolor=color))
+        return point_traces, arrows
+
+    def get_comparison_figure(self, comparison):
+        figure = self.get_figure([])
+        point_traces, arrows = self.generate_comparison_plots(comparison)
+        figure["data"].extend(point_traces)
+        figure["layout"]["annotations"] = arrows
+        return figure
+
+    def draw_comparison_plot(self, comparison, file_name="temp-plot.html", auto_open=True):
+        import plotly.offline
+        plotly.offline.plot(self.get_comparison_figure(comparison), filename=file_name, auto_open=auto_open)
+
+    def generate_scaled_roof_plots(self, thread_counts, cores):
+        import plotly.graph_objs as go
+        from src.scaling_sweep import scale_platform_characteristics
+        # roofs of every swept number of active cores, hidden until selected in the legend
+        data = []
+        for threads in thread_counts:
+            scaled_characteristics = scale_platform_characteristics(self.platform_characteristics, threads, cores)
+            bandwidths = scaled_characteristics["bandwidths"]
+            for key in sorted(bandwidths):
+                x_data, y_data = self.get_roof_breakpoints(bandwidths[key],
+                                                           scaled_characteristics["peak_performances"][self.precision])
+                data.append(go.Scatter(x=x_data, y=y_data, name=str(key) + " (" + str(threads) + " cores)",
+                                       legendgroup=str(threads) + " cores", line=dict(dash='dot'),
+                                       visible='legendonly'))
+        return data
 
-def generate_roofline_from_profiling_data(file_name, roofline_name, platform_characteristics):
+    def generate_scaling_path_plots(self, paths, cores):
+        import plotly.graph_objs as go
+        from src.scaling_sweep import scale_platform_characteristics, get_percent_of_roof, get_slowest_level
+        # every kernel is a line through its sweep points, labeled by the number of threads
+        level = get_slowest_level(self.platform_characteristics)
+        path_traces = []
+        for name in sorted(paths):
+            hover_texts = []
+            for threads, profiling_data in paths[name]:
+                scaled_characteristics = scale_platform_characteristics(self.platform_characteristics, threads, cores)
+                percent_of_roof = get_percent_of_roof(scaled_characteristics, self.precision, level,
+                                                      profiling_data["ops_per_byte"], profiling_data["giops"])
+                hover_texts.append(name + "</br>" + str(threads) + " threads, " + "%.1f" % percent_of_roof +
+                                   "% of the " + str(level) + " roof")
+            path_traces.append(go.Scatter(
+                x=[profiling_data["ops_per_byte"] for threads, profiling_data in paths[name]],
+                y=[profiling_data["giops"] for threads, profiling_data in paths[name]],
+                name=name,
+                mode='lines+markers+text',
+                text=[str(threads) for threads, profiling_data in paths[name]],
+                textposition='top center',
+                hovertext=hover_texts,
+                hoverinfo='x+y+text'
+            ))
+        return path_traces
+
+    def get_scaling_figure(self, paths, cores):
+        figure = self.get_figure([])
+        thread_counts = sorted(set(threads for name in paths for threads, profiling_data in paths[name]))
+        figure["data"].extend(self.generate_scaled_roof_plots(thread_counts, cores))
+        figure["data"].extend(self.generate_scaling_path_plots(paths, cores))
+        return figure
+
+    def draw_scaling_plot(self, paths, cores, file_name="temp-plot.html", auto_open=True):
+        import plotly.offline
+        plotly.offline.plot(self.get_scaling_figure(paths, cores), filename=file_name, auto_open=auto_open)
+
+    def draw_plot(self, profiling_data_array, file_name="temp-plot.html", auto_open=True):
+        import plotly.offline
+        from src.spans import span
+        with span("build figure", points=len(profiling_data_array)):
+            figure = self.get_figure(profiling_data_array)
+        with span("render html", file=file_name):
+            plotly.offline.plot(figure, filename=file_name, auto_open=auto_open)
+
+    def get_plot_div(self, profiling_data_array):
+        import plotly.offline
+        # plotly.js is not included, it is loaded once by the page which contains the plot
+        return plotly.offline.plot(self.get_figure(profiling_data_array), output_type='div',
+                                   include_plotlyjs=False, show_link=False, auto_open=False)
+
+    def get_point_traces(self, profiling_data_array):
+        import json
+        import plotly.utils
+        # traces of every point as JSON data, the live dashboard adds them to a page drawn with get_plot_div([])
+        point_traces = []
+        description_texts = self.get_points_description_texts(profiling_data_array)
+        for profiling_data, description_text in zip(profiling_data_array, description_texts):
+            traces = [self.generate_roofline_point_plot(profiling_data, description_text)]
+            if "giops_percentiles" in profiling_data:
+                traces.extend(self.generate_invocations_band_plots(profiling_data))
+            point_traces.append(json.loads(json.dumps(traces, cls=plotly.utils.PlotlyJSONEncoder)))
+        return point_traces
+
+
+class RooflineReport:
+    def __init__(self, report_path):
+        self.report_path = report_path
+        self.plot_divs = []
+        if not os.path.exists(report_path):
+            os.makedirs(report_path)
+        self.write_plotlyjs()
+
+    def write_plotlyjs(self):
+        import plotly.offline
+        # a single local copy of plotly.js is shared by all pages of the report, so it also works offline
+        plotlyjs_path = os.path.join(self.report_path, plotlyjs_file_name)
+        if os.path.isfile(plotlyjs_path):
+            return
+        plotlyjs_file = open(plotlyjs_path, 'w')
+        plotlyjs_file.write(plotly.offline.offline.get_plotlyjs())
+        plotlyjs_file.close()
+
+    def add_plot(self, roofline, profiling_data_array):
+        self.plot_divs.append(roofline.get_plot_div(profiling_data_array))
+
+    def save_page(self, file_name, title):
+        page_file = open(os.path.join(self.report_path, file_name), 'w')
+        page_file.write("<html>\n<head>\n<meta charset=\"utf-8\" />\n<title>%s</title>\n" % title)
+        page_file.write("<script src=\"%s\"></script>\n</head>\n<body>\n" % plotlyjs_file_name)
+        for plot_div in self.plot_divs:
+            page_file.write(plot_div)
+            page_file.write("\n")
+        page_file.write("</body>\n</html>\n")
+        page_file.close()
+        self.plot_divs = []
+
+
+def read_profiling_data(file_name):
     # read CMD file
     profiling_file = open(file_name, 'r')
     profiling_data = []
@@ -217,15 +471,210 @@ def generate_roofline_from_profiling_data(file_name, roofline_name, platform_cha
         ops_number = float(line_split[1])
         ops_per_byte = float(line_split[2])
         memory_roof = line_split[3]
-        profiling_data.append({"name": name,
-                               "ops_per_byte": ops_per_byte,
-                               "giops": ops_number,
-                               "memory_roof": memory_roof})
+        point = {"name": name,
+                 "ops_per_byte": ops_per_byte,
+                 "giops": ops_number,
+                 "memory_roof": memory_roof}
+        if len(line_split) >= 7 and line_split[5] != "":  # confidence interval of performance from repeated timing runs
+            point["giops_low"] = float(line_split[5])
+            point["giops_high"] = float(line_split[6])
+        if len(line_split) >= 9:  # percentiles of single kernel invocations from trace mode
+            point["ops_per_byte_percentiles"] = [float(value) for value in line_split[7].split(",")]
+            point["giops_percentiles"] = [float(value) for value in line_split[8].split(",")]
+        profiling_data.append(point)
     profiling_file.close()
+    return precision, profiling_data
+
+
+def generate_roofline_from_profiling_data(file_name, roofline_name, platform_characteristics,
+                                          output_file_name="temp-plot.html", auto_open=True, large_plot=None):
+    from src.spans import span, get_file_size
+    with span("read profiling data", file=file_name) as read_span:
+        read_span.add_bytes(get_file_size(file_name))
+        precision, profiling_data = read_profiling_data(file_name)
 
     # initialize and draw roofline
+    roofline = RooflinePlotter(roofline_name, platform_characteristics, precision, large_plot)
+    roofline.draw_plot(profiling_data, output_file_name, auto_open)
+
+
+def read_profiling_data_from_store(db_path, app=None, platform=None, run_id=None, kernel=None, level=None):
+    from src.results_store import ResultsStore
+    store = ResultsStore(db_path)
+    if run_id is None:
+        run = store.get_latest_run(app, platform)
+    else:
+        run = None
+        for stored_run in store.get_runs(app, platform):
+            if stored_run["id"] == run_id:
+                run = stored_run
+    if run is None:
+        store.close()
+        raise ValueError("ERROR: no matching run found in " + db_path)
+    profiling_data = store.get_points(run["id"], kernel, level)
+    store.close()
+    return run["mode"], profiling_data
+
+
+def read_profiling_data_for_comparison(file_name, app=None, platform=None, run_id=None):
+    # points keep their kernel names and memory levels, so points of two result sets can be matched
+    if file_name.endswith(".db"):
+        return read_profiling_data_from_store(file_name, app, platform, run_id)
+    from src.results_store import read_results_text_file
+    file_app, precision, kernels = read_results_text_file(file_name)
+    profiling_data = []
+    for kernel, points in kernels:
+        for point in points:
+            profiling_data.append({"name": point["label"],
+                                   "kernel": kernel,
+                                   "level": point["level"],
+                                   "ops_per_byte": point["ai"],
+                                   "giops": point["gops"],
+                                   "memory_roof": point["memory_roof"]})
+    return precision, profiling_data
+
+
+def get_previous_run_id(db_path, app=None, platform=None, run_id=None):
+    # the run of the same application preceding the given one (the latest one by default)
+    from src.results_store import ResultsStore
+    store = ResultsStore(db_path)
+    runs = store.get_runs(app, platform)
+    if run_id is not None:
+        runs = [run for run in runs if run["id"] == run_id]
+    if len(runs) > 0:
+        runs = store.get_runs(runs[-1]["app"], platform)
+    store.close()
+    run_ids = [run["id"] for run in runs]
+    if run_id is None and len(run_ids) > 0:
+        run_id = run_ids[-1]
+    if run_id not in run_ids or run_ids.index(run_id) == 0:
+        raise ValueError("ERROR: no run to compare with found in " + db_path)
+    return run_ids[run_ids.index(run_id) - 1]
+
+
+def compare_profiling_data(baseline_file_name, candidate_file_name, roofline_name, platform_characteristics,
+                           threshold, output_file_name="temp-plot.html", auto_open=True, draw=True,
+                           comparison_file_name=None, app=None, platform=None, baseline_run_id=None,
+                           candidate_run_id=None, allow_missing=False):
+    # returns the list of failures of the comparison, a baseline in the same store as the candidate is its
+    # preceding run by default
+    from src.regression_compare import compare_points, print_comparison, save_comparison, get_failures
+    if baseline_file_name == candidate_file_name and baseline_run_id is None and candidate_file_name.endswith(".db"):
+        baseline_run_id = get_previous_run_id(candidate_file_name, app, platform, candidate_run_id)
+    baseline_precision, baseline_data = read_profiling_data_for_comparison(baseline_file_name, app, platform,
+                                                                           baseline_run_id)
+    precision, candidate_data = read_profiling_data_for_comparison(candidate_file_name, app, platform,
+                                                                   candidate_run_id)
+
     roofline = RooflinePlotter(roofline_name, platform_characteristics, precision)
-    roofline.draw_plot(profiling_data)
+    if RooflinePlotter(roofline_name, platform_characteristics, baseline_precision).precision != roofline.precision:
+        raise ValueError("ERROR: baseline and candidate were collected in different modes")
+    comparison = compare_points(platform_characteristics, roofline.precision, baseline_data, candidate_data,
+                                threshold)
+    print_comparison(comparison)
+    if comparison_file_name is not None:
+        save_comparison(comparison_file_name, comparison)
+    if draw:
+        roofline.draw_comparison_plot(comparison, output_file_name, auto_open)
+    failures = get_failures(comparison, allow_missing)
+    for failure in failures:
+        print("FAILED " + failure)
+    return failures
+
+
+def generate_scaling_roofline(file_name, roofline_name, platform_characteristics, cores=None,
+                              output_file_name="temp-plot.html", auto_open=True, app=None, platform=None, run_id=None):
+    # draws the path of every kernel of a scaling sweep and prints the number of threads at which it
+    # reaches the roof of the slowest memory level
+    from src.scaling_sweep import get_platform_cores, get_scaling_paths, get_saturation_threads, get_slowest_level, \
+        saturation_percent
+    precision, profiling_data = read_profiling_data_for_comparison(file_name, app, platform, run_id)
+    cores = get_platform_cores(platform_characteristics, cores)
+    paths = get_scaling_paths(profiling_data)
+    if len(paths) == 0:
+        raise ValueError("ERROR: no scaling sweep points found in " + file_name)
+
+    roofline = RooflinePlotter(roofline_name, platform_characteristics, precision)
+    level = get_slowest_level(platform_characteristics)
+    for name in sorted(paths):
+        saturation_threads = get_saturation_threads(paths[name], platform_characteristics, roofline.precision, cores,
+                                                    level)
+        if saturation_threads is None:
+            print(name + ": does not reach " + str(saturation_percent) + "% of the " + str(level) + " roof")
+        else:
+            print(name + ": reaches " + str(saturation_percent) + "% of the " + str(level) + " roof at " +
+                  str(saturation_threads) + " threads")
+    roofline.draw_scaling_plot(paths, cores, output_file_name, auto_open)
+
+
+def generate_roofline_from_store(db_path, roofline_name, platform_characteristics, app=None, platform=None,
+                                 run_id=None, kernel=None, level=None, output_file_name="temp-plot.html",
+                                 auto_open=True, large_plot=None):
+    precision, profiling_data = read_profiling_data_from_store(db_path, app, platform, run_id, kernel, level)
+
+    roofline = RooflinePlotter(roofline_name, platform_characteristics, precision, large_plot)
+    roofline.draw_plot(profiling_data, output_file_name, auto_open)
+
+
+def classify_profiling_data(precision, profiling_data, platform_characteristics, output_file_name):
+    # bottleneck classification of every point as CSV, plotly is not needed for it
+    from src.bottleneck_analysis import save_classification
+    roofline = RooflinePlotter("", platform_characteristics, precision)
+    save_classification(output_file_name, profiling_data, roofline.classify_points(profiling_data))
+
+
+def get_report_page_name(file_name, page_names):
+    # files with the same name in different directories get numbered pages instead of overwriting each other
+    page_name = os.path.splitext(os.path.basename(file_name))[0]
+    unique_name = page_name
+    page_pos = 2
+    while unique_name in page_names:
+        unique_name = page_name + "_" + str(page_pos)
+        page_pos += 1
+    page_names.add(unique_name)
+    return unique_name + ".html"
+
+
+def generate_rooflines_report(report_path, rooflines, single_page_name=None):
+    # rooflines is a list of (profiling data file name, roofline name, platform characteristics),
+    # every roofline gets its own page unless single_page_name is set
+    report = RooflineReport(report_path)
+    page_names = set()
+    for file_name, roofline_name, platform_characteristics in rooflines:
+        precision, profiling_data = read_profiling_data(file_name)
+        roofline = RooflinePlotter(roofline_name, platform_characteristics, precision)
+        report.add_plot(roofline, profiling_data)
+        if single_page_name is None:
+            report.save_page(get_report_page_name(file_name, page_names), roofline_name)
+
+    if single_page_name is not None:
+        report.save_page(single_page_name, "Roofline report")
+
+
+def serve_live_dashboard(roofline_name, platform_characteristics, precision="dp", file_name=None, app=None,
+                         platform=None, run_id=None, host="localhost", port=8050):
+    import plotly.offline
+    from src.live_dashboard import LiveDashboard, serve_dashboard, get_plotter_point
+    from src.results_store import read_results_text_file
+    # the page holds only the roofs, points of file_name (a results file or store) are shown from the start
+    # and collectors started with --dashboard add theirs while they run
+    kernels = []
+    if file_name is not None and file_name.endswith(".db"):
+        precision, profiling_data = read_profiling_data_from_store(file_name, app, platform, run_id)
+        kernels = [(app or "", profiling_data)]
+    elif file_name is not None:
+        file_app, precision, file_kernels = read_results_text_file(file_name)
+        profiling_data = []
+        for kernel, points in file_kernels:
+            profiling_data.extend(get_plotter_point(kernel, point) for point in points)
+        kernels = [(file_app or app or "", profiling_data)]
+
+    roofline = RooflinePlotter(roofline_name, platform_characteristics, str(precision).lower(), False)
+    dashboard = LiveDashboard(roofline_name, roofline.get_plot_div([]), plotly.offline.offline.get_plotlyjs(),
+                              roofline.get_point_traces)
+    for kernels_app, profiling_data in kernels:
+        dashboard.add_points(kernels_app, profiling_data)
+    serve_dashboard(dashboard, host, port)
 
 
 def p100():
@@ -234,5 +683,222 @@ def p100():
                                           P100_characteristics)
 
 
-p100()
+def load_platform_characteristics(platform):
+    # platform is either a name from the platforms table, a JSON file with the same structure or "local"
+    # for the roofs measured on this host (cached per host)
+    if platform in platforms:
+        return platforms[platform]
+    if platform == local_platform_name:
+        from src.roof_characterization import characterize_platform
+        return characterize_platform()
+    if not os.path.isfile(platform):
+        raise ValueError("ERROR: unknown platform " + platform + ", expected one of: " +
+                         ", ".join(sorted(platforms) + [local_platform_name]))
+    import json
+    platform_file = open(platform, 'r')
+    platform_characteristics = json.load(platform_file)
+    platform_file.close()
+    return platform_characteristics
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Draws a roofline model from collected profiling data.')
+
+    parser.add_argument('profiling_file', nargs='?',
+                        help="Profiling data file, produced by one of the collectors, or a results store (*.db), "
+                             "optional for --serve.")
+
+    parser.add_argument('-p', '--platform',
+                        action="store", dest="platform",
+                        help="Platform name (" + ", ".join(sorted(platforms)) + "), " + local_platform_name +
+                             " to measure roofs of this host or a JSON file with platform characteristics.",
+                        required=True)
+
+    parser.add_argument('-n', '--name',
+                        action="store", dest="name",
+                        help="Roofline title.",
+                        default="Cache-Aware Roofline Model")
+
+    parser.add_argument('-o', '--output',
+                        action="store", dest="output",
+                        help="Output HTML file.",
+                        default="temp-plot.html")
+
+    parser.add_argument('--no-browser',
+                        action="store_true", dest="no_browser",
+                        help="Do not open the generated plot in a browser.")
+
+    parser.add_argument('--app',
+                        action="store", dest="app",
+                        help="Results store only: application to draw.")
+
+    parser.add_argument('--run',
+                        action="store", dest="run", type=int,
+                        help="Results store only: run id to draw, the latest matching run by default.")
+
+    parser.add_argument('--kernel',
+                        action="store", dest="kernel",
+                        help="Results store only: draw points of a single kernel.")
+
+    parser.add_argument('--level',
+                        action="store", dest="level",
+                        help="Results store only: draw points of a single memory level.")
+
+    parser.add_argument('--store-platform',
+                        action="store", dest="store_platform",
+                        help="Results store only: platform name the run was collected on.")
+
+    parser.add_argument('--large-plot',
+                        action="store", dest="large_plot", choices=["auto", "on", "off"],
+                        help="WebGL rendering with density binning, used for more than " +
+                             str(large_plot_threshold) + " points by default. Hover texts then show only kernel "
+                             "names (or the count and the fastest kernel of a density cell), without the "
+                             "bottleneck classification, error bars and invocation bands.",
+                        default="auto")
+
+    parser.add_argument('--trace-out',
+                        action="store", dest="trace_out",
+                        help="Save the time spent in every stage as Chrome trace-event JSON and print a summary table.")
+
+    parser.add_argument('--classify',
+                        action="store", dest="classify",
+                        help="Write the bottleneck classification of all points to this CSV file instead of drawing.")
+
+    parser.add_argument('--compare',
+                        action="store", dest="compare",
+                        help="Baseline results file or store (*.db) to compare the profiling file with: points are "
+                             "matched by kernel and memory level and arrows lead from baseline to new points.")
+
+    parser.add_argument('--baseline-run',
+                        action="store", dest="baseline_run", type=int,
+                        help="Results store only: baseline run id, the run preceding the compared one by default "
+                             "when both are in the same store.")
+
+    parser.add_argument('--regression-threshold',
+                        action="store", dest="regression_threshold", type=float,
+                        help="Exit with status 1 when a point drops more than this number of percentage points below "
+                             "its baseline percent of roof.",
+                        default=5.0)
+
+    parser.add_argument('--comparison-csv',
+                        action="store", dest="comparison_csv",
+                        help="Write the comparison of all matched points to this CSV file.")
+
+    parser.add_argument('--allow-missing',
+                        action="store_true", dest="allow_missing",
+                        help="Do not exit with status 1 when points of the baseline are missing in the compared "
+                             "profiling file, an empty profiling file still fails.")
+
+    parser.add_argument('--scaling',
+                        action="store_true", dest="scaling",
+                        help="Draw the path of every kernel of a thread scaling sweep, roofs are scaled to the number "
+                             "of active cores.")
+
+    parser.add_argument('--cores',
+                        action="store", dest="cores", type=int,
+                        help="Scaling sweeps only: number of cores the platform roofs were measured with, taken from "
+                             "the platform description by default.")
+
+    parser.add_argument('--serve',
+                        action="store", dest="serve", type=int,
+                        help="Serve a live roofline page on this port, collectors started with --dashboard "
+                             "http://host:port add points to it as kernels finish, the page takes app, kernel and "
+                             "level query parameters.")
+
+    parser.add_argument('--host',
+                        action="store", dest="host",
+                        help="Live dashboard only: address to listen on.",
+                        default="localhost")
+
+    parser.add_argument('--mode',
+                        action="store", dest="mode",
+                        help="Live dashboard only: precision of the roofs (dp, sp or int) when no profiling file is "
+                             "given.",
+                        default="dp")
+
+    parser.add_argument('--no-plot',
+                        action="store_true", dest="no_plot",
+                        help="Compare only, do not draw (plotly is not needed).")
+
+    parser.add_argument('--report',
+                        action="store", dest="report",
+                        help="Render the profiling file and those of --report-file into pages of this directory, "
+                             "one page per file, sharing a single local copy of plotly.js.")
+
+    parser.add_argument('--report-file',
+                        action="append", dest="report_files",
+                        help="Report only: one more profiling file to render, may be given several times.",
+                        default=[])
+
+    parser.add_argument('--single-page',
+                        action="store", dest="single_page",
+                        help="Report only: put all rooflines on a single page with this file name.")
+
+    args = parser.parse_args()
+
+    status = 0
+    try:
+        status = run_visualization(args)
+    finally:
+        if args.trace_out is not None:
+            from src.spans import recorder
+            recorder.print_summary()
+            recorder.save_chrome_trace(args.trace_out)
+    if status:
+        sys.exit(status)
+
+
+def run_visualization(args):
+    # returns the exit status
+    platform_characteristics = load_platform_characteristics(args.platform)
+    large_plot = {"auto": None, "on": True, "off": False}[args.large_plot]
+    if args.serve is not None:
+        serve_live_dashboard(args.name, platform_characteristics, args.mode, args.profiling_file, args.app,
+                             args.store_platform, args.run, args.host, args.serve)
+        return 0
+    if args.profiling_file is None:
+        raise ValueError("ERROR: profiling file is required, aborting...")
+    if args.compare is not None:
+        failures = compare_profiling_data(args.compare, args.profiling_file, args.name, platform_characteristics,
+                                          args.regression_threshold, args.output, not args.no_browser,
+                                          not args.no_plot, args.comparison_csv, args.app, args.store_platform,
+                                          args.baseline_run, args.run, args.allow_missing)
+        if failures:
+            return 1
+        return 0
+    if args.report is not None:
+        rooflines = []
+        for file_name in [args.profiling_file] + args.report_files:
+            if file_name.endswith(".db"):
+                raise ValueError("ERROR: reports are rendered from profiling files, not results stores, aborting...")
+            rooflines.append((file_name, args.name + " (" + os.path.basename(file_name) + ")",
+                              platform_characteristics))
+        generate_rooflines_report(args.report, rooflines, args.single_page)
+        return 0
+    if args.scaling:
+        generate_scaling_roofline(args.profiling_file, args.name, platform_characteristics, args.cores, args.output,
+                                  not args.no_browser, args.app, args.store_platform, args.run)
+        return 0
+    if args.classify is not None:
+        if args.profiling_file.endswith(".db"):
+            precision, profiling_data = read_profiling_data_from_store(args.profiling_file, args.app,
+                                                                       args.store_platform, args.run, args.kernel,
+                                                                       args.level)
+        else:
+            precision, profiling_data = read_profiling_data(args.profiling_file)
+        classify_profiling_data(precision, profiling_data, platform_characteristics, args.classify)
+        return
+
+    if args.profiling_file.endswith(".db"):
+        generate_roofline_from_store(args.profiling_file, args.name, platform_characteristics, args.app,
+                                     args.store_platform, args.run, args.kernel, args.level, args.output,
+                                     not args.no_browser, large_plot)
+    else:
+        generate_roofline_from_profiling_data(args.profiling_file, args.name, platform_characteristics,
+                                              args.output, not args.no_browser, large_plot)
+
+
+if __name__ == "__main__":
+    main()
 